@@ -0,0 +1,14 @@
+from scripts import get_data, get_camera_data, Supervisor
+import os
+
+# Un proceso por cámara (captura + procesamiento) y un proceso de inferencia compartido.
+# Las cámaras se configuran en la sección 'cameras' de config/params.yaml
+if __name__ == "__main__":
+    dir_path = os.path.dirname(os.path.abspath(__file__))
+    data = get_data(dir_path)
+    cameras = get_camera_data(data)
+    print(f"Cámaras: {', '.join(camera['camera_name'] for camera in cameras)}")
+
+    supervisor = Supervisor.from_config(data, cameras)
+    supervisor.run()
+    print("Sistema terminado")
@@ -1,20 +1,20 @@
-from scripts import CameraParameters, Logger, Tracker, plot_historic, read_yaml_file, get_positions
+from scripts import CameraParameters, Logger, Tracker, plot_historic, read_yaml_file, get_positions, Detector, Startup, open_capture, open_serial
 import os
-from torch import cuda as t_cuda
-from torch import device as t_device
-from ultralytics import YOLO
 import cv2
 import time
-import serial
 
 take_time = False
 
+def load_model(model_path, roi_height, roi_width):
+    model = Detector(model_path)
+    model.warmup([(roi_height, roi_width)])
+    return model
+
 if __name__ == "__main__":
     current_struct_time = time.localtime()
     timestamp_string = time.strftime("%Y-%m-%d", current_struct_time)
     # timestamp_string = time.strftime("%Y-%m-%d %H:%M:%S", current_struct_time)
-    if take_time:
-        start_time = time.perf_counter()
+    startup = Startup()
 
     # Absolute path of the folder two levels up from the current script
     dir_path = os.path.dirname(os.path.abspath(__file__))
@@ -55,34 +55,23 @@ if __name__ == "__main__":
     serial_timeout = serial_data.get("timeout")
 
     logo = cv2.imread(logo_path)  # Keep transparency if present
+    startup.mark("configuracion")
 
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Init time: {elapsed_ms:.2f}")
-
-        start_time = time.perf_counter()
+    # Arranque en paralelo: stream, puerto serial (con la espera del ESP32) y modelo con warm-up
+    capture_future = startup.submit("captura", open_capture, video_path)
+    serial_future = startup.submit("serial", open_serial, serial_port, serial_baud_rate, serial_timeout)
+    model_future = startup.submit("modelo + warm-up", load_model, model_path, roi_height, roi_width)
 
-    # Open the video file
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)        # Mantén solo 1 frame en el buffer
-    cap.set(cv2.CAP_PROP_FPS, 30)              # Ajusta al FPS real de tu cámara
     # Si tu OpenCV lo soporta:
     # cap.set(cv2.CAP_PROP_RTSP_TRANSPORT, 1)    # 0=Any, 1=UDP, 2=TCP
     # cap.set(cv2.CAP_PROP_LATENCY, 0)           # Forzar latencia mínima
+    cap = capture_future.result()
 
     # Check if the video file opened successfully
     if not cap.isOpened():
         print(f"[ERROR] No se pudo abrir el video o stream: {video_path}")
         exit()
 
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Open capture time: {elapsed_ms:.2f}")
-
-        start_time = time.perf_counter()
-
     # Video parameters
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -92,17 +81,11 @@ if __name__ == "__main__":
                                   w = roi_width, h = roi_height)
     cam_params.update_limits(counter_init, counter_end, counter_line)
 
-    # Serial
-    try:
-        ser = serial.Serial(serial_port, serial_baud_rate, timeout=serial_timeout)
-    except serial.SerialException as e:
-        print(f"Error al abrir {serial_port}: {e}")
+    # Serial (open_serial ya esperó el reinicio del ESP32 y descartó sus logs de arranque)
+    ser = serial_future.result()
+    if ser is None:
         exit()
 
-    # Dar tiempo para que el ESP32 reinicie y desechar logs de arranque
-    time.sleep(2)
-    ser.reset_input_buffer()
-
     print(f"Leyendo bits desde {serial_port} a {serial_baud_rate} baudios...")
 
     # Variables
@@ -119,21 +102,9 @@ if __name__ == "__main__":
     stored_list = False
     actuator_moving = False
 
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Set variable time: {elapsed_ms:.2f}")
-
-        start_time = time.perf_counter()
     # Set model
-    model = YOLO(model_path)
-    device = t_device("cuda" if t_cuda.is_available() else "cpu")
-    model.to(device)
-
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Set model time: {elapsed_ms:.2f}")
+    model = model_future.result()
+    startup.report()
 
     # Video writer
     if generate_video:
@@ -186,7 +157,7 @@ if __name__ == "__main__":
                           cam_params.x : cam_params.x + cam_params.w]
         clean_roi_frame = roi_frame.copy()
 
-        detections = model(roi_frame, verbose=True)
+        detections = model(roi_frame)
 
         if take_time:
             end_time = time.perf_counter()
@@ -1,97 +1,75 @@
-from scripts import CameraParameters, Logger, Tracker, plot_historic, get_positions, get_data, handle_actuator
+from scripts import Logger, get_data, DetectionScheduler, Startup, open_capture, load_detector, build_counting_lines, detect_lines, compose_frames, composed_size, DetectionCache, apply_cached_detections, recount_cached, TemporalBatcher
 import os
-from torch import cuda as t_cuda
-from torch import device as t_device
-from ultralytics import YOLO
 import cv2
 import time
 
 take_time = False
 
 if __name__ == "__main__":
-    # timestamp_string = time.strftime("%Y-%m-%d %H:%M:%S", current_struct_time)
-    if take_time:
-        start_time = time.perf_counter()
-
+    # Arranque: la captura y el modelo (con inferencia de calentamiento) se cargan en paralelo
+    startup = Startup()
     dir_path = os.path.dirname(os.path.abspath(__file__))
-    data = get_data(dir_path)
-
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Init time: {elapsed_ms:.2f}")
-
-        start_time = time.perf_counter()
-
-    # Open the video file
-    cap = cv2.VideoCapture(data['video_path'])
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)        # Mantén solo 1 frame en el buffer
-    cap.set(cv2.CAP_PROP_FPS, 30)              # Ajusta al FPS real de tu cámara
-    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('H','2','6','4'))  # Códec H.264
+    data = startup.run("configuracion", get_data, dir_path)
+    capture_future = startup.submit("captura", open_capture, data['video_path'], fourcc='H264')
+    # Un recuento desde la cache de detecciones no necesita el modelo
+    recount = data['detection_cache'].get('recount', False) and os.path.isfile(data['video_path'] or '')
+    model_future = None if recount else startup.submit("modelo + warm-up", load_detector, data)
 
     # Si tu OpenCV lo soporta:
     # cap.set(cv2.CAP_PROP_RTSP_TRANSPORT, 1)    # 0=Any, 1=UDP, 2=TCP
     # cap.set(cv2.CAP_PROP_LATENCY, 0)           # Forzar latencia mínima
+    cap = capture_future.result()
 
     # Check if the video file opened successfully
     if not cap.isOpened():
         print(f"[ERROR] No se pudo abrir el video o stream: {data['video_path']}")
         exit()
 
-
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Open capture time: {elapsed_ms:.2f}")
-
-        start_time = time.perf_counter()
-
     # Video parameters
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = int(cap.get(cv2.CAP_PROP_FPS))
-    cam_params = CameraParameters(width, height,
-                                  x = data['x_init'], y = data['y_init'],
-                                  w = data['roi_width'], h = data['roi_height'])
-    cam_params.update_limits(data['counter_init'], data['counter_end'], data['counter_line'])
+    # One counting line per ROI (tracker state and package history per line)
+    lines = build_counting_lines(data, width, height)
+
+    # Detecciones guardadas de este video, modelo y ROIs (None con RTSP o cache desactivado)
+    cache = startup.run("cache de detecciones", DetectionCache.from_config, data, lines)
+    if cache is not None:
+        print(f"Cache de detecciones: {cache.path} ({len(cache)} frames{', completo' if cache.complete else ''})")
+    if recount and cache is not None and cache.complete:
+        # Recuento sin decodificar ni correr YOLO (p. ej. al ajustar counter_line o el tracker)
+        start = time.perf_counter()
+        recount_cached(lines, cache)
+        elapsed = time.perf_counter() - start
+        print(f"Recuento de {len(cache)} frames en {elapsed:.2f} s")
+        for line in lines:
+            print(f"  {line.name}: paquetes {line.list_counter}, varillas en curso {line.tracker.rod_count}")
+            line.close()
+        cap.release()
+        exit()
 
     # Variables
     frame_count = 0
-    tracker_data = {'track_id': 1,
-                    'tracking_objects': {},
-                    'rod_count': 0,
-                    'counted_track_ids': set(),
-                    'center_points_prev_frame': []}
-    list_counter = [] # For plot historic
     actuator_initial_pos = (0,0)
-    prev_size = -1
     actuator_moving = False
-    store_package = False
+    video_finished = False
     direction = 1 # 1: left to right (Default), 0: stop, -1: right to left
-    actuactor_count = 0
-
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Set variable time: {elapsed_ms:.2f}")
+    scheduler = DetectionScheduler.from_config(data['scheduler'])
 
-        start_time = time.perf_counter()
     # Set model
-    model = YOLO(data['model_path'])
-    device = t_device("cuda" if t_cuda.is_available() else "cpu")
-    model.to(device)
+    model = (model_future or startup.submit("modelo + warm-up", load_detector, data)).result()
+    startup.report()
 
-    if take_time:
-        end_time = time.perf_counter()
-        elapsed_ms = (end_time - start_time)*1000
-        print(f"Set model time: {elapsed_ms:.2f}")
+    # Con un archivo de video la latencia no importa: N frames seguidos por inferencia (inference.temporal_batch).
+    # El scheduler no salta frames en este modo (no se mide la latencia de cada frame)
+    batcher = TemporalBatcher.from_config(model, lines, data['inference']) if os.path.isfile(data['video_path'] or '') else None
 
     # Video writer
     if data['generate_video']:
         video_writer = cv2.VideoWriter(data['output_path'], \
                                        cv2.VideoWriter_fourcc(*'mp4v'), \
                                        fps, \
-                                       (data['roi_width'], data['roi_height']))
+                                       composed_size(lines))
         if not video_writer.isOpened():
             print(f"[ERROR] Could not initialize video writer for {data['output_path']}")
             data['generate_video'] = False
@@ -99,102 +77,130 @@ if __name__ == "__main__":
     storage_path = data['storage_path'] if data['storage_data'] else None
     logger = Logger(output_dir = data['logger_path'], storage_path = storage_path)
 
-    while cap.isOpened():
-        if take_time:
-            print(f"---------- Frame: {frame_count} ------------------")
-            start_time_global = time.perf_counter()
-
-        if cv2.waitKey(1) & 0xFF == ord('p'):  # Press 'q' to exit
-            actuator_moving = not actuator_moving
-
-        success, frame = cap.read()
-
-        if not success:
-            print("No frame.")
-            break
-
-        if take_time:
-            end_time = time.perf_counter()
-            elapsed_ms = (end_time - start_time_global)*1000
-            print(f"Reading time: {elapsed_ms:.2f} ms.")
-
-            start_time = time.perf_counter()
-        # ROI frame
-        roi_frame = frame[cam_params.y : cam_params.y + cam_params.h,
-                          cam_params.x : cam_params.x + cam_params.w]
-        clean_roi_frame = roi_frame.copy()
-
-        detections = model(roi_frame, verbose=False)
-
-        if take_time:
-            end_time = time.perf_counter()
-            elapsed_ms = (end_time - start_time)*1000
-            print(f"Detection time: {elapsed_ms:.2f} ms.")
-
-            start_time = time.perf_counter()
-
-        if prev_size == len(list_counter):
-            plot_historic(roi_frame, list_counter, data['logo'])
-
-        center_points_cur_frame, actuator_pos = get_positions(detections,
-                                                              data['min_confidence'],
-                                                              data['actuator_data'])
-
-        if actuator_pos[1] != 0 and actuator_pos[1] != 0:
-            cv2.circle(roi_frame, (actuator_pos[0], actuator_pos[1]), 10, (0,0,255), -1)
-        if data['debug']:
-            cv2.putText(roi_frame, f"Apos: {actuator_pos}", (50, 20*9), cam_params.font, cam_params.font_scale, cam_params.green, cam_params.font_thickness*2)
-
-        list_counter, tracker_data, store_package, actuactor_count = handle_actuator(cam_params, actuator_pos, list_counter, tracker_data, store_package, actuactor_count)
-
-        if not actuator_moving:
-            # print(frame_count+1, end=". ")
-            tracker = Tracker(center_points_cur_frame, roi_frame, cam_params, debug=data['debug'], direction=direction)
-            tracker.update_params(tracker_data)
-            tracker_data = tracker.track()
-            tracker.plot_count()
-            store_package = False
-            actuactor_count = 0
-
-        if take_time:
-            end_time = time.perf_counter()
-            elapsed_ms = (end_time - start_time)*1000
-            print(f"Post processing time: {elapsed_ms:.2f} ms.")
-
-        frame_count += 1
-        prev_size = len(list_counter)
-
-        if frame_count == 1:
-            actuator_initial_pos = actuator_pos
-
+    try:
+        while cap.isOpened():
+            if take_time:
+                print(f"---------- Frame: {frame_count} ------------------")
+                start_time_global = time.perf_counter()
+
+            if cv2.waitKey(1) & 0xFF == ord('p'):  # Press 'q' to exit
+                actuator_moving = not actuator_moving
+
+            # Skip frames while inference can't keep up (grab only advances the decoder)
+            if not scheduler.should_detect(frame_count):
+                if not cap.grab():
+                    print("No frame.")
+                    video_finished = True
+                    break
+                frame_count += 1
+                continue
+
+            success, frame = cap.read()
+
+            if not success:
+                print("No frame.")
+                video_finished = True
+                if batcher is None:
+                    break
+
+            if take_time:
+                end_time = time.perf_counter()
+                elapsed_ms = (end_time - start_time_global)*1000
+                print(f"Reading time: {elapsed_ms:.2f} ms.")
+
+                start_time = time.perf_counter()
+
+            cached = cache.get(frame_count) if cache is not None else None
+            if batcher is not None:
+                # Lote temporal: los frames vuelven en orden con sus detecciones cuando corre el modelo
+                if success:
+                    ready = batcher.push(frame_count, [line.crop(frame) for line in lines], entry=cached)
+                else:
+                    ready = batcher.flush()   # Ultimos frames del video
+                frame_gap = 1
+            else:
+                # ROI frames
+                roi_frames = [line.crop(frame) for line in lines]
+                # One batched inference for all ROIs; idle lines re-emit their last detections
+                frame_gap = scheduler.begin(frame_count)
+                if cached is not None:
+                    # Detecciones de una corrida anterior del mismo video: sin YOLO
+                    apply_cached_detections(lines, cached)
+                    scheduler.cancel()
+                else:
+                    if detect_lines(model, lines, roi_frames):
+                        scheduler.end()
+                    else:
+                        scheduler.cancel()
+                    if cache is not None:
+                        cache.put(frame_count, [line.boxes for line in lines])
+                ready = [(frame_count, roi_frames, None)]
+            frame_count += 1
+
+            if take_time:
+                end_time = time.perf_counter()
+                elapsed_ms = (end_time - start_time)*1000
+                print(f"Detection time: {elapsed_ms:.2f} ms.")
+
+            stop = video_finished
+            for index, roi_frames, entry in ready:
+                if take_time:
+                    start_time = time.perf_counter()
+
+                if entry is not None:
+                    apply_cached_detections(lines, entry)
+                    if cache is not None:
+                        cache.put(index, entry)
+                clean_roi_frame = compose_frames(roi_frames).copy()
+
+                for line, roi_frame in zip(lines, roi_frames):
+                    line.update(roi_frame, direction, frame_gap=frame_gap, track=not actuator_moving)
+                roi_frame = compose_frames(roi_frames)
+
+                if take_time:
+                    end_time = time.perf_counter()
+                    elapsed_ms = (end_time - start_time)*1000
+                    print(f"Post processing time: {elapsed_ms:.2f} ms.")
+
+                if index == 0:
+                    actuator_initial_pos = lines[0].actuator_pos
+
+                if data['generate_video']:
+                    video_writer.write(roi_frame)
+
+                if data['debug']:
+                    logger.log(roi_frame, index + 1)
+
+                if data['storage_data']:
+                    logger.save_img(clean_roi_frame, index + 1)
+
+                if take_time:
+                    start_time = time.perf_counter()
+
+                # Show result
+                cv2.imshow("Inference on Cropped Region", roi_frame)
+
+                if take_time:
+                    end_time = time.perf_counter()
+                    elapsed_ms = (end_time - start_time)*1000
+                    print(f"CV2 imshow time: {elapsed_ms:.2f}")
+                    elapsed_ms = (end_time - start_time_global)*1000
+                    print(f"Total time: {elapsed_ms:.2f} ms.")
+
+                if cv2.waitKey(1) & 0xFF == ord('q'):  # Press 'q' to exit
+                    stop = True
+                    break
+            if stop:
+                break
+    finally:
+        # 6. Release resources
+        cap.release()
+        if cache is not None:
+            # Con el video completo, la próxima corrida puede recontar solo desde la cache
+            cache.save(complete=video_finished)
+        for line in lines:
+            line.close()
         if data['generate_video']:
-            video_writer.write(roi_frame)
-
-        if data['debug']:
-            logger.log(roi_frame, frame_count)
-
-        if data['storage_data']:
-            logger.save_img(clean_roi_frame, frame_count)
-
-        if take_time:
-            start_time = time.perf_counter()
-
-        # Show result
-        cv2.imshow("Inference on Cropped Region", roi_frame)
-
-        if take_time:
-            end_time = time.perf_counter()
-            elapsed_ms = (end_time - start_time)*1000
-            print(f"CV2 imshow time: {elapsed_ms:.2f}")
-            elapsed_ms = (end_time - start_time_global)*1000
-            print(f"Total time: {elapsed_ms:.2f} ms.")
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):  # Press 'q' to exit
-            break
-
-    # 6. Release resources
-    cap.release()
-    if data['generate_video']:
-        print(f"Processing complete. Video saved to {data['output_path']}")
-        video_writer.release()
-    cv2.destroyAllWindows()
+            print(f"Processing complete. Video saved to {data['output_path']}")
+            video_writer.release()
+        cv2.destroyAllWindows()
@@ -1,5 +1,3 @@
-import cv2
-
 class CameraParameters:
     def __init__(self, width, height, x = 2440, y=480, w=600, h=720):
         # Get original video dimensions
@@ -14,7 +12,7 @@ class CameraParameters:
         self.counter_end = 0
         self.counter_line = h//2
         # For plotting in the camera frame
-        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.font = 0   # cv2.FONT_HERSHEY_SIMPLEX (cv2 is only loaded where frames are drawn)
         self.font_scale = 0.8
         self.font_scale_log = 0.4
         self.font_thickness = 2
@@ -24,10 +22,30 @@ class CameraParameters:
         self.black = (0, 0, 0)
         self.white = (255, 255, 255)
         self.rod_radius = 10
-        self.displacement = -15
+        # Tracker thresholds in ROI pixels (tracker.displacement / tracker.edge_threshold in params.yaml)
+        self.displacement = -15     # Largest backward move of a rod between frames
+        self.edge_threshold = 15    # Distance to counter_end and mean move under which the zone heuristics fire
 
     def update_limits(self, counter_init, counter_end, counter_line):
         self.counter_init = counter_init
         self.counter_end = counter_end
         self.counter_line = counter_line
 
+    def scaled(self, width, height):
+        """
+        Returns a copy of these parameters mapped to another resolution of the same
+        camera (e.g. the low-resolution substream). ROI, counter lines and pixel
+        thresholds are scaled; plotting settings are kept.
+        """
+        sx = width / self.width
+        sy = height / self.height
+        params = CameraParameters(width, height,
+                                  x = int(round(self.x * sx)), y = int(round(self.y * sy)),
+                                  w = int(round(self.w * sx)), h = int(round(self.h * sy)))
+        params.update_limits(int(round(self.counter_init * sx)),
+                             int(round(self.counter_end * sx)),
+                             int(round(self.counter_line * sx)))
+        params.rod_radius = max(1, int(round(self.rod_radius * sx)))
+        params.displacement = self.displacement * sx
+        params.edge_threshold = self.edge_threshold * sx
+        return params
@@ -1,5 +1,48 @@
-from .CamParameters import CameraParameters
-from .datatypes import Rod
-from .tracker import Tracker
-from .utils import plot_historic, read_yaml_file, get_positions, get_data, handle_actuator
-from .logger import Logger
\ No newline at end of file
+"""
+Rod counter package.
+
+Public names are imported on first use (PEP 562), so `import scripts` stays
+cheap: cv2, torch/ultralytics, PyAV and pyserial only load when a module that
+needs them is used. See scripts/import_benchmark.py.
+"""
+import importlib
+
+_EXPORTS = {
+    'CameraParameters': 'CamParameters',
+    'Rod': 'datatypes', 'Detections': 'datatypes', 'POSITION_DTYPE': 'datatypes',
+    'Tracker': 'tracker',
+    'plot_historic': 'utils', 'read_yaml_file': 'utils', 'get_positions': 'utils', 'get_data': 'utils',
+    'extract_positions': 'utils', 'positions_to_rods': 'utils',
+    'get_camera_data': 'utils', 'handle_actuator': 'utils', 'scale_actuator_data': 'utils',
+    'Logger': 'logger',
+    'FrameBus': 'frame_bus', 'FrameSlot': 'frame_bus',
+    'copy_frame_into': 'capture', 'RoiFilter': 'capture', 'DecoderTuner': 'capture',
+    'DetectionScheduler': 'scheduler',
+    'MotionGate': 'motion',
+    'Detector': 'inference', 'export_model': 'inference',
+    'CountingLine': 'counting_line', 'build_counting_lines': 'counting_line', 'detect_lines': 'counting_line',
+    'roi_bounds': 'counting_line', 'compose_frames': 'counting_line', 'composed_size': 'counting_line',
+    'apply_cached_detections': 'counting_line', 'recount_cached': 'counting_line', 'TemporalBatcher': 'counting_line',
+    'DetectionCache': 'detection_cache', 'file_digest': 'detection_cache',
+    'DecoderProcess': 'decoder_process', 'SharedFrameRing': 'decoder_process',
+    'Startup': 'startup', 'open_capture': 'startup', 'open_serial': 'startup', 'load_detector': 'startup',
+    'roi_shapes': 'startup',
+    'CameraPipeline': 'pipeline',
+    'InferenceClient': 'inference_server', 'InferenceWorker': 'inference_server', 'SharedFrames': 'inference_server',
+    'inference_worker': 'inference_server', 'set_cpu_affinity': 'inference_server',
+    'Supervisor': 'supervisor',
+    'DetectionRecorder': 'replay', 'Recording': 'replay', 'run_replay': 'replay',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
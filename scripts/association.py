@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Sequence
+
+def _is_sorted(values: Sequence[float], descending: bool = False) -> bool:
+    if descending:
+        return all(a >= b for a, b in zip(values, values[1:]))
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+def match_tracks(thresholds: Sequence[float], keys: Sequence[float]) -> List[int]:
+    """
+    Associates tracks with the detections of a new frame along the chain axis.
+
+    Track i may take detection j when keys[j] >= thresholds[i], with keys the
+    detection positions along the direction of motion and thresholds the
+    previous track positions minus the allowed backward displacement. Each
+    track (in the given order) takes the first free detection (in the given
+    order) that passes the gate.
+
+    Detections come sorted along the chain, so this never needs the nested
+    scan: with descending keys the first free detection is the only candidate
+    and with ascending keys and thresholds both lists are walked once (two
+    pointers). When the track order conflicts with the detections, a binary
+    search finds the first detection past the gate and a union-find of taken
+    slots skips to the next free one.
+
+    Returns:
+        For each track, the index of its detection or -1 if it was lost.
+    """
+    n, m = len(thresholds), len(keys)
+    matches = [-1] * n
+    if n == 0 or m == 0:
+        return matches
+
+    if _is_sorted(keys, descending=True):
+        # The first free detection has the largest key: if it doesn't pass the gate no other does
+        j = 0
+        for i, threshold in enumerate(thresholds):
+            if j < m and keys[j] >= threshold:
+                matches[i] = j
+                j += 1
+        return matches
+
+    if _is_sorted(keys) and _is_sorted(thresholds):
+        # Both ascending: detections skipped by one track can't pass any later gate
+        j = 0
+        for i, threshold in enumerate(thresholds):
+            while j < m and keys[j] < threshold:
+                j += 1
+            if j == m:
+                break
+            matches[i] = j
+            j += 1
+        return matches
+
+    if _is_sorted(keys):
+        # next_free[j]: first free detection at or after j (m = none), with path halving
+        next_free = list(range(m + 1))
+        for i, threshold in enumerate(thresholds):
+            j = bisect_left(keys, threshold)
+            while next_free[j] != j:
+                next_free[j] = next_free[next_free[j]]
+                j = next_free[j]
+            if j < m:
+                matches[i] = j
+                next_free[j] = j + 1
+        return matches
+
+    # Unordered detections: plain first-fit scan
+    free = list(range(m))
+    for i, threshold in enumerate(thresholds):
+        for position, j in enumerate(free):
+            if keys[j] >= threshold:
+                matches[i] = j
+                del free[position]
+                break
+    return matches
+
+def match_window(predicted: Sequence[float], keys: Sequence[float], tolerance: float) -> List[int]:
+    """
+    Order-preserving matching of tracks to detections around predicted positions.
+
+    Both lists are sorted front of the chain first (descending key). A single
+    two-pointer pass gives each track the next detection within `tolerance` of
+    its prediction: detections ahead of the window belong to no track (new
+    rods) and tracks with nothing in their window are lost. Rods never
+    overtake each other, so no track can jump onto a neighbour's rod.
+
+    Returns:
+        For each track, the index of its detection or -1 if it was lost.
+    """
+    n, m = len(predicted), len(keys)
+    matches = [-1] * n
+    i = j = 0
+    while i < n and j < m:
+        if keys[j] > predicted[i] + tolerance:
+            j += 1
+        elif keys[j] < predicted[i] - tolerance:
+            i += 1
+        else:
+            matches[i] = j
+            i += 1
+            j += 1
+    return matches
+
+def _line_up(previous: Sequence[float], keys: Sequence[float], tolerance: float, candidates, target: float):
+    """The pairs of the candidate shift that lines up the most rods (ties: closest to `target`)."""
+    best_pairs = []
+    for shift in sorted(candidates, key=lambda shift: abs(shift - target)):
+        matches = match_window([prev + shift for prev in previous], keys, tolerance)
+        pairs = [(previous[i], keys[j]) for i, j in enumerate(matches) if j >= 0]
+        if len(pairs) > len(best_pairs):
+            best_pairs = pairs
+            if len(pairs) == min(len(previous), len(keys)):
+                break   # Every rod lines up: no other shift can do better
+    return best_pairs
+
+def estimate_shift(previous: Sequence[float], keys: Sequence[float], tolerance: float,
+                   expected: Optional[float] = None, front: int = 3) -> Optional[float]:
+    """
+    Displacement of the whole chain between two detections.
+
+    Both lists are positions along the direction of motion, front of the
+    chain first. The (previous, current) pairs propose forward shifts and the
+    one that lines up the most rods within `tolerance` (match_window) wins.
+    With an `expected` shift (the previous chain velocity times the gap) the
+    candidates are the pairs within `tolerance` of it, a binary search per
+    rod. Without one (start, after a stop), or when those line up less than
+    half of the rods (the chain sped up or slowed down), the `front` leading
+    previous rods propose shifts against every detection. Evenly spaced rods
+    also line up one spacing further or closer, so ties go to the shift
+    closest to `expected` (0 when unknown). The result is the mean shift of
+    the winning pairs.
+
+    Returns:
+        The shift, or None if no rod lines up.
+    """
+    target = 0.0 if expected is None else expected
+    pairs = []
+    if expected is not None:
+        ascending = [-key for key in keys]  # Keys are descending: search their negation
+        candidates = set()
+        for prev in previous:
+            low = bisect_left(ascending, -(prev + expected + tolerance))
+            high = bisect_right(ascending, -max(prev + expected - tolerance, prev - tolerance))
+            candidates.update(round(keys[j] - prev) for j in range(low, high))
+        pairs = _line_up(previous, keys, tolerance, candidates, target)
+    if 2 * len(pairs) < min(len(previous), len(keys)):
+        candidates = {round(key - prev) for prev in previous[:front] for key in keys if key - prev >= -tolerance}
+        pairs = max(pairs, _line_up(previous, keys, tolerance, candidates, target), key=len)
+    if not pairs:
+        return None
+    return sum(key - prev for prev, key in pairs) / len(pairs)
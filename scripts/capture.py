@@ -0,0 +1,143 @@
+from fractions import Fraction
+import numpy as np
+
+def copy_frame_into(frame, dst: np.ndarray, format: str = 'bgr24') -> np.ndarray:
+    """
+    Converts a decoded PyAV frame and copies it into a given buffer (shared
+    memory, a buffer reused across frames).
+
+    FFmpeg still allocates the converted frame, so this costs one more copy
+    than `frame.to_ndarray(format=...)`, which is a view over that frame: use
+    it only when the destination has to be `dst`.
+    """
+    converted = frame.reformat(format=format)
+    plane = converted.planes[0]
+    channels = dst.shape[2] if dst.ndim == 3 else 1
+    if dst.shape[0] != plane.height or dst.shape[1] != plane.width:
+        raise ValueError(f"Frame size {plane.width}x{plane.height} does not match buffer size {dst.shape[1]}x{dst.shape[0]}")
+    src = np.frombuffer(plane, np.uint8).reshape(plane.height, plane.line_size)
+    src = src[:, :plane.width * channels].reshape(dst.shape)
+    np.copyto(dst, src)
+    return dst
+
+class StreamSizeError(ValueError):
+    """The stream can't fill the frame buffers sized from the configured resolution."""
+
+def check_stream_size(width: int, height: int, decode_box, cropped: bool):
+    """
+    Checks a decoded frame size against the configuration: the crop box must
+    lie inside the frame (roi_decode), or the frame must be exactly the box
+    (the configured resolution). Raises StreamSizeError otherwise; retrying
+    can't fix it.
+    """
+    x, y, w, h = decode_box
+    if cropped and x + w <= width and y + h <= height:
+        return
+    if not cropped and (width, height) == (w, h):
+        return
+    expected = f"at least {x + w}x{y + h} for the ROIs" if cropped else f"{w}x{h}"
+    raise StreamSizeError(f"Stream resolution {width}x{height} does not match the configuration ({expected}); "
+                          f"check source_resolution/detection_resolution in params.yaml")
+
+class RoiFilter:
+    """
+    Crops decoded frames to the ROI and converts them to BGR inside FFmpeg.
+
+    The crop runs in the decoder's native pixel format (usually yuv420p), so
+    the YUV->BGR conversion and the copies that follow only touch the ROI
+    instead of the whole frame.
+    """
+    def __init__(self, x: int, y: int, w: int, h: int, format: str = 'bgr24'):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.format = format
+        self._graph = None
+        self._key = None
+
+    def _build(self, frame):
+        import av.filter
+        # Keep the crop inside the frame, as numpy slicing would
+        x = max(0, min(self.x, frame.width - 1))
+        y = max(0, min(self.y, frame.height - 1))
+        w = min(self.w, frame.width - x)
+        h = min(self.h, frame.height - y)
+
+        graph = av.filter.Graph()
+        src = graph.add_buffer(width=frame.width, height=frame.height,
+                               format=frame.format.name,
+                               time_base=frame.time_base or Fraction(1, 30))
+        crop = graph.add('crop', f"{w}:{h}:{x}:{y}")
+        fmt = graph.add('format', self.format)
+        sink = graph.add('buffersink')
+        src.link_to(crop)
+        crop.link_to(fmt)
+        fmt.link_to(sink)
+        graph.configure()
+        self._graph = graph
+        self._key = (frame.width, frame.height, frame.format.name)
+
+    def process(self, frame):
+        """Returns the cropped and converted frame."""
+        if self._key != (frame.width, frame.height, frame.format.name):
+            self._build(frame)
+        self._graph.push(frame)
+        return self._graph.pull()
+
+class DecoderTuner:
+    """
+    Decoder threading and load-dependent frame skipping for a PyAV video stream.
+
+    Frame/slice threading is enabled once when the stream is opened. While the
+    consumer falls behind (lag >= high_lag for `patience` consecutive frames)
+    the decoder skips frames according to `skip_mode` (non-reference frames by
+    default); it goes back to full decoding once the lag stays <= low_lag.
+    """
+    def __init__(self, thread_count: int = 0, thread_type: str = 'AUTO', skip_mode: str = 'NONREF',
+                 high_lag: int = 3, low_lag: int = 1, patience: int = 15):
+        self.thread_count = thread_count  # 0 lets FFmpeg pick one thread per core
+        self.thread_type = thread_type
+        self.skip_mode = skip_mode
+        self.high_lag = high_lag
+        self.low_lag = low_lag
+        self.patience = patience
+        self.mode = 'DEFAULT'
+        self._codec = None
+        self._streak = 0
+
+    @classmethod
+    def from_config(cls, config: dict):
+        config = config or {}
+        return cls(thread_count=config.get("thread_count", 0),
+                   thread_type=config.get("thread_type", 'AUTO'),
+                   skip_mode=config.get("skip_mode", 'NONREF'),
+                   high_lag=config.get("high_lag", 3),
+                   low_lag=config.get("low_lag", 1),
+                   patience=config.get("patience", 15))
+
+    def configure(self, stream, adaptive: bool = True):
+        """Enables decoder threading; must be called before the first decode."""
+        stream.thread_type = self.thread_type
+        stream.codec_context.thread_count = self.thread_count
+        self._codec = stream.codec_context if adaptive else None
+        self.mode = 'DEFAULT'
+        self._streak = 0
+
+    def update(self, lag: int):
+        """Switches the skip mode given the number of frames the consumer is behind."""
+        if self._codec is None:
+            return
+        if self.mode == 'DEFAULT':
+            self._streak = self._streak + 1 if lag >= self.high_lag else 0
+            if self._streak >= self.patience:
+                self._set_mode(self.skip_mode)
+        else:
+            self._streak = self._streak + 1 if lag <= self.low_lag else 0
+            if self._streak >= self.patience:
+                self._set_mode('DEFAULT')
+
+    def _set_mode(self, mode: str):
+        self._codec.skip_frame = mode
+        self.mode = mode
+        self._streak = 0
@@ -0,0 +1,253 @@
+import os
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from .CamParameters import CameraParameters
+from .motion import MotionGate
+from .tracker import Tracker
+from .datatypes import POSITION_DTYPE
+from .utils import detections_array, extract_positions, handle_actuator, plot_historic, scale_actuator_data
+
+DEFAULT_CSV = "contador_varillas.csv"
+
+class CountingLine:
+    """
+    One counting ROI of a camera (one chain line) with its own counter lines,
+    motion gate, tracker state and package history.
+    """
+    def __init__(self, name: str, cam_params: CameraParameters, data: dict,
+                 actuator_data: dict = None, csv_filename: str = DEFAULT_CSV):
+        self.name = name
+        self.cp = cam_params
+        self.debug = data['debug']
+        self.logo = data['logo']
+        self.min_confidence = data['min_confidence']
+        self.actuator_data = actuator_data if actuator_data is not None else data['actuator_data']
+        self.csv_filename = csv_filename
+        self.motion_gate = MotionGate.from_config(cam_params, data.get('motion_gate'))
+        # Top-left corner of the buffer the ROI is cropped from (not (0, 0) when the decoder already cropped)
+        self.origin = (0, 0)
+        self.tracker = Tracker.from_config(cam_params, data.get('tracker'), debug=self.debug)
+        # Tracker inputs of every frame, for offline replay (tracker.record in params.yaml)
+        self.recorder = None
+        if (data.get('tracker') or {}).get('record', False):
+            from .replay import DetectionRecorder
+            output_root = os.path.splitext(data['output_path'])[0]
+            self.recorder = DetectionRecorder(f"{output_root}_{name}.npz", cam_params)
+        self.list_counter = []
+        self.store_package = False
+        self.actuactor_count = 0
+        self.prev_size = -1
+        self.positions = np.empty(0, dtype=POSITION_DTYPE)
+        self.actuator_pos = (0, 0)
+        self.boxes = None   # Raw (N, 6) detections of this frame's inference, None if re-emitted
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Returns a view of the ROI inside `frame`."""
+        x = self.cp.x - self.origin[0]
+        y = self.cp.y - self.origin[1]
+        return frame[y : y + self.cp.h, x : x + self.cp.w]
+
+    def set_detections(self, detections):
+        """Stores the positions of a fresh inference."""
+        self.boxes = detections_array(detections)
+        self.positions, self.actuator_pos = extract_positions(self.boxes, self.min_confidence, self.actuator_data)
+        self.motion_gate.store(self.positions, self.actuator_pos)
+
+    def reuse_detections(self):
+        """Re-emits the last positions (no motion in the counting zone)."""
+        self.boxes = None
+        self.positions, self.actuator_pos = self.motion_gate.reuse()
+
+    def update(self, roi_frame: np.ndarray, direction: int, frame_gap: int = 1, track: bool = True,
+               draw: bool = True):
+        """
+        Runs actuator handling and tracking on the current positions and draws
+        the overlay. Without `draw` only the counts are updated (no overlay and
+        no CSV rows from plot_historic).
+        """
+        if draw and self.prev_size == len(self.list_counter):
+            plot_historic(roi_frame, self.list_counter, self.logo, self.csv_filename)
+
+        actuator_pos = self.actuator_pos
+        if draw and actuator_pos[0] != 0 and actuator_pos[1] != 0:
+            cv2.circle(roi_frame, (actuator_pos[0], actuator_pos[1]), 10, self.cp.red, -1)
+        if draw and self.debug:
+            cv2.putText(roi_frame, f"Apos: {actuator_pos}", (50, 20*9), self.cp.font, self.cp.font_scale, self.cp.green, self.cp.font_thickness*2)
+
+        if self.recorder is not None:
+            self.recorder.record(self.positions, direction, actuator_pos, frame_gap, track)
+
+        (self.list_counter,
+         self.store_package,
+         self.actuactor_count) = handle_actuator(self.cp, actuator_pos, self.list_counter, self.tracker,
+                                                 self.store_package, self.actuactor_count)
+
+        if track:
+            self.tracker.update(self.positions, direction, roi_frame, frame_gap=frame_gap)
+            if draw:
+                self.tracker.plot_count()
+            self.store_package = False
+            self.actuactor_count = 0
+        else:
+            self.tracker.halt()
+
+        self.prev_size = len(self.list_counter)
+
+    def close(self):
+        """Writes the detection recording, if enabled."""
+        if self.recorder is not None:
+            self.recorder.save()
+
+def build_counting_lines(data: dict, width: int, height: int, detection_size: Tuple[int, int] = None) -> List[CountingLine]:
+    """
+    Creates one CountingLine per ROI in `data['rois']`. ROIs are given in the
+    (width, height) resolution and scaled to `detection_size` if it differs.
+    """
+    lines = []
+    for roi in data['rois']:
+        cam_params = CameraParameters(width, height,
+                                      x = roi['x_init'], y = roi['y_init'],
+                                      w = roi['roi_width'], h = roi['roi_height'])
+        cam_params.update_limits(roi['counter_init'], roi['counter_end'], roi['counter_line'])
+        tracker_data = data.get('tracker') or {}
+        cam_params.displacement = tracker_data.get('displacement', cam_params.displacement)
+        cam_params.edge_threshold = tracker_data.get('edge_threshold', cam_params.edge_threshold)
+        actuator_data = data['actuator_data']
+        if detection_size is not None and tuple(detection_size) != (width, height):
+            cam_params = cam_params.scaled(*detection_size)
+            actuator_data = scale_actuator_data(actuator_data, detection_size[0] / width, detection_size[1] / height)
+        csv_name = data.get('csv_name', 'contador_varillas')
+        csv_filename = f"{csv_name}.csv" if len(data['rois']) == 1 else f"{csv_name}_{roi['name']}.csv"
+        lines.append(CountingLine(roi['name'], cam_params, data, actuator_data, csv_filename))
+    return lines
+
+def roi_bounds(lines: List[CountingLine]) -> Tuple[int, int, int, int]:
+    """Bounding box (x, y, w, h) that contains the ROIs of all lines."""
+    x0 = min(line.cp.x for line in lines)
+    y0 = min(line.cp.y for line in lines)
+    x1 = max(line.cp.x + line.cp.w for line in lines)
+    y1 = max(line.cp.y + line.cp.h for line in lines)
+    return x0, y0, x1 - x0, y1 - y0
+
+def detect_lines(model, lines: List[CountingLine], roi_frames: List[np.ndarray]) -> int:
+    """
+    Runs a single batched inference over the ROIs whose counting zone moved;
+    the other lines re-emit their previous detections.
+
+    Returns:
+        The number of ROIs sent to the model.
+    """
+    moving = [i for i, (line, roi_frame) in enumerate(zip(lines, roi_frames)) if line.motion_gate.has_motion(roi_frame)]
+    if moving:
+        detections = model([roi_frames[i] for i in moving])
+        for i, detection in zip(moving, detections):
+            lines[i].set_detections([detection])
+    moving_set = set(moving)
+    for i, line in enumerate(lines):
+        if i not in moving_set:
+            line.reuse_detections()
+    return len(moving)
+
+class TemporalBatcher:
+    """
+    Batched inference across consecutive frames, for file sources where
+    latency doesn't matter.
+
+    Each pushed frame goes through the motion gates as it arrives, and its
+    moving ROIs wait for the batch; the model runs once `batch_size` ROIs or
+    frames are waiting (or as soon as nothing is). The frames come back in
+    order with their DetectionCache-style entry, to be applied with
+    apply_cached_detections right before tracking them.
+    """
+    def __init__(self, model, lines: List[CountingLine], batch_size: int = 8):
+        self.model = model
+        self.lines = lines
+        self.batch_size = batch_size
+        self.inferred = 0   # ROIs sent to the model
+        self.calls = 0      # Model calls
+        self._frames = []   # (frame index, ROI frames, entry) in arrival order
+        self._rois = []     # (position in _frames, line index, ROI) waiting for the batch
+
+    @classmethod
+    def from_config(cls, model, lines: List[CountingLine], config: dict) -> Optional["TemporalBatcher"]:
+        """Batcher of `inference.temporal_batch` frames, or None when it is 1 (frame by frame)."""
+        batch_size = (config or {}).get("temporal_batch", 1)
+        return cls(model, lines, batch_size) if batch_size > 1 else None
+
+    @property
+    def pending(self) -> int:
+        """Frames waiting for the batch."""
+        return len(self._frames)
+
+    def push(self, frame_index: int, roi_frames: List[np.ndarray],
+             entry: List[Optional[np.ndarray]] = None) -> List[Tuple[int, List[np.ndarray], list]]:
+        """
+        Queues a frame; `entry` skips the model for it (e.g. a DetectionCache hit).
+
+        Returns:
+            The frames released by this push, in frame order (often none).
+        """
+        if entry is None:
+            entry = [None] * len(self.lines)
+            for i, (line, roi_frame) in enumerate(zip(self.lines, roi_frames)):
+                if line.motion_gate.has_motion(roi_frame):
+                    self._rois.append((len(self._frames), i, roi_frame))
+        self._frames.append((frame_index, roi_frames, entry))
+        if not self._rois or len(self._rois) >= self.batch_size or len(self._frames) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Tuple[int, List[np.ndarray], list]]:
+        """Runs the model on the waiting ROIs and releases every queued frame."""
+        if self._rois:
+            detections = self.model([roi_frame for _, _, roi_frame in self._rois])
+            for (position, i, _), detection in zip(self._rois, detections):
+                self._frames[position][2][i] = detections_array(detection)
+            self.inferred += len(self._rois)
+            self.calls += 1
+            self._rois = []
+        ready, self._frames = self._frames, []
+        return ready
+
+def apply_cached_detections(lines: List[CountingLine], entry: List[Optional[np.ndarray]]):
+    """Feeds a DetectionCache entry to the lines as detect_lines did when it was recorded."""
+    for line, boxes in zip(lines, entry):
+        if boxes is None:
+            line.reuse_detections()
+        else:
+            line.set_detections(boxes)
+
+def recount_cached(lines: List[CountingLine], cache, direction: int = 1) -> List[List[int]]:
+    """
+    Tracks every frame of a DetectionCache without decoding the video or
+    drawing; the frame gaps are those between the cached frames.
+
+    Returns:
+        Per line, the frame index at which each of its packages was closed.
+    """
+    canvases = [np.zeros((line.cp.h, line.cp.w, 3), dtype=np.uint8) for line in lines]   # Only for debug logs
+    closed = [[] for _ in lines]
+    previous = None
+    for frame_index in cache.frames():
+        apply_cached_detections(lines, cache.get(frame_index))
+        frame_gap = 1 if previous is None else frame_index - previous
+        previous = frame_index
+        for line, canvas, frames in zip(lines, canvases, closed):
+            line.update(canvas, direction, frame_gap=frame_gap, draw=False)
+            frames.extend([frame_index] * (len(line.list_counter) - len(frames)))
+    return closed
+
+def compose_frames(frames: List[np.ndarray]) -> np.ndarray:
+    """Places the ROI frames side by side (padding to the tallest one) for display and recording."""
+    if len(frames) == 1:
+        return frames[0]
+    height = max(frame.shape[0] for frame in frames)
+    padded = [frame if frame.shape[0] == height else
+              cv2.copyMakeBorder(frame, 0, height - frame.shape[0], 0, 0, cv2.BORDER_CONSTANT, value=(0, 0, 0))
+              for frame in frames]
+    return np.hstack(padded)
+
+def composed_size(lines: List[CountingLine]) -> Tuple[int, int]:
+    """(width, height) of the frame produced by compose_frames for these lines."""
+    return sum(line.cp.w for line in lines), max(line.cp.h for line in lines)
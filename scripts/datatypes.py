@@ -1,7 +1,36 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+
+# Positions of the detected rods: box center in ROI pixels, confidence and class
+POSITION_DTYPE = np.dtype([('x', np.int32), ('y', np.int32), ('conf', np.float32), ('cls', np.int16)])
 
 @dataclass
 class Rod:
     track_id: int = -1
     pos_x: float = 0.0
-    pos_y: float = 0.0
\ No newline at end of file
+    pos_y: float = 0.0
+    vel_x: Optional[float] = None   # Smoothed x velocity of its track in px/frame (None until matched)
+    misses: int = 0                 # Consecutive detections the track coasted on its prediction
+
+@dataclass
+class Detections:
+    """Raw detections of one image: boxes (N, 4) in xyxy pixels, confidences and classes (N,)."""
+    xyxy: np.ndarray = field(default_factory=lambda: np.zeros((0, 4), dtype=np.float32))
+    conf: np.ndarray = field(default_factory=lambda: np.zeros((0,), dtype=np.float32))
+    cls: np.ndarray = field(default_factory=lambda: np.zeros((0,), dtype=np.float32))
+
+    @classmethod
+    def from_results(cls, result):
+        """Builds it from an ultralytics Results object (one device-to-host transfer)."""
+        return cls.from_array(result.boxes.data.cpu().numpy())
+
+    def to_array(self) -> np.ndarray:
+        """Packs the detections in one (N, 6) float32 array: x1, y1, x2, y2, conf, cls."""
+        return np.hstack((self.xyxy.reshape(-1, 4), self.conf.reshape(-1, 1), self.cls.reshape(-1, 1))).astype(np.float32)
+
+    @classmethod
+    def from_array(cls, packed: np.ndarray):
+        """Inverse of `to_array` (same layout as `boxes.data` of ultralytics detection results)."""
+        packed = packed.reshape(-1, 6)
+        return cls(xyxy=packed[:, :4], conf=packed[:, 4], cls=packed[:, 5])
@@ -0,0 +1,265 @@
+import multiprocessing as mp
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+import numpy as np
+from .capture import check_stream_size, copy_frame_into, RoiFilter, DecoderTuner, StreamSizeError
+from .inference_server import share_resource_tracker
+
+class SharedFrameRing:
+    """
+    Latest-frame ring in shared memory between a decoder process and its parent.
+
+    The int64 header holds the latest slot, the frame counter, the consumer lag,
+    the stream fps, the decoder skip flag and, per slot, a seqlock counter and
+    the sequence number of the frame it holds. The writer makes the slot's
+    counter odd while copying into it; the reader copies the frame out and
+    keeps it only if the counter is even and unchanged afterwards, so a torn
+    frame is never published and neither side ever blocks on the other.
+    """
+    LATEST, SEQ, LAG, FPS, SKIPPING = range(5)
+    HEADER = 5
+
+    def __init__(self, width: int, height: int, channels: int = 3, slots: int = 3, name: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        header_size = (self.HEADER + 2 * slots) * 8
+        frame_size = width * height * channels
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=header_size + slots * frame_size)
+        self.header = np.ndarray((self.HEADER + 2 * slots,), np.int64, buffer=self.shm.buf)
+        self.locks = self.header[self.HEADER:self.HEADER + slots]
+        self.seqs = self.header[self.HEADER + slots:]
+        self.frames = np.ndarray((slots, height, width, channels), np.uint8, buffer=self.shm.buf, offset=header_size)
+        if self.owner:
+            self.header[:] = 0
+            self.header[self.LATEST] = -1
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self.header[self.SEQ])
+
+    # ----- Writer side (decoder process) -----
+    def write(self, frame):
+        """Converts a decoded PyAV frame into the next slot and publishes it."""
+        index = (int(self.header[self.LATEST]) + 1) % self.slots
+        seq = self.seq + 1
+        self.locks[index] += 1
+        try:
+            self.seqs[index] = seq
+            copy_frame_into(frame, self.frames[index])
+        finally:
+            self.locks[index] += 1
+        self.header[self.SEQ] = seq
+        self.header[self.LATEST] = index
+
+    # ----- Reader side (parent) -----
+    def read_into(self, dst: np.ndarray, last_seq: int = 0, retries: int = 3) -> int:
+        """
+        Copies the newest frame newer than `last_seq` into `dst`.
+
+        Returns:
+            Its sequence number, or 0 if there is no new (consistent) frame.
+        """
+        for _ in range(retries):
+            index = int(self.header[self.LATEST])
+            if index < 0:
+                return 0
+            seq = int(self.seqs[index])
+            lock = int(self.locks[index])
+            if seq <= last_seq:
+                return 0
+            if lock % 2:
+                continue
+            np.copyto(dst, self.frames[index])
+            if int(self.locks[index]) == lock and int(self.seqs[index]) == seq:
+                return seq
+        return 0
+
+    def close(self, unlink: bool = False):
+        self.header = self.locks = self.seqs = self.frames = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+# Exit code of a decoder child whose stream doesn't match the configured resolution
+STREAM_SIZE_EXIT = 3
+
+def decoder_worker(url: str, options: dict, ring_name: str, size: Tuple[int, int],
+                   decode_box, decoder_config: dict, stop_event):
+    """
+    Process target: demuxes and decodes `url` into the shared ring until the
+    stream ends, fails or the parent goes away. Reconnection is left to the
+    parent, which respawns this process. A stream of the wrong size exits with
+    STREAM_SIZE_EXIT instead, as respawning can't fix it.
+    """
+    import av
+    ring = SharedFrameRing(size[0], size[1], name=ring_name)
+    tuner = DecoderTuner.from_config(decoder_config)
+    parent = mp.parent_process()
+    container = av.open(url, options=options)
+    try:
+        stream = container.streams.video[0]
+        tuner.configure(stream)
+        if stream.average_rate:
+            ring.header[ring.FPS] = int(float(stream.average_rate) * 1000)
+        roi_filter = RoiFilter(*decode_box) if decode_box is not None else None
+        box = decode_box if decode_box is not None else (0, 0, size[0], size[1])
+        size_checked = False
+        for packet in container.demux(stream):
+            if stop_event.is_set() or (parent is not None and not parent.is_alive()):
+                break
+            for frame in packet.decode():
+                if not size_checked:
+                    try:
+                        check_stream_size(frame.width, frame.height, box, decode_box is not None)
+                    except StreamSizeError as e:
+                        print(f"[ERROR] {e}")
+                        sys.exit(STREAM_SIZE_EXIT)
+                    size_checked = True
+                if roi_filter is not None:
+                    frame = roi_filter.process(frame)
+                ring.write(frame)
+                # The parent reports how far the processing thread is behind
+                tuner.update(int(ring.header[ring.LAG]))
+                ring.header[ring.SKIPPING] = tuner.mode != 'DEFAULT'
+    finally:
+        container.close()
+        ring.close()
+
+class DecoderProcess:
+    """
+    Runs FFmpeg decoding in a child process and watches it from the parent.
+
+    A hung demux or a lost stream only stalls the child: when no frame arrives
+    for `stall_frames` frame intervals (or `open_timeout` seconds after a
+    spawn) the child is killed and a new one reconnects after `respawn_delay`,
+    instead of waiting for FFmpeg's own timeouts. The delay doubles (up to
+    `max_respawn_delay`) while the new children keep failing before their
+    first frame, so an unreachable camera isn't hammered.
+    """
+    def __init__(self, url: str, options: dict, width: int, height: int, decode_box=None,
+                 decoder_config: dict = None, stall_frames: int = 10, open_timeout: float = 5.0,
+                 fps: float = 30.0, respawn_delay: float = 0.2, max_respawn_delay: float = 10.0):
+        self.url = url
+        self.options = options
+        self.decode_box = decode_box
+        self.decoder_config = decoder_config or {}
+        self.stall_frames = stall_frames
+        self.open_timeout = open_timeout
+        self.default_fps = fps
+        self.respawn_delay = respawn_delay
+        self.max_respawn_delay = max_respawn_delay
+        self.delay = respawn_delay
+        self.ctx = mp.get_context("spawn")
+        share_resource_tracker()
+        self.stop_event = self.ctx.Event()
+        self.ring = SharedFrameRing(width, height)
+        self.process = None
+        self.restarts = 0
+        self.last_seq = 0
+        self._spawned_at = 0.0
+        self._last_frame_at = None
+        self._respawn_at = None
+
+    @classmethod
+    def from_config(cls, url: str, options: dict, width: int, height: int, decode_box, config: dict):
+        config = config or {}
+        return cls(url, options, width, height, decode_box=decode_box, decoder_config=config,
+                   stall_frames=config.get("stall_frames", 10),
+                   open_timeout=config.get("open_timeout", 5.0),
+                   respawn_delay=config.get("respawn_delay", 0.2),
+                   max_respawn_delay=config.get("max_respawn_delay", 10.0))
+
+    @property
+    def fps(self) -> float:
+        fps = int(self.ring.header[self.ring.FPS]) / 1000
+        return fps if fps > 0 else self.default_fps
+
+    @property
+    def mode(self) -> str:
+        """Current skip mode of the child decoder (for the overlay)."""
+        return self.decoder_config.get("skip_mode", 'NONREF') if self.ring.header[self.ring.SKIPPING] else 'DEFAULT'
+
+    def start(self):
+        self.stop_event.clear()
+        self.ring.header[self.ring.SKIPPING] = 0
+        # A child killed halfway through write() leaves its slot's seqlock odd: make every counter even
+        # again (moving forward, so a read in progress still sees it change)
+        self.ring.locks += self.ring.locks % 2
+        self.process = self.ctx.Process(target=decoder_worker,
+                                        args=(self.url, self.options, self.ring.name,
+                                              (self.ring.width, self.ring.height), self.decode_box,
+                                              self.decoder_config, self.stop_event),
+                                        name="decodificador", daemon=True)
+        self.process.start()
+        self._spawned_at = time.perf_counter()
+        self._last_frame_at = None
+        self._respawn_at = None
+
+    def restart(self, reason: str):
+        """Kills the child and schedules a new one (check() spawns it when the delay is over)."""
+        # Back off while the children keep failing before their first frame
+        if self._last_frame_at is not None:
+            self.delay = self.respawn_delay
+        print(f"Decodificador reiniciado ({reason}); nuevo intento en {self.delay:.1f} s")
+        self.kill()
+        self.restarts += 1
+        self._respawn_at = time.perf_counter() + self.delay
+        self.delay = min(self.delay * 2, self.max_respawn_delay)
+
+    def read_into(self, dst: np.ndarray) -> int:
+        """Copies the next new frame into `dst`; returns its sequence number or 0."""
+        seq = self.ring.read_into(dst, self.last_seq)
+        if seq:
+            self.last_seq = seq
+            self._last_frame_at = time.perf_counter()
+        return seq
+
+    def report_lag(self, lag: int):
+        """Tells the child decoder how far behind the consumer is (drives frame skipping)."""
+        self.ring.header[self.ring.LAG] = lag
+
+    def check(self) -> bool:
+        """
+        Watchdog: restarts the child if it died or stalled, and spawns the
+        scheduled one once its delay is over. Raises StreamSizeError if the
+        child found a stream of the wrong size.
+
+        Returns:
+            True if the child was restarted.
+        """
+        now = time.perf_counter()
+        if self.process is not None and self.process.exitcode == STREAM_SIZE_EXIT:
+            raise StreamSizeError(f"The decoder stream {self.url} does not match the configured resolution")
+        if self._respawn_at is not None:
+            if now >= self._respawn_at:
+                self.start()
+            return False
+        if not self.process.is_alive():
+            self.restart(f"terminó con código {self.process.exitcode}")
+            return True
+        if self._last_frame_at is None:
+            if now - self._spawned_at > self.open_timeout:
+                self.restart(f"sin conexión en {self.open_timeout:.1f} s")
+                return True
+        elif now - self._last_frame_at > self.stall_frames / self.fps:
+            self.restart(f"sin frames en {self.stall_frames} intervalos")
+            return True
+        return False
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.stop_event.set()
+            self.process.kill()
+            self.process.join(1)
+
+    def close(self):
+        self.kill()
+        self.ring.close(unlink=True)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+import numpy as np
+
+# Bytes hashed at each end of a file: enough to tell recordings and models apart
+# without reading an hour of video
+_DIGEST_CHUNK = 8 * 1024 * 1024
+
+def file_digest(path: str) -> str:
+    """Hash of a file's size and its first and last chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, "rb") as file:
+        digest.update(file.read(_DIGEST_CHUNK))
+        if size > 2 * _DIGEST_CHUNK:
+            file.seek(-_DIGEST_CHUNK, os.SEEK_END)
+        digest.update(file.read(_DIGEST_CHUNK))
+    return digest.hexdigest()
+
+class DetectionCache:
+    """
+    On-disk model output of a video file, per frame and counting line.
+
+    An entry is what detect_lines produced for a frame: the raw (N, 6)
+    detections of every line that ran the model, or None for the lines that
+    re-emitted their previous detections (no motion). min_confidence and the
+    actuator settings are applied afterwards (extract_positions), so they can
+    be tuned on a cached video too, and so can counter_line and the tracker.
+    The re-emit decisions come from the motion gate over the counting zone,
+    so the gate settings and counter_init/counter_end are part of the key.
+
+    The cache of a key lives in `folder/<key>/` as plain .npy files, loaded
+    memory-mapped. New entries are kept in memory and merged on `save`, which
+    writes meta.json last with the array lengths: files left inconsistent by
+    an interrupted save are detected on load and the cache starts empty.
+    """
+    def __init__(self, folder: str, key: str, lines: int, meta: dict = None):
+        self.path = os.path.join(folder, key)
+        self.lines = lines
+        self.meta = meta or {}
+        self.complete = False
+        self._frames = np.zeros(0, dtype=np.int64)    # Cached frame indices, ascending
+        self._fresh = np.zeros((0, lines), dtype=bool)
+        self._offsets = np.zeros(1, dtype=np.int64)   # Entry (frame i, line j) owns rows offsets[i*lines + j]:...+1
+        self._detections = np.zeros((0, 6), dtype=np.float32)
+        self._index: Dict[int, int] = {}
+        self._pending: Dict[int, List[Optional[np.ndarray]]] = {}
+        self._load()
+
+    @classmethod
+    def from_config(cls, data: dict, lines) -> Optional["DetectionCache"]:
+        """
+        Cache for the configured video and model, or None when it is disabled
+        or the source is a stream.
+        """
+        config = data.get('detection_cache') or {}
+        video_path = data.get('video_path')
+        if not config.get('enabled', False) or not video_path or not os.path.isfile(video_path):
+            return None
+        inference = data.get('inference') or {}
+        gate = data.get('motion_gate') or {}
+        # Compared zone of each ROI (see MotionGate._thumbnail); irrelevant without the gate
+        gated = gate.get('enabled', False)
+        zones = [[] if not gated or gate.get('full_roi', False) else [line.cp.counter_init, line.cp.counter_end]
+                 for line in lines]
+        meta = {
+            "video": os.path.basename(video_path),
+            "video_digest": file_digest(video_path),
+            "model": os.path.basename(data['model_path']),
+            "model_digest": file_digest(data['model_path']),
+            "inference": {key: inference.get(key) for key in ("backend", "imgsz", "int8", "lean")},
+            "motion_gate": {key: gate.get(key) for key in ("scale", "threshold", "max_skip", "full_roi")} if gated else None,
+            "rois": [[line.cp.x, line.cp.y, line.cp.w, line.cp.h] + zone for line, zone in zip(lines, zones)],
+        }
+        key = hashlib.blake2b(json.dumps(meta, sort_keys=True).encode(), digest_size=8).hexdigest()
+        return cls(data['cache_path'], key, len(lines), meta)
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    def _load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.isfile(meta_path):
+            return
+        load = lambda name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            frames, fresh, offsets, detections = (load(name) for name in ("frames", "fresh", "offsets", "detections"))
+            consistent = (len(frames) == len(fresh) == meta.get("frames") and
+                          fresh.shape[1:] == (self.lines,) and
+                          len(offsets) == len(frames) * self.lines + 1 and
+                          len(detections) == offsets[-1] == meta.get("detections"))
+        except (OSError, ValueError) as e:   # JSONDecodeError is a ValueError
+            print(f"Caché de detecciones ilegible en {self.path} ({e}); se ignora")
+            return
+        if not consistent:
+            # Save interrupted between the arrays and meta.json
+            print(f"Caché de detecciones incompleta en {self.path}; se ignora")
+            return
+        self.complete = meta.get("complete", False)
+        self._frames, self._fresh, self._offsets, self._detections = frames, fresh, offsets, detections
+        self._index = {frame: i for i, frame in enumerate(self._frames.tolist())}
+
+    def get(self, frame_index: int) -> Optional[List[Optional[np.ndarray]]]:
+        """The entry of a frame (one array or None per line), or None if it isn't cached."""
+        i = self._index.get(frame_index)
+        if i is None:
+            return self._pending.get(frame_index)
+        entry = []
+        for line in range(self.lines):
+            if self._fresh[i, line]:
+                start, end = self._offsets[i*self.lines + line], self._offsets[i*self.lines + line + 1]
+                entry.append(self._detections[start:end])
+            else:
+                entry.append(None)
+        return entry
+
+    def put(self, frame_index: int, entry: List[Optional[np.ndarray]]):
+        if frame_index not in self._index:
+            self._pending[frame_index] = [None if array is None else np.asarray(array, dtype=np.float32).reshape(-1, 6)
+                                          for array in entry]
+
+    def frames(self) -> List[int]:
+        """Cached frame indices, ascending."""
+        return sorted(list(self._index) + list(self._pending))
+
+    def save(self, complete: bool = None):
+        """
+        Merges the new entries into the files of the key. `complete` marks that
+        the whole video went through (a cache-only recount is possible).
+        """
+        if complete is not None:
+            self.complete = self.complete or complete
+        if not self._pending and not complete:
+            return
+        entries = {frame: self.get(frame) for frame in self.frames()}
+        frames = np.array(sorted(entries), dtype=np.int64)
+        fresh = np.array([[array is not None for array in entries[frame]] for frame in frames],
+                         dtype=bool).reshape(-1, self.lines)
+        arrays = [array for frame in frames for array in entries[frame]]
+        offsets = np.cumsum([0] + [0 if array is None else len(array) for array in arrays]).astype(np.int64)
+        detections = np.concatenate([array for array in arrays if array is not None] or [np.zeros((0, 6))])
+
+        # Everything is copied by now: drop the memory maps so the files can be replaced (Windows)
+        entries = arrays = None
+        self._frames = self._fresh = self._offsets = self._detections = None
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in (("frames", frames), ("fresh", fresh), ("offsets", offsets),
+                            ("detections", detections.astype(np.float32))):
+            target = os.path.join(self.path, f"{name}.npy")
+            with open(target + ".tmp", "wb") as file:
+                np.save(file, array)
+            os.replace(target + ".tmp", target)
+        # Written last and atomically: it only describes arrays that are all in place
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", "w") as file:
+            json.dump(dict(self.meta, frames=len(frames), detections=len(detections), complete=self.complete),
+                      file, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._pending = {}
+        self._load()
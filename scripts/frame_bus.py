@@ -0,0 +1,118 @@
+import time
+from typing import Optional, Tuple
+import numpy as np
+
+class FrameSlot:
+    """Read-only view over a borrowed slot of a FrameBus."""
+    __slots__ = ('index', 'frame', 'seq', 'timestamp', 'direction')
+
+    def __init__(self, index: int, frame: np.ndarray, seq: int, timestamp: float, direction: int):
+        self.index = index
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self.direction = direction
+
+class FrameBus:
+    """
+    Latest-frame ring buffer between one capture thread and one processing thread.
+
+    The writer fills a free slot and publishes it, either in place (frames read
+    from a decoder process) or by handing over an array it already owns (a
+    frame converted by FFmpeg); the reader borrows the newest slot without
+    copying and releases it when done. Older frames that were never borrowed are simply
+    overwritten, so the reader always sees the most recent frame.
+
+    Slot selection follows a Dekker-style handshake: the writer announces the
+    slot it wants before checking the borrowed slot, and the reader announces
+    the slot it borrows before checking the slot being written. Under the GIL
+    every attribute store is sequentially consistent, so at least one side
+    sees the other and no lock is needed.
+    """
+    def __init__(self, width: int = 1920, height: int = 1080, channels: int = 3, slots: int = 3):
+        if slots < 3:
+            raise ValueError("FrameBus needs at least 3 slots (latest, borrowed and writing).")
+        self.width = width
+        self.height = height
+        self.num_slots = slots
+        self.buffers = list(np.zeros((slots, height, width, channels), dtype=np.uint8))
+        self.seqs = [0] * slots
+        self.timestamps = [0.0] * slots
+        self.directions = [1] * slots
+        self.seq = 0            # Sequence number of the latest published frame
+        self.dropped = 0        # Frames overwritten before being borrowed
+        self._latest = -1       # Slot index of the latest published frame
+        self._writing = -1      # Slot index currently owned by the writer
+        self._borrowed = -1     # Slot index currently owned by the reader
+        self._last_read_seq = 0
+        self._next = 0
+
+    # ----- Writer side -----
+    def acquire(self) -> Tuple[int, np.ndarray]:
+        """Returns a free slot index and its buffer to decode the next frame into."""
+        for _ in range(self.num_slots):
+            index = self._next
+            self._next = (self._next + 1) % self.num_slots
+            if index == self._latest:
+                continue
+            self._writing = index
+            if index != self._borrowed:
+                return index, self.buffers[index]
+            self._writing = -1
+        raise RuntimeError("FrameBus has no free slot.")
+
+    def publish(self, index: int, direction: int = 1, timestamp: Optional[float] = None,
+                frame: Optional[np.ndarray] = None):
+        """Marks the acquired slot as the newest frame; `frame` replaces its buffer without copying."""
+        if frame is not None:
+            self.buffers[index] = frame
+        self.seq += 1
+        self.seqs[index] = self.seq
+        self.timestamps[index] = time.perf_counter() if timestamp is None else timestamp
+        self.directions[index] = direction
+        self._writing = -1
+        if self._latest != -1 and self.seqs[self._latest] > self._last_read_seq:
+            self.dropped += 1
+        self._latest = index
+
+    def abort(self, index: int):
+        """Gives back an acquired slot without publishing it (e.g. failed read)."""
+        if self._writing == index:
+            self._writing = -1
+
+    # ----- Reader side -----
+    def borrow(self, last_seq: int = 0, timeout: Optional[float] = None, poll: float = 0.002) -> Optional[FrameSlot]:
+        """
+        Borrows the newest frame newer than `last_seq`.
+
+        Returns:
+            A FrameSlot whose `frame` is a view into the bus, or None on timeout.
+            The slot must be given back with `release()`.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            index = self._latest
+            if index != -1 and self.seqs[index] > last_seq:
+                self._borrowed = index
+                if self._writing != index and self._latest == index:
+                    seq = self.seqs[index]
+                    self._last_read_seq = seq
+                    return FrameSlot(index, self.buffers[index], seq,
+                                     self.timestamps[index], self.directions[index])
+                self._borrowed = -1
+                continue
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def release(self, slot: Optional[FrameSlot] = None):
+        """Gives the borrowed slot back to the writer."""
+        self._borrowed = -1
+
+    def lag(self) -> int:
+        """Frames published since the reader last borrowed one."""
+        return self.seq - self._last_read_seq
+
+    def pending(self, last_seq: int) -> int:
+        """Number of frames published after `last_seq` (0 if the reader is up to date)."""
+        return self.seq - last_seq
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Cold import-time benchmark of the scripts package.
+
+Every statement runs in a fresh interpreter and reports how long the import
+took and which heavy dependencies it pulled in, so utilities and tests that
+only need light modules don't silently start paying for cv2 or torch.
+
+Run from the project root:
+    python scripts/import_benchmark.py
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("cv2", "torch", "ultralytics", "av", "serial", "yaml")
+
+STATEMENTS = [
+    "import scripts",
+    "from scripts import FrameBus, DetectionScheduler, Detections",
+    "from scripts import get_data, get_camera_data",
+    "from scripts import Detector, InferenceClient, DecoderProcess",
+    "from scripts import CameraParameters, Tracker",
+    "from scripts import CameraPipeline",
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(statement: str, repeat: int = 3):
+    """
+    Runs `statement` in `repeat` fresh interpreters.
+
+    Returns:
+        The best import time in seconds and the heavy modules it loaded.
+    """
+    best, heavy = None, []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+                                cwd=str(PROJECT_ROOT), capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best:
+            best = result["seconds"]
+        heavy = result["heavy"]
+    return best, heavy
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import times of the scripts package")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per statement (default: 3)")
+    args = parser.parse_args()
+
+    print(f"{'Statement':<62} {'ms':>8}  heavy modules")
+    for statement in STATEMENTS:
+        seconds, heavy = measure(statement, args.repeat)
+        print(f"{statement:<62} {seconds * 1000:>8.1f}  {', '.join(heavy) or '-'}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
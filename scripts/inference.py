@@ -0,0 +1,177 @@
+import os
+from typing import List
+import numpy as np
+from .datatypes import Detections
+
+BACKENDS = ('torch', 'onnxruntime', 'openvino')
+
+def exported_model_path(model_path: str, backend: str, int8: bool = False) -> str:
+    """Path where ultralytics writes the export of `model_path` for `backend` (next to the .pt)."""
+    stem, _ = os.path.splitext(model_path)
+    if backend == 'onnxruntime':
+        return stem + ".onnx"
+    if backend == 'openvino':
+        return stem + ("_int8_openvino_model" if int8 else "_openvino_model")
+    return model_path
+
+def export_model(model_path: str, backend: str, imgsz: int = 640, int8: bool = False, data: str = None) -> str:
+    """
+    Converts the PyTorch model to the given backend and caches it in the models folder.
+    The export is reused while it is newer than the .pt file.
+
+    INT8 models (OpenVINO only) need a dataset yaml (`data`) for calibration;
+    see scripts/quantize_model.py.
+
+    Returns:
+        The path of the model to load for that backend.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Use one of {BACKENDS}.")
+    if int8 and backend != 'openvino':
+        raise ValueError("INT8 models are only supported with the openvino backend.")
+    target = exported_model_path(model_path, backend, int8)
+    if backend == 'torch':
+        return target
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(model_path):
+        return target
+    if int8 and data is None:
+        raise FileNotFoundError(f"INT8 model not found: {target}. Run scripts/quantize_model.py first.")
+
+    from ultralytics import YOLO
+    print(f"Exportando {model_path} a {backend}{' (INT8)' if int8 else ''}...")
+    export_format = 'onnx' if backend == 'onnxruntime' else 'openvino'
+    if int8:
+        exported = YOLO(model_path).export(format=export_format, imgsz=imgsz, int8=True, data=data)
+    else:
+        exported = YOLO(model_path).export(format=export_format, imgsz=imgsz, dynamic=True)
+    return str(exported).rstrip(os.sep)
+
+class LeanPredictor:
+    """
+    Slim detection path over an ultralytics AutoBackend that skips Results.
+
+    Frames are letterboxed straight into a preallocated uint8 canvas (BGR to
+    RGB on the way in) that is converted and normalised in place into a
+    preallocated input tensor, one pair per batch layout. After NMS the boxes
+    are scaled back to each frame and returned as Detections, without the
+    masks/keypoints/plotting machinery of ultralytics Results.
+    """
+    def __init__(self, model_path: str, imgsz: int = 640, device=None, conf: float = 0.25,
+                 iou: float = 0.7, max_det: int = 300, pad_value: int = 114):
+        import torch
+        from ultralytics.nn.autobackend import AutoBackend
+        self.torch = torch
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.backend = AutoBackend(model_path, device=self.device, fp16=False, fuse=True, verbose=False)
+        self.backend.eval()
+        self.imgsz = imgsz
+        self.stride = int(self.backend.stride)
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.pad_value = pad_value
+        # Minimal rectangle padding like ultralytics, only for models that accept any input size
+        self.rect = self.backend.format == "pt" or getattr(self.backend, "dynamic", False)
+        self._buffers = {}  # frame shapes -> (layout, uint8 canvas, input tensor)
+
+    def _layout(self, shape, auto: bool):
+        """Resized size and padding of a (height, width) frame, as ultralytics LetterBox computes them."""
+        height, width = shape
+        ratio = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = round(width * ratio), round(height * ratio)
+        dw, dh = self.imgsz - new_w, self.imgsz - new_h
+        if auto:
+            dw, dh = dw % self.stride, dh % self.stride
+        top, left = round(dh / 2 - 0.1), round(dw / 2 - 0.1)
+        return (new_w, new_h), (top, left), (new_h + dh, new_w + dw)
+
+    def _buffer(self, shapes):
+        buffer = self._buffers.get(shapes)
+        if buffer is None:
+            auto = self.rect and len(set(shapes)) == 1
+            layouts = [self._layout(shape, auto) for shape in shapes]
+            height, width = layouts[0][2]
+            canvas = np.full((len(shapes), height, width, 3), self.pad_value, dtype=np.uint8)
+            with self.torch.inference_mode():
+                tensor = self.torch.empty((len(shapes), 3, height, width), dtype=self.torch.float32,
+                                          device=self.device)
+            buffer = self._buffers[shapes] = (layouts, canvas, tensor)
+        return buffer
+
+    def preprocess(self, frames: List[np.ndarray]):
+        """Letterboxes the BGR frames into the input tensor of their layout and returns it."""
+        import cv2
+        layouts, canvas, tensor = self._buffer(tuple(frame.shape[:2] for frame in frames))
+        for index, (frame, ((new_w, new_h), (top, left), _)) in enumerate(zip(frames, layouts)):
+            if frame.shape[:2] != (new_h, new_w):
+                frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+            canvas[index, top:top + new_h, left:left + new_w] = frame[..., ::-1]
+        with self.torch.inference_mode():
+            tensor.copy_(self.torch.from_numpy(canvas).permute(0, 3, 1, 2))
+            return tensor.div_(255)
+
+    def __call__(self, source) -> List[Detections]:
+        from ultralytics.utils.nms import non_max_suppression
+        from ultralytics.utils.ops import scale_boxes
+        frames = source if isinstance(source, list) else [source]
+        tensor = self.preprocess(frames)
+        with self.torch.inference_mode():
+            preds = non_max_suppression(self.backend(tensor), self.conf, self.iou, max_det=self.max_det,
+                                        end2end=getattr(self.backend, "end2end", False))
+            detections = []
+            for frame, pred in zip(frames, preds):
+                pred[:, :4] = scale_boxes(tensor.shape[2:], pred[:, :4], frame.shape)
+                detections.append(Detections.from_array(pred[:, :6].cpu().numpy()))
+        return detections
+
+class Detector:
+    """
+    Inference wrapper over the selected backend.
+
+    Calling it with one image or a list of images returns one Detections per
+    image, with the same boxes/conf/cls arrays `extract_positions` consumes.
+    """
+    def __init__(self, model_path: str, backend: str = 'torch', imgsz: int = 640, int8: bool = False,
+                 lean: bool = False):
+        self.backend = backend
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.lean = lean
+        self.model_path = export_model(model_path, backend, imgsz, int8)
+        if backend == 'torch':
+            from torch import cuda as t_cuda
+            from torch import device as t_device
+            self.device = t_device("cuda" if t_cuda.is_available() else "cpu")
+        else:
+            self.device = 'cpu'
+        if lean:
+            self.model = LeanPredictor(self.model_path, imgsz, device=self.device)
+        else:
+            from ultralytics import YOLO
+            self.model = YOLO(self.model_path, task='detect')
+            if backend == 'torch':
+                self.model.to(self.device)
+
+    @classmethod
+    def from_config(cls, model_path: str, config: dict):
+        config = config or {}
+        return cls(model_path,
+                   backend=config.get("backend", 'torch'),
+                   imgsz=config.get("imgsz", 640),
+                   int8=config.get("int8", False),
+                   lean=config.get("lean", False))
+
+    def warmup(self, shapes=None):
+        """
+        Runs one inference on blank frames of the given (height, width) shapes so
+        the first real frame doesn't pay for lazy initialisation (predictor setup,
+        backend graph compilation, CUDA kernels).
+        """
+        shapes = shapes or [(self.imgsz, self.imgsz)]
+        self([np.zeros((height, width, 3), dtype=np.uint8) for height, width in shapes])
+
+    def __call__(self, source) -> List[Detections]:
+        if self.lean:
+            return self.model(source)
+        results = self.model(source, verbose=False, imgsz=self.imgsz)
+        return [Detections.from_results(result) for result in results]
@@ -0,0 +1,270 @@
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from typing import List
+import numpy as np
+from .datatypes import Detections
+from .inference import Detector
+from .startup import roi_shapes
+
+def set_cpu_affinity(cpus) -> bool:
+    """
+    Pins the current process to the given CPU indices (no-op when empty).
+    Uses os.sched_setaffinity on Linux and psutil (if installed) elsewhere.
+    """
+    if not cpus:
+        return False
+    cpus = [int(cpu) for cpu in cpus]
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+            return True
+        import psutil
+        psutil.Process().cpu_affinity(cpus)
+        return True
+    except ImportError:
+        print("Afinidad de CPU no disponible: instalar psutil")
+    except (OSError, ValueError) as e:
+        print(f"No se pudo fijar la afinidad de CPU {cpus}: {e}")
+    return False
+
+def share_resource_tracker():
+    """
+    Starts the shared-memory resource tracker in this process before spawning
+    children, so camera and inference processes register their blocks with the
+    same tracker: blocks of a crashed camera are unlinked when the parent exits
+    and attaching from the worker never unlinks a block still in use.
+    """
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+def close_shared_memory(shm: shared_memory.SharedMemory, unlink: bool = False):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # A view is still alive; the mapping is released when it is collected
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class SharedFrames:
+    """
+    Ring of frame slots in shared memory, written by one camera process.
+
+    A request copies its ROI frames back to back into the next slot and only
+    the block name and the (offset, shape) of each frame go through the queue.
+    The block is created on the first request and grown (under a new name)
+    when a batch does not fit.
+    """
+    def __init__(self, slots: int = 2):
+        self.slots = slots
+        self.slot_size = 0
+        self.shm = None
+        self._next = 0
+
+    def _allocate(self, size: int):
+        self.close()
+        self.slot_size = size + size // 4  # Headroom for slightly larger batches
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_size * self.slots)
+
+    def write(self, frames: List[np.ndarray]):
+        """
+        Returns:
+            The block name and the (offset, shape) of every frame.
+        """
+        size = sum(frame.nbytes for frame in frames)
+        if self.shm is None or size > self.slot_size:
+            self._allocate(size)
+        offset = self._next * self.slot_size
+        self._next = (self._next + 1) % self.slots
+        layout = []
+        for frame in frames:
+            np.copyto(np.ndarray(frame.shape, np.uint8, buffer=self.shm.buf, offset=offset), frame)
+            layout.append((offset, frame.shape))
+            offset += frame.nbytes
+        return self.shm.name, layout
+
+    def close(self):
+        if self.shm is not None:
+            close_shared_memory(self.shm, unlink=True)
+            self.shm = None
+
+def inference_channel(ctx):
+    """
+    (worker end, camera end) of the duplex pipe between one camera and the
+    inference worker. Each camera has its own: a pipe has no lock a killed
+    camera could leave held, and a request is small enough to be written in a
+    single atomic write, so stopping a camera can't block the others.
+    """
+    return ctx.Pipe()
+
+def inference_worker(model_path: str, config: dict, channels: dict, stop_event,
+                     ready=None, cpus=None, max_batch: int = 8, warmup_shapes=None):
+    """
+    Process target that owns the model and serves every camera.
+
+    `channels` maps each camera to the worker end of its inference_channel.
+    Requests are (camera, request_id, block name, layout): the frames are read
+    in place from the camera's shared memory. Pending requests of several
+    cameras are merged into a single batched call, and each camera gets back
+    (request_id, arrays) on its own channel, with one (N, 6) array per frame
+    (see Detections.to_array); arrays is None if inference failed. The model
+    is warmed up on `warmup_shapes`, the (height, width) of the cameras' ROIs.
+    """
+    set_cpu_affinity(cpus)
+    detector = Detector.from_config(model_path, config)
+    detector.warmup(warmup_shapes)
+    print(f"Servidor de inferencia listo: {detector.model_path} ({detector.backend}, {detector.device})")
+    if ready is not None:
+        ready.set()
+    blocks = {}  # camera -> attached SharedMemory
+    channels = dict(channels)
+
+    while not stop_event.is_set() and channels:
+        ready_channels = wait(list(channels.values()), timeout=0.5)
+        batch = []
+        for camera, connection in list(channels.items()):
+            if connection not in ready_channels:
+                continue
+            try:
+                while len(batch) < max_batch and connection.poll():
+                    batch.append(connection.recv())
+            except (EOFError, OSError) as e:
+                print(f"[{camera}] canal de inferencia cerrado: {e}")
+                del channels[camera]
+        if not batch:
+            continue
+
+        frames, served = [], []
+        for camera, request_id, name, layout in batch:
+            shm = blocks.get(camera)
+            if shm is None or shm.name.lstrip("/") != name.lstrip("/"):
+                if shm is not None:
+                    close_shared_memory(shm)
+                    del blocks[camera]
+                try:
+                    shm = blocks[camera] = shared_memory.SharedMemory(name=name)
+                except FileNotFoundError:
+                    # The camera already replaced this block (stale request or restart)
+                    reply(channels, camera, (request_id, None))
+                    continue
+            frames.extend(np.ndarray(shape, np.uint8, buffer=shm.buf, offset=offset) for offset, shape in layout)
+            served.append((camera, request_id, len(layout)))
+
+        packed = None
+        if frames:
+            try:
+                packed = [detection.to_array() for detection in detector(frames)]
+            except Exception as e:
+                print(f"Error en el servidor de inferencia: {e}")
+        frames = None
+
+        start = 0
+        for camera, request_id, count in served:
+            result = None if packed is None else packed[start:start + count]
+            start += count
+            reply(channels, camera, (request_id, result))
+
+    for shm in blocks.values():
+        close_shared_memory(shm)
+
+def reply(channels: dict, camera: str, message):
+    """Sends a response to a camera; a broken channel only drops that camera."""
+    channel = channels.get(camera)
+    if channel is None:
+        return
+    try:
+        channel.send(message)
+    except OSError as e:
+        print(f"[{camera}] canal de inferencia cerrado: {e}")
+        del channels[camera]
+
+class InferenceClient:
+    """
+    Stand-in for a Detector inside a camera process: writes the ROI frames to
+    shared memory, asks the inference worker for them and waits for its
+    detections. While it waits the camera process only blocks on a queue, so
+    capture and display keep the GIL.
+    """
+    def __init__(self, channel, camera: str, timeout: float = 5.0, ready=None,
+                 startup_timeout: float = 120.0, model_path: str = "", backend: str = ""):
+        self.channel = channel    # Camera end of its inference_channel
+        self.camera = camera
+        self.timeout = timeout
+        self.ready = ready
+        self.startup_timeout = startup_timeout
+        self.model_path = model_path
+        self.backend = backend
+        self.device = "servidor de inferencia"
+        self.frames = SharedFrames()
+        self._count = 0
+
+    def __call__(self, source) -> List[Detections]:
+        if self.ready is not None and not self.ready.wait(self.startup_timeout):
+            raise TimeoutError("The inference worker is not ready")
+        frames = source if isinstance(source, list) else [source]
+        self._count += 1
+        # The pid makes ids unique across restarts of the camera process
+        request_id = (os.getpid(), self._count)
+        name, layout = self.frames.write(frames)
+        self.channel.send((self.camera, request_id, name, layout))
+
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if not self.channel.poll(max(remaining, 0.001)):
+                raise TimeoutError(f"No response from the inference worker after {self.timeout} s")
+            response_id, packed = self.channel.recv()
+            if response_id == request_id:
+                break
+            # Stale answer of a request that already timed out
+
+        if packed is None:
+            raise RuntimeError("The inference worker failed on this batch")
+        return [Detections.from_array(array) for array in packed]
+
+    def close(self):
+        self.frames.close()
+
+class InferenceWorker:
+    """Inference process owned by a single-camera pipeline (inference.worker in params.yaml)."""
+    CAMERA = "local"
+
+    def __init__(self, model_path: str, config: dict, cpus=None, timeout: float = 5.0, warmup_shapes=None):
+        self.model_path = model_path
+        self.config = config or {}
+        self.timeout = timeout
+        ctx = mp.get_context("spawn")
+        share_resource_tracker()
+        self.stop_event = ctx.Event()
+        self.ready = ctx.Event()
+        worker_end, self.channel = inference_channel(ctx)
+        self.process = ctx.Process(target=inference_worker,
+                                   args=(model_path, self.config, {self.CAMERA: worker_end},
+                                         self.stop_event, self.ready, cpus),
+                                   kwargs={'warmup_shapes': warmup_shapes},
+                                   name="inferencia", daemon=True)
+
+    @classmethod
+    def from_config(cls, data: dict):
+        config = data['inference']
+        return cls(data['model_path'], config, cpus=config.get("cpus"), timeout=config.get("timeout", 5.0),
+                   warmup_shapes=roi_shapes(data))
+
+    def start(self) -> InferenceClient:
+        """Starts the process and returns the client to pass as the pipeline model."""
+        self.process.start()
+        return InferenceClient(self.channel, self.CAMERA,
+                               timeout=self.timeout, ready=self.ready, model_path=self.model_path,
+                               backend=self.config.get("backend", "torch"))
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,65 @@
+import cv2
+
+class MotionGate:
+    """
+    Skips inference while the conveyor is idle.
+
+    A downsampled grayscale copy of the counting zone (counter_init..counter_end)
+    is compared with the one taken at the last inference. While the mean absolute
+    difference stays below `threshold`, the previous detections are re-emitted
+    instead of running the model. Inference is still forced every `max_skip`
+    frames so slow drifts and the actuator are never missed for long.
+    """
+    def __init__(self, cam_params, scale: float = 0.25, threshold: float = 3.0,
+                 max_skip: int = 15, full_roi: bool = False, enabled: bool = True):
+        self.cp = cam_params
+        self.scale = scale
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.full_roi = full_roi
+        self.enabled = enabled
+        self.skipped = 0          # Consecutive frames served from the cache
+        self.score = 0.0          # Last measured difference
+        self._reference = None
+        self._cached = None
+
+    @classmethod
+    def from_config(cls, cam_params, config: dict):
+        config = config or {}
+        return cls(cam_params,
+                   scale=config.get("scale", 0.25),
+                   threshold=config.get("threshold", 3.0),
+                   max_skip=config.get("max_skip", 15),
+                   full_roi=config.get("full_roi", False),
+                   enabled=config.get("enabled", False))
+
+    def _thumbnail(self, roi_frame):
+        zone = roi_frame if self.full_roi else roi_frame[:, self.cp.counter_init:self.cp.counter_end]
+        small = cv2.resize(zone, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def has_motion(self, roi_frame) -> bool:
+        """True if the model must run on this frame."""
+        if not self.enabled:
+            return True
+        thumbnail = self._thumbnail(roi_frame)
+        if self._reference is None or self._cached is None or self.skipped >= self.max_skip:
+            moving = True
+        else:
+            self.score = float(cv2.absdiff(thumbnail, self._reference).mean())
+            moving = self.score > self.threshold
+
+        if moving:
+            self._reference = thumbnail
+            self.skipped = 0
+        else:
+            self.skipped += 1
+        return moving
+
+    def store(self, positions, actuator_pos):
+        """Keeps the positions (structured array) of the last inference to re-emit them while idle."""
+        self._cached = (positions, actuator_pos)
+
+    def reuse(self):
+        """Returns the last positions and actuator position."""
+        return self._cached
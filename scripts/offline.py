@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Sharded offline processing of a recorded video.
+
+The video is split into time segments and each worker process decodes its
+segment and runs batched inference on the ROIs that moved (motion gate).
+The detections of all segments go to the DetectionCache of the video, and
+the tracker then replays them in frame order in this process: it is the
+cheap part and stays sequential, so its state carries across segment
+boundaries. The packages are written to the usual CSV of each counting
+line, timed on the video clock.
+
+Differences with a sequential run of the same video:
+  - Each segment starts with a fresh motion gate, so the first frames of a
+    segment are always inferred where a sequential run may have re-emitted
+    the previous detections. With motion_gate disabled the detections, and
+    so the counts, are the same.
+  - A recording carries no chain direction (serial port): it is taken as
+    constant, left to right unless --direction -1 is given.
+
+Run from the project root:
+    python scripts/offline.py media/operation_1920x1080.mp4 --workers 4
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from scripts.counting_line import TemporalBatcher, apply_cached_detections, build_counting_lines, recount_cached  # noqa: E402
+from scripts.detection_cache import DetectionCache  # noqa: E402
+from scripts.utils import append_packages_csv, get_data  # noqa: E402
+
+def segment_bounds(frame_count: int, segments: int) -> List[Tuple[int, int]]:
+    """Splits [0, frame_count) into `segments` contiguous (start, end) ranges of near-equal length."""
+    segments = max(1, min(segments, frame_count))
+    edges = np.linspace(0, frame_count, segments + 1).round().astype(int).tolist()
+    return [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+
+def video_info(video_path: str) -> Tuple[int, int, int, float]:
+    """(width, height, frame count, fps) of a video file."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"No se pudo abrir el video: {video_path}")
+    info = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    cap.release()
+    return info
+
+def detect_segment(data: dict, start: int, end: int, batch_size: int = 8, threads: int = None, model=None):
+    """
+    Worker: decodes frames [start, end) and runs the model on the ROIs the
+    motion gate lets through, `batch_size` ROIs per call (TemporalBatcher).
+    The model is loaded from the config unless given.
+
+    Returns:
+        The DetectionCache entries as (frame index, entry) and the number of ROIs inferred.
+    """
+    import cv2
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    cap = cv2.VideoCapture(data['video_path'])
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    lines = build_counting_lines(data, width, height)
+    if model is None:
+        from scripts.inference import Detector
+        model = Detector.from_config(data['model_path'], data['inference'])
+    batcher = TemporalBatcher(model, lines, batch_size)
+
+    entries = []
+    for frame_index in range(start, end):
+        success, frame = cap.read()
+        if not success:
+            break
+        for index, _, entry in batcher.push(frame_index, [line.crop(frame) for line in lines]):
+            apply_cached_detections(lines, entry)   # Keeps the motion gates in step, as in a live run
+            entries.append((index, entry))
+    entries += [(index, entry) for index, _, entry in batcher.flush()]
+    cap.release()
+    return entries, batcher.inferred
+
+def process_video(data: dict, workers: int = None, segments: int = None, batch_size: int = 8,
+                  direction: int = 1) -> Optional[List]:
+    """
+    Detects the whole video in parallel segments (unless its DetectionCache is
+    already complete), replays the tracker over it with a constant chain
+    `direction` and appends the packages to the CSV of each line.
+
+    Returns:
+        The counting lines after the replay.
+    """
+    # Offline runs always go through the cache: a second audit of the same video is a recount
+    data = dict(data, detection_cache=dict(data.get('detection_cache') or {}, enabled=True),
+                tracker=dict(data.get('tracker') or {}, record=False))
+    width, height, frame_count, fps = video_info(data['video_path'])
+    lines = build_counting_lines(data, width, height)
+    cache = DetectionCache.from_config(data, lines)
+
+    if not cache.complete:
+        workers = workers or os.cpu_count() or 1
+        bounds = segment_bounds(frame_count, segments or workers)
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"{frame_count} frames en {len(bounds)} segmentos, {workers} procesos de {threads} hilos")
+        start = time.perf_counter()
+        inferred = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as executor:
+            futures = [executor.submit(detect_segment, data, first, last, batch_size, threads) for first, last in bounds]
+            for future in futures:
+                entries, count = future.result()
+                inferred += count
+                for frame_index, entry in entries:
+                    cache.put(frame_index, entry)
+        cache.save(complete=True)
+        elapsed = time.perf_counter() - start
+        print(f"Detección: {elapsed:.1f} s ({len(cache) / elapsed:.1f} frames/s, {inferred} ROIs inferidos)")
+
+    start = time.perf_counter()
+    closed = recount_cached(lines, cache, direction)
+    print(f"Seguimiento: {time.perf_counter() - start:.2f} s")
+
+    # Video clock: the file was last written when the recording ended
+    video_start = os.path.getmtime(data['video_path']) - frame_count / fps
+    for line, frames in zip(lines, closed):
+        append_packages_csv(line.csv_filename, line.list_counter, when=[video_start + frame / fps for frame in frames])
+        print(f"  {line.name}: paquetes {line.list_counter} -> {line.csv_filename}")
+    return lines
+
+def main():
+    data = get_data(str(PROJECT_ROOT))
+    parser = argparse.ArgumentParser(description="Count a recorded video offline with parallel batched inference")
+    parser.add_argument("video", nargs="?", default=data['video_path'], help="Video file (default: input_video)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--segments", type=int, default=None, help="Time segments (default: one per worker)")
+    parser.add_argument("--batch", type=int, default=8, help="ROIs per inference call (default: 8)")
+    parser.add_argument("--direction", type=int, choices=(1, -1), default=1,
+                        help="Chain direction of the whole video: 1 left to right, -1 right to left (default: 1)")
+    parser.add_argument("--csv-name", default=None, help="CSV name without extension (default: contador_varillas_<video>)")
+    args = parser.parse_args()
+
+    if not args.video or not os.path.isfile(args.video):
+        print(f"El modo offline necesita un archivo de video: {args.video}")
+        return 1
+    data['video_path'] = args.video
+    data['csv_name'] = args.csv_name or f"contador_varillas_{Path(args.video).stem}"
+    process_video(data, args.workers, args.segments, args.batch, args.direction)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
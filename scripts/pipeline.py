@@ -0,0 +1,466 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import cv2
+import numpy as np
+from .capture import check_stream_size, copy_frame_into, RoiFilter, DecoderTuner, StreamSizeError
+from .counting_line import build_counting_lines, detect_lines, roi_bounds, compose_frames, composed_size
+from .decoder_process import DecoderProcess
+from .frame_bus import FrameBus
+from .logger import Logger
+from .scheduler import DetectionScheduler
+from .startup import Startup, open_serial, load_detector
+
+# Options tuned for unstable RTSP connections (PyAV)
+FFMPEG_OPTIONS = {
+    'rtsp_transport': 'tcp',
+    'fflags': 'nobuffer',
+    'flags': 'low_delay',
+    'max_delay': '500000',
+    'analyzeduration': '100000',
+    'probesize': '1024',
+    'tune': 'zerolatency',
+    'framedrop': '1',
+    'avioflags': 'direct',
+    'flush_packets': '1',
+    'timeout': '5000000',
+    'reconnect': '1',
+    'reconnect_at_eof': '1',
+    'reconnect_streamed': '1',
+    'reconnect_delay_max': '5',
+    'stimeout': '5000000',
+    'heartbeat_interval': '10'
+}
+
+def read_direction(ser, last_direction: int) -> int:
+    """Reads the conveyor direction sent by the ESP32 ('10': -1, '00': 0, otherwise 1)."""
+    if ser and ser.in_waiting > 0:
+        try:
+            line = ser.readline().decode('utf-8').strip()
+            if len(line) == 2 and all(c in '01' for c in line):
+                if line == '10':
+                    return -1
+                if line == '00':
+                    return 0
+                return 1
+        except Exception as e:
+            print(f"Error en serial: {e}")
+    return last_direction
+
+class CameraPipeline:
+    """
+    Capture, processing, display (and optional recording) threads of one camera.
+
+    Frames are decoded with PyAV into a FrameBus; the processing thread crops the
+    counting lines, runs one batched inference and tracks each line. `model` may
+    be any callable returning one Detections per image (a Detector, or an
+    InferenceClient to run the model in another process); when None a Detector
+    is loaded (and warmed up) from the config while the stream connects.
+    """
+    def __init__(self, data: dict, model=None, show: bool = True, heartbeat=None):
+        self.data = data
+        self.model = model
+        self.show = show
+        self.heartbeat = heartbeat    # Shared value updated with the time of the last processed frame
+        self.name = data.get('camera_name')
+        self.window_name = "YOLO Detection" if self.name is None else f"YOLO Detection - {self.name}"
+        self.rtsp_url = data['video_path']
+        # Detection source: low-resolution substream if configured; then the main
+        # stream is only opened for recording (generate_video)
+        self.separate_detection = data['detection_video_path'] is not None
+        self.detection_url = data['detection_video_path'] if self.separate_detection else self.rtsp_url
+        self.source_width, self.source_height = data['source_resolution']
+        width, height = data['detection_resolution'] if self.separate_detection else data['source_resolution']
+
+        # Counting lines (ROIs in main stream coordinates, scaled to the detection source)
+        self.lines = build_counting_lines(data, self.source_width, self.source_height,
+                                          detection_size=(width, height) if self.separate_detection else None)
+        # With roi_decode the decoder only delivers the box containing every ROI
+        self.roi_decode = data['roi_decode']
+        self.decode_box = roi_bounds(self.lines) if self.roi_decode else (0, 0, width, height)
+        for line in self.lines:
+            line.origin = self.decode_box[:2]
+
+        self.frame_bus = FrameBus(self.decode_box[2], self.decode_box[3], slots=3)
+        self.processed_frame_queue = queue.Queue(maxsize=2)
+        self.stop_event = threading.Event()
+        self.scheduler = DetectionScheduler.from_config(data['scheduler'])
+        self.decoder_tuner = DecoderTuner.from_config(data['decoder'])
+        self.decoder = None           # DecoderProcess when decoding runs in a child process
+        self.stream_size_error = None # StreamSizeError that stopped the camera (restarting can't fix it)
+        self.startup = Startup()      # Startup steps run in parallel and their timings
+        self._serial_future = None
+
+    @property
+    def decoder_mode(self) -> str:
+        if self.decoder is not None:
+            return f"{self.decoder.mode} ({self.decoder.restarts} reinicios)"
+        return self.decoder_tuner.mode
+
+    @property
+    def serial(self):
+        """Serial port once it finished opening in the background (None until then or on error)."""
+        future = self._serial_future
+        return future.result() if future is not None and future.done() else None
+
+    # ===== Capture (PyAV) and serial =====
+    def capture_thread(self):
+        if self.data['decoder'].get('subprocess', False):
+            self.subprocess_capture_thread()
+            return
+        import av
+        from av.error import FFmpegError
+        print("Hilo de captura iniciado (PyAV)")
+        last_direction = 1  # Default direction (left to right)
+
+        while not self.stop_event.is_set():
+            try:
+                container = av.open(self.detection_url, options=FFMPEG_OPTIONS)
+                stream = container.streams.video[0]
+                self.decoder_tuner.configure(stream)
+                roi_filter = RoiFilter(*self.decode_box) if self.roi_decode else None
+                print(f"Conexión RTSP establecida: {self.detection_url}")
+                size_checked = False
+
+                for packet in container.demux(stream):
+                    if self.stop_event.is_set():
+                        break
+                    for frame in packet.decode():
+                        if self.stop_event.is_set():
+                            break
+                        if not size_checked:
+                            check_stream_size(frame.width, frame.height, self.decode_box, self.roi_decode)
+                            size_checked = True
+                        # Crop the ROI and convert to BGR inside FFmpeg
+                        if roi_filter is not None:
+                            frame = roi_filter.process(frame)
+
+                        # The BGR frame FFmpeg converted goes to the bus as is (a view, no copy)
+                        frame_array = frame.to_ndarray(format='bgr24')
+                        slot_index, _ = self.frame_bus.acquire()
+
+                        last_direction = read_direction(self.serial, last_direction)
+                        # Publish frame and direction (the reader always takes the newest)
+                        self.frame_bus.publish(slot_index, direction=last_direction, frame=frame_array)
+                        if self.frame_bus.seq == 1:
+                            self.startup.mark("primer frame decodificado")
+                        # Skip non-reference frames while processing lags behind
+                        self.decoder_tuner.update(self.frame_bus.lag())
+
+            except StreamSizeError as e:
+                # Reconnecting can't fix the configuration: stop this camera once
+                print(f"[ERROR] {e}")
+                self.stream_size_error = e
+                container.close()
+                return
+
+            except FFmpegError as e:
+                print(f"Error de conexión (PyAV): {e}")
+                last_direction = read_direction(self.serial, last_direction)
+                # The display thread keeps the last frame while reconnecting
+                print("Reintentando conexión en 2 segundos...")
+                time.sleep(2)
+
+            except Exception as e:
+                print(f"Error inesperado en captura (PyAV): {e}")
+                last_direction = read_direction(self.serial, last_direction)
+                print("Reintentando conexión en 5 segundos...")
+                time.sleep(5)
+
+        print("Hilo de captura terminado")
+
+    def subprocess_capture_thread(self):
+        """
+        Capture with FFmpeg in a child process (decoder.subprocess): this thread
+        copies its frames into the bus, reads the serial port and respawns the
+        decoder as soon as frames stop arriving.
+        """
+        print("Hilo de captura iniciado (decodificador en subproceso)")
+        last_direction = 1  # Default direction (left to right)
+        decoder = DecoderProcess.from_config(self.detection_url, FFMPEG_OPTIONS,
+                                             self.decode_box[2], self.decode_box[3],
+                                             self.decode_box if self.roi_decode else None, self.data['decoder'])
+        self.decoder = decoder
+        decoder.start()
+        print(f"Decodificador iniciado: {self.detection_url}")
+
+        try:
+            while not self.stop_event.is_set():
+                slot_index, slot_buffer = self.frame_bus.acquire()
+                if decoder.read_into(slot_buffer):
+                    last_direction = read_direction(self.serial, last_direction)
+                    self.frame_bus.publish(slot_index, direction=last_direction)
+                    if self.frame_bus.seq == 1:
+                        self.startup.mark("primer frame decodificado")
+                    # Skip non-reference frames in the child while processing lags behind
+                    decoder.report_lag(self.frame_bus.lag())
+                    continue
+                self.frame_bus.abort(slot_index)
+                last_direction = read_direction(self.serial, last_direction)
+                try:
+                    decoder.check()
+                except StreamSizeError as e:
+                    # Respawning can't fix the configuration: stop this camera once
+                    print(f"[ERROR] {e}")
+                    self.stream_size_error = e
+                    return
+                time.sleep(0.002)
+        finally:
+            decoder.close()
+        print("Hilo de captura terminado")
+
+    # ===== YOLO processing and actuator =====
+    def processing_thread(self):
+        data = self.data
+        lines = self.lines
+        frame_bus = self.frame_bus
+        scheduler = self.scheduler
+        frame_count = 0
+
+        # Model and warm-up load while the stream and the serial port open
+        model = self.model
+        if model is None:
+            # Warm up on the ROIs as cropped (scaled to the detection substream)
+            model = self.startup.run("modelo + warm-up", load_detector, data,
+                                     shapes=[(line.cp.h, line.cp.w) for line in lines])
+        print(f"Modelo YOLO cargado: {model.model_path} ({model.backend})")
+        print(f"Usando dispositivo: {model.device}")
+        print(f"Líneas de conteo: {', '.join(line.name for line in lines)}")
+
+        storage_path = data['storage_path'] if data['storage_data'] else None
+        logger = Logger(output_dir=data['logger_path'], storage_path=storage_path)
+        video_writer = None
+
+        # With a separate detection source, recording_thread records at full resolution
+        if data['generate_video'] and not self.separate_detection:
+            output_path = data['output_path']
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            fps = 30.0
+            frame_size = composed_size(lines)
+            video_writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+            if not video_writer.isOpened():
+                print(f"[ERROR] Could not initialize video writer for {output_path}")
+                video_writer = None
+            else:
+                print(f"Video writer initialized: {output_path} at {fps} FPS, size {frame_size}")
+
+        print("Hilo de procesamiento iniciado")
+        last_seq = 0
+        while not self.stop_event.is_set():
+            # Borrow the newest frame (no copy), honouring the scheduler stride
+            slot = frame_bus.borrow(last_seq + scheduler.stride - 1, timeout=0.5)
+            if slot is None:
+                continue
+            last_seq = slot.seq
+            try:
+                direction = slot.direction
+                roi_views = [line.crop(slot.frame) for line in lines]
+
+                # One batch with the moving ROIs; idle lines re-emit their last detections
+                frame_gap = scheduler.begin(slot.seq)
+                if detect_lines(model, lines, roi_views):
+                    scheduler.end()
+                else:
+                    scheduler.cancel()
+
+                # Only the ROIs are copied for drawing; the slot goes back to the capture thread
+                roi_frames = [roi_view.copy() for roi_view in roi_views]
+                frame_bus.release(slot)
+                slot = None
+
+                # Actuator and tracking per line (tracking only while the chain moves)
+                for line, roi_frame in zip(lines, roi_frames):
+                    line.update(roi_frame, direction, frame_gap=frame_gap, track=direction != 0)
+                roi_frame = compose_frames(roi_frames)
+
+                if data['debug']:
+                    logger.log(roi_frame, frame_count)
+                frame_count += 1
+                if frame_count == 1:
+                    self.startup.mark("primer frame procesado")
+                    self.startup.report()
+                if self.heartbeat is not None:
+                    self.heartbeat.value = time.time()
+
+                if video_writer is not None:
+                    video_writer.write(roi_frame.copy())
+
+                # Keep only the newest processed frames
+                if self.processed_frame_queue.full():
+                    try:
+                        self.processed_frame_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                self.processed_frame_queue.put(roi_frame)
+
+            except Exception as e:
+                print(f"Error en procesamiento: {str(e)}")
+                traceback.print_exc()
+            finally:
+                if slot is not None:
+                    frame_bus.release(slot)
+
+        if video_writer is not None:
+            video_writer.release()
+            print("Video writer released")
+        for line in lines:
+            line.close()
+        if hasattr(model, 'close'):
+            model.close()  # Shared memory of the inference client
+        print("Hilo de procesamiento terminado")
+
+    # ===== Recording from the main stream =====
+    def recording_thread(self):
+        """Records the ROIs at full resolution when detection uses the substream."""
+        import av
+        from av.error import FFmpegError
+        data = self.data
+        print("Hilo de grabación iniciado")
+        output_path = data['output_path']
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Box containing every ROI, in main stream coordinates
+        record_x, record_y, record_w, record_h = roi_bounds(build_counting_lines(data, self.source_width, self.source_height))
+        frame_size = (record_w, record_h)
+        roi_filter = RoiFilter(record_x, record_y, record_w, record_h)
+        roi_buffer = np.zeros((record_h, record_w, 3), dtype=np.uint8)
+        video_writer = None
+
+        while not self.stop_event.is_set():
+            try:
+                container = av.open(self.rtsp_url, options=FFMPEG_OPTIONS)
+                stream = container.streams.video[0]
+                # Recording needs every frame: threads only, no skipping
+                DecoderTuner.from_config(data['decoder']).configure(stream, adaptive=False)
+                if video_writer is None:
+                    fps = float(stream.average_rate) if stream.average_rate else 30.0
+                    video_writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+                    if not video_writer.isOpened():
+                        print(f"[ERROR] Could not initialize video writer for {output_path}")
+                        container.close()
+                        break
+                    print(f"Video writer initialized: {output_path} at {fps} FPS, size {frame_size}")
+
+                size_checked = False
+                for packet in container.demux(stream):
+                    if self.stop_event.is_set():
+                        break
+                    for frame in packet.decode():
+                        if not size_checked:
+                            check_stream_size(frame.width, frame.height, (record_x, record_y, record_w, record_h), True)
+                            size_checked = True
+                        copy_frame_into(roi_filter.process(frame), roi_buffer)
+                        video_writer.write(roi_buffer)
+                container.close()
+
+            except StreamSizeError as e:
+                print(f"[ERROR] {e}")
+                self.stream_size_error = e
+                container.close()
+                break
+
+            except FFmpegError as e:
+                print(f"Error de conexión en grabación (PyAV): {e}")
+                print("Reintentando conexión en 2 segundos...")
+                time.sleep(2)
+            except Exception as e:
+                print(f"Error inesperado en grabación (PyAV): {e}")
+                print("Reintentando conexión en 5 segundos...")
+                time.sleep(5)
+
+        if video_writer is not None:
+            video_writer.release()
+            print("Video writer released")
+        print("Hilo de grabación terminado")
+
+    # ===== Display =====
+    def display_thread(self):
+        print("Hilo de visualización iniciado")
+        if self.show:
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+
+        last_frame = None
+        fps = 0
+        frame_count = 0
+        last_time = time.time()
+
+        while not self.stop_event.is_set():
+            try:
+                processed_frame = self.processed_frame_queue.get(timeout=0.5)
+                last_frame = processed_frame
+                frame_count += 1
+                current_time = time.time()
+                elapsed = current_time - last_time
+                if elapsed >= 1.0:
+                    fps = frame_count / elapsed
+                    frame_count = 0
+                    last_time = current_time
+            except queue.Empty:
+                processed_frame = last_frame  # Keep showing the last frame
+                if processed_frame is None:
+                    continue
+
+            if not self.show:
+                continue
+
+            display_frame = processed_frame
+            cv2.putText(display_frame, f"FPS: {fps:.1f}", (400, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Descartados: {self.frame_bus.dropped}", (400, 90),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Procesados: {self.processed_frame_queue.qsize()}/2", (400, 120),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Salto: {self.scheduler.stride} ({self.scheduler.skipped})", (400, 150),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Decodificador: {self.decoder_mode}", (400, 180),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.imshow(self.window_name, display_frame)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                self.stop_event.set()
+                break
+
+        if self.show:
+            cv2.destroyWindow(self.window_name)
+        print("Hilo de visualización terminado")
+
+    def run(self) -> bool:
+        """
+        Starts the threads and waits until they finish.
+
+        Returns:
+            True on a normal stop ('q' or Ctrl+C), False if a thread died unexpectedly
+            (see stream_size_error for a stream that doesn't match the configuration).
+        """
+        threads = [
+            threading.Thread(target=self.capture_thread, daemon=True),
+            threading.Thread(target=self.processing_thread, daemon=True),
+            threading.Thread(target=self.display_thread, daemon=True)
+        ]
+        # The ESP32 needs ~2 s after opening the port; it opens while the stream connects
+        data = self.data
+        self._serial_future = self.startup.submit("serial", open_serial, data['serial_port'],
+                                                  data['serial_baud_rate'], data['serial_timeout'])
+        if self.data['generate_video'] and self.separate_detection:
+            threads.append(threading.Thread(target=self.recording_thread, daemon=True))
+
+        for t in threads:
+            t.start()
+
+        ok = True
+        try:
+            while any(t.is_alive() for t in threads):
+                if not self.stop_event.is_set() and not all(t.is_alive() for t in threads):
+                    print("Un hilo terminó inesperadamente, deteniendo la cámara...")
+                    ok = False
+                    self.stop_event.set()
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            print("Deteniendo todos los hilos...")
+        ser = self.serial
+        if ser and ser.is_open:
+            ser.close()
+        return ok
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Script to quantize the rod counter model to INT8 (OpenVINO) using our own dataset.
+Calibrates on the tiles produced by resize_training_folders.py / split_dataset.py,
+writes the quantized model next to the .pt in models/ and reports latency, rod
+count and mAP changes against the FP32 models.
+
+Run from the project root:
+    python scripts/quantize_model.py --dataset-path dataset/dataset_varillas
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from scripts.inference import Detector, export_model, exported_model_path  # noqa: E402
+from scripts.utils import read_yaml_file  # noqa: E402
+
+
+def write_dataset_yaml(dataset_path, names, output_path):
+    """Create the ultralytics dataset yaml used for calibration and validation."""
+    dataset_yaml = {
+        "path": str(Path(dataset_path).resolve()),
+        "train": "train/images",
+        "val": "val/images",
+        "names": dict(names),
+    }
+    with open(output_path, "w") as file:
+        yaml.safe_dump(dataset_yaml, file, sort_keys=False)
+    return output_path
+
+
+def get_val_images(dataset_path, max_images=None):
+    """Get the validation images of the split dataset."""
+    images_dir = Path(dataset_path) / "val" / "images"
+    if not images_dir.exists():
+        raise FileNotFoundError(f"Validation images not found: {images_dir}")
+    images = sorted(list(images_dir.glob("*.png")) + list(images_dir.glob("*.jpg")))
+    if max_images:
+        images = images[:max_images]
+    return images
+
+
+def benchmark(detector, images, min_confidence, warmup=3):
+    """
+    Run the detector over the images.
+
+    Returns:
+        Latencies in ms and the number of rods (class 0) detected per image.
+    """
+    for image in images[:warmup]:
+        detector(cv2.imread(str(image)))
+
+    latencies, counts = [], []
+    for image in images:
+        frame = cv2.imread(str(image))
+        start = time.perf_counter()
+        detection = detector(frame)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts.append(int(((detection.conf > min_confidence) & (detection.cls == 0)).sum()))
+    return np.array(latencies), np.array(counts)
+
+
+def evaluate_map(model_path, data_yaml, imgsz):
+    """Validate the model on the val split and return (mAP50, mAP50-95)."""
+    from ultralytics import YOLO
+    metrics = YOLO(model_path, task="detect").val(data=data_yaml, imgsz=imgsz, split="val",
+                                                    batch=1, plots=False, verbose=False)
+    return metrics.box.map50, metrics.box.map
+
+
+def quantize(model_path, dataset_path, imgsz=640, min_confidence=0.75, max_images=None, skip_map=False):
+    """
+    Quantize the model to INT8 and compare it with the FP32 models.
+
+    Args:
+        model_path: Path to the .pt model
+        dataset_path: Path to the split dataset (train/ and val/ folders)
+        imgsz: Inference image size
+        min_confidence: Confidence used to count rods (same as params.yaml)
+        max_images: Limit of validation images used for latency and counts
+        skip_map: Skip the (slow) mAP validation
+    """
+    from ultralytics import YOLO
+    names = YOLO(model_path).names
+    data_yaml = write_dataset_yaml(dataset_path, names, Path(dataset_path) / "quantization.yaml")
+    print(f"Dataset yaml: {data_yaml}")
+
+    # Quantize (calibration with the dataset images); always recalibrate
+    previous_export = exported_model_path(model_path, "openvino", int8=True)
+    if os.path.exists(previous_export):
+        print(f"Removing previous INT8 export: {previous_export}")
+        shutil.rmtree(previous_export)
+    int8_path = export_model(model_path, "openvino", imgsz, int8=True, data=str(data_yaml))
+    print(f"INT8 model written to: {int8_path}")
+
+    images = get_val_images(dataset_path, max_images)
+    print(f"Benchmarking on {len(images)} validation images...")
+
+    variants = [
+        ("FP32 torch", Detector(model_path, backend="torch", imgsz=imgsz)),
+        ("FP32 openvino", Detector(model_path, backend="openvino", imgsz=imgsz)),
+        ("INT8 openvino", Detector(model_path, backend="openvino", imgsz=imgsz, int8=True)),
+    ]
+    results = []
+    reference_counts = None
+    for name, detector in variants:
+        latencies, counts = benchmark(detector, images, min_confidence)
+        if reference_counts is None:
+            reference_counts = counts
+        maps = (float("nan"), float("nan")) if skip_map else evaluate_map(detector.model_path, str(data_yaml), imgsz)
+        results.append({
+            "name": name,
+            "p50": np.percentile(latencies, 50),
+            "p95": np.percentile(latencies, 95),
+            "rods": int(counts.sum()),
+            "count_mae": float(np.abs(counts - reference_counts).mean()),
+            "map50": maps[0],
+            "map": maps[1],
+        })
+
+    base = results[0]
+    print(f"\n{'Model':<15} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'rods':>6} {'count MAE':>10} {'mAP50':>7} {'mAP50-95':>9}")
+    for row in results:
+        speedup = base["p50"] / row["p50"] if row["p50"] > 0 else float("nan")
+        print(f"{row['name']:<15} {row['p50']:>8.2f} {row['p95']:>8.2f} {speedup:>7.2f}x {row['rods']:>6} "
+              f"{row['count_mae']:>10.3f} {row['map50']:>7.3f} {row['map']:>9.3f}")
+
+    int8 = results[-1]
+    print(f"\nRod count change vs FP32: {int8['rods'] - base['rods']:+d} "
+          f"({int8['count_mae']:.3f} rods/image mean absolute difference)")
+    if not skip_map:
+        print(f"mAP50 change vs FP32: {int8['map50'] - base['map50']:+.4f}")
+    return results
+
+
+def main():
+    config_data = read_yaml_file(str(PROJECT_ROOT / "config" / "params.yaml")) or {}
+    folders_data = config_data.get("folders", {})
+    default_model = PROJECT_ROOT / folders_data.get("models", "models") / config_data.get("model", "")
+    default_confidence = config_data.get("tracker", {}).get("min_confidence", 0.75)
+
+    parser = argparse.ArgumentParser(description="Quantize the rod counter model to INT8 and compare it with FP32")
+    parser.add_argument(
+        "--model",
+        default=str(default_model),
+        help="Path to the .pt model (default: model in config/params.yaml)"
+    )
+    parser.add_argument(
+        "--dataset-path",
+        default="dataset/dataset_varillas",
+        help="Path to the split dataset directory (default: dataset/dataset_varillas)"
+    )
+    parser.add_argument(
+        "--imgsz",
+        type=int,
+        default=config_data.get("inference", {}).get("imgsz", 640),
+        help="Inference image size (default: inference.imgsz in params.yaml)"
+    )
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        default=default_confidence,
+        help=f"Confidence used to count rods (default: {default_confidence})"
+    )
+    parser.add_argument(
+        "--max-images",
+        type=int,
+        default=None,
+        help="Limit of validation images for latency and counts (default: all)"
+    )
+    parser.add_argument(
+        "--skip-map",
+        action="store_true",
+        help="Skip the mAP validation"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        quantize(args.model, args.dataset_path, args.imgsz, args.min_confidence, args.max_images, args.skip_map)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Recording and replay of the tracker inputs of a counting line.
+
+DetectionRecorder stores, for every processed frame, the rod positions
+(extract_positions), the chain direction, the actuator position, the frame
+gap and whether the line tracked. Replaying a recording runs the same
+handle_actuator + Tracker sequence as CountingLine.update without a camera or
+a model, thousands of frames per second, so package counts and tracker
+latency can be checked offline.
+
+Run from the project root:
+    python scripts/replay.py output/test_operation_linea_1.npz --expect 52,48,50
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from scripts.CamParameters import CameraParameters  # noqa: E402
+from scripts.datatypes import POSITION_DTYPE  # noqa: E402
+from scripts.tracker import Tracker  # noqa: E402
+from scripts.utils import handle_actuator  # noqa: E402
+
+class DetectionRecorder:
+    """Accumulates the tracker inputs of one counting line and writes them as a single .npz."""
+    def __init__(self, path: str, cam_params: CameraParameters):
+        self.path = path
+        self.cp = cam_params
+        self.positions: List[np.ndarray] = []
+        self.frames = []    # (direction, actuator x, actuator y, frame_gap, track) per frame
+
+    def __len__(self):
+        return len(self.frames)
+
+    def record(self, positions: np.ndarray, direction: int, actuator_pos, frame_gap: int = 1, track: bool = True):
+        self.positions.append(positions.copy())
+        self.frames.append((direction, actuator_pos[0], actuator_pos[1], frame_gap, track))
+
+    def save(self):
+        """Writes the recording (compressed). Nothing is written before the first frame."""
+        if not self.frames:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        frames = np.array(self.frames, dtype=np.int32).reshape(-1, 5)
+        np.savez_compressed(self.path,
+                            positions=np.concatenate(self.positions).astype(POSITION_DTYPE, copy=False),
+                            offsets=np.cumsum([0] + [len(positions) for positions in self.positions]),
+                            direction=frames[:, 0].astype(np.int8),
+                            actuator=frames[:, 1:3],
+                            frame_gap=frames[:, 3],
+                            track=frames[:, 4].astype(bool),
+                            roi=np.array([self.cp.w, self.cp.h, self.cp.counter_init, self.cp.counter_end,
+                                          self.cp.counter_line]),
+                            displacement=np.float64(self.cp.displacement),
+                            edge_threshold=np.float64(self.cp.edge_threshold))
+        print(f"Grabación de detecciones guardada: {self.path} ({len(self.frames)} frames)")
+
+@dataclass
+class Recording:
+    """Tracker inputs of a counting line (see DetectionRecorder)."""
+    positions: np.ndarray   # Positions of every frame back to back
+    offsets: np.ndarray     # Frame i owns positions[offsets[i]:offsets[i + 1]]
+    direction: np.ndarray
+    actuator: np.ndarray
+    frame_gap: np.ndarray
+    track: np.ndarray
+    roi: np.ndarray         # w, h, counter_init, counter_end, counter_line
+    displacement: float
+    edge_threshold: float = 15.0   # Missing in recordings made before it was configurable
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as archive:
+            return cls(**{name: archive[name] for name in archive.files})
+
+    def __len__(self):
+        return len(self.direction)
+
+    def cam_params(self) -> CameraParameters:
+        w, h, counter_init, counter_end, counter_line = (int(value) for value in self.roi)
+        cam_params = CameraParameters(w, h, x=0, y=0, w=w, h=h)
+        cam_params.update_limits(counter_init, counter_end, counter_line)
+        cam_params.displacement = float(self.displacement)
+        cam_params.edge_threshold = float(self.edge_threshold)
+        return cam_params
+
+    def frames(self):
+        """Yields (positions, direction, actuator_pos, frame_gap, track) per frame, as the pipeline passed them."""
+        offsets = self.offsets.tolist()
+        actuator = self.actuator.tolist()
+        for i, (direction, frame_gap, track) in enumerate(zip(self.direction.tolist(), self.frame_gap.tolist(),
+                                                              self.track.tolist())):
+            yield self.positions[offsets[i]:offsets[i + 1]], direction, tuple(actuator[i]), frame_gap, track
+
+@dataclass
+class ReplayResult:
+    list_counter: List[int]
+    rod_count: int
+    latencies: np.ndarray = field(repr=False)  # Seconds per frame (handle_actuator + Tracker.update)
+
+    @property
+    def fps(self) -> float:
+        total = float(self.latencies.sum())
+        return len(self.latencies) / total if total > 0 else float("inf")
+
+    def percentiles(self, q=(50, 95, 99)) -> dict:
+        """Per-frame latency percentiles in microseconds."""
+        if not len(self.latencies):
+            return {p: 0.0 for p in q}
+        return dict(zip(q, (np.percentile(self.latencies, q) * 1e6).tolist()))
+
+def run_replay(recording: Recording, tracker_config: dict = None, cam_params: CameraParameters = None) -> ReplayResult:
+    """
+    Runs the recorded frames through handle_actuator and Tracker in the order
+    CountingLine.update does, with the recorded geometry unless `cam_params` is given.
+    """
+    cam_params = cam_params if cam_params is not None else recording.cam_params()
+    tracker = Tracker.from_config(cam_params, tracker_config)
+    list_counter, store_package, actuactor_count = [], False, 0
+    frames = list(recording.frames())
+    latencies = np.empty(len(frames))
+    clock = time.perf_counter
+    for i, (positions, direction, actuator_pos, frame_gap, track) in enumerate(frames):
+        start = clock()
+        list_counter, store_package, actuactor_count = handle_actuator(cam_params, actuator_pos, list_counter, tracker,
+                                                                       store_package, actuactor_count)
+        if track:
+            tracker.update(positions, direction, None, frame_gap=frame_gap)
+            store_package = False
+            actuactor_count = 0
+        else:
+            tracker.halt()
+        latencies[i] = clock() - start
+    return ReplayResult(list_counter, tracker.rod_count, latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a detection recording through the tracker")
+    parser.add_argument("recording", help="Recording written by DetectionRecorder (.npz)")
+    parser.add_argument("--expect", default=None, help="Golden package counts, comma separated")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays; latencies are from the fastest (default: 3)")
+    parser.add_argument("--predict", action="store_true", help="Associate around predicted positions (tracker.predict)")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    tracker_config = {"predict": args.predict}
+    result = min((run_replay(recording, tracker_config) for _ in range(max(1, args.repeat))),
+                 key=lambda result: result.latencies.sum())
+
+    percentiles = result.percentiles()
+    print(f"Frames: {len(recording)}  ({result.fps:,.0f} frames/s)")
+    print("Latencia por frame: " + "  ".join(f"p{p} {us:.1f} us" for p, us in percentiles.items()))
+    print(f"Paquetes: {result.list_counter}  (varillas en curso: {result.rod_count})")
+
+    if args.expect is not None:
+        expected = [int(count) for count in args.expect.split(",") if count.strip()]
+        if result.list_counter != expected:
+            print(f"Conteo distinto al esperado: {expected}")
+            return 1
+        print("Conteo igual al esperado")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,69 @@
+import math
+import time
+from collections import deque
+
+class DetectionScheduler:
+    """
+    Picks how many frames to skip between detections from the measured inference latency.
+
+    With a rolling mean latency L and a target rate F, detecting every
+    ceil(L * F) frames keeps the pipeline in step with the source instead of
+    letting queues (or the camera buffer) fill up. The real gap between two
+    detected frames is returned so the tracker can scale its thresholds.
+    """
+    def __init__(self, target_fps: float = 30.0, window: int = 30, max_stride: int = 4, enabled: bool = True):
+        self.target_fps = target_fps
+        self.max_stride = max_stride
+        self.enabled = enabled
+        self.latencies = deque(maxlen=window)
+        self.stride = 1
+        self.skipped = 0        # Frames not sent to detection
+        self.last_gap = 1
+        self.last_index = None
+        self._start = None
+
+    @classmethod
+    def from_config(cls, config: dict):
+        config = config or {}
+        return cls(target_fps=config.get("target_fps", 30.0),
+                   window=config.get("window", 30),
+                   max_stride=config.get("max_stride", 4),
+                   enabled=config.get("enabled", False))
+
+    @property
+    def mean_latency(self) -> float:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def should_detect(self, frame_index: int) -> bool:
+        """True if `frame_index` is due for detection with the current stride."""
+        if self.last_index is None:
+            return True
+        return frame_index - self.last_index >= self.stride
+
+    def begin(self, frame_index: int) -> int:
+        """
+        Registers a detection on `frame_index` and starts timing it.
+
+        Returns:
+            The number of frames elapsed since the previous detection (1 = no skip).
+        """
+        gap = 1 if self.last_index is None else max(1, frame_index - self.last_index)
+        self.skipped += gap - 1
+        self.last_gap = gap
+        self.last_index = frame_index
+        self._start = time.perf_counter()
+        return gap
+
+    def cancel(self):
+        """Drops the current timing (e.g. the model was not run on this frame)."""
+        self._start = None
+
+    def end(self):
+        """Stops timing the current detection and updates the stride."""
+        if self._start is None:
+            return
+        self.latencies.append(time.perf_counter() - self._start)
+        self._start = None
+        if self.enabled:
+            stride = math.ceil(self.mean_latency * self.target_fps)
+            self.stride = max(1, min(self.max_stride, stride))
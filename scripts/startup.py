@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple
+
+class Startup:
+    """
+    Runs the independent startup steps (stream, serial port, model) in parallel
+    and keeps how long each one took, to print a single timing breakdown.
+    """
+    def __init__(self, max_workers: int = 4):
+        self.t0 = time.perf_counter()
+        self.timings = {}   # name -> (start offset, duration) in seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup")
+
+    def _timed(self, name: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.timings[name] = (start - self.t0, time.perf_counter() - start)
+
+    def run(self, name: str, fn, *args, **kwargs):
+        """Runs a step in the calling thread."""
+        return self._timed(name, fn, *args, **kwargs)
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future:
+        """Starts a step in the background; `.result()` re-raises its errors."""
+        return self._executor.submit(self._timed, name, fn, *args, **kwargs)
+
+    def mark(self, name: str):
+        """Records a milestone (e.g. the first processed frame)."""
+        self.timings[name] = (time.perf_counter() - self.t0, 0.0)
+
+    def report(self):
+        total = time.perf_counter() - self.t0
+        print("Tiempos de arranque:")
+        for name, (offset, duration) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f"  {name:<26} {duration * 1000:9.1f} ms  (inicio +{offset * 1000:.1f} ms)")
+        print(f"  {'total':<26} {total * 1000:9.1f} ms")
+        self._executor.shutdown(wait=False)
+
+def open_capture(video_path: str, fourcc: str = None):
+    """Opens the stream with OpenCV keeping a single frame in its buffer."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FPS, 30)
+    if fourcc is not None:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    return cap
+
+def open_serial(port: str, baud_rate: int, timeout: float, settle: float = 2.0):
+    """
+    Opens the ESP32 serial port, waits `settle` seconds for it to reboot and
+    drops its boot log. Returns None if the port can't be opened.
+    """
+    import serial
+    try:
+        ser = serial.Serial(port, baud_rate, timeout=timeout)
+    except serial.SerialException as e:
+        print(f"Error al abrir {port}: {e}")
+        return None
+    time.sleep(settle)
+    ser.reset_input_buffer()
+    print(f"Conexión serial establecida: {port}")
+    return ser
+
+def roi_shapes(data: dict) -> List[Tuple[int, int]]:
+    """
+    (height, width) of the ROI frames a CameraPipeline with this config sends
+    to the model: the configured ROIs, scaled to the detection substream if
+    there is one (as build_counting_lines does).
+    """
+    from .CamParameters import CameraParameters
+    width, height = data['source_resolution']
+    detection_size = data['detection_resolution'] if data.get('detection_video_path') else None
+    shapes = []
+    for roi in data['rois']:
+        cam_params = CameraParameters(width, height, x=roi['x_init'], y=roi['y_init'],
+                                      w=roi['roi_width'], h=roi['roi_height'])
+        if detection_size is not None and tuple(detection_size) != (width, height):
+            cam_params = cam_params.scaled(*detection_size)
+        shapes.append((cam_params.h, cam_params.w))
+    return shapes
+
+def load_detector(data: dict, warmup: bool = True, shapes: List[Tuple[int, int]] = None):
+    """
+    Loads the configured Detector and warms it up with blank frames of the given
+    (height, width) `shapes`, those of the counting lines (default: the
+    configured ROI sizes).
+    """
+    from .inference import Detector
+    detector = Detector.from_config(data['model_path'], data['inference'])
+    if warmup:
+        detector.warmup(shapes or [(roi['roi_height'], roi['roi_width']) for roi in data['rois']])
+    return detector
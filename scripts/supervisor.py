@@ -0,0 +1,170 @@
+import multiprocessing as mp
+import sys
+import time
+from typing import List
+from .decoder_process import STREAM_SIZE_EXIT
+from .inference_server import inference_channel, inference_worker, set_cpu_affinity, share_resource_tracker, InferenceClient
+from .startup import roi_shapes
+
+def camera_worker(data: dict, channel, ready, heartbeat, timeout: float):
+    """Process target running the pipeline of one camera with the shared inference worker."""
+    from .pipeline import CameraPipeline
+    set_cpu_affinity(data.get('cpus'))
+    client = InferenceClient(channel, data['camera_name'], timeout=timeout, ready=ready,
+                             model_path=data['model_path'], backend=data['inference'].get('backend', 'torch'))
+    pipeline = CameraPipeline(data, model=client, show=data.get('show', True), heartbeat=heartbeat)
+    ok = pipeline.run()
+    if pipeline.stream_size_error is not None:
+        sys.exit(STREAM_SIZE_EXIT)
+    sys.exit(0 if ok else 1)
+
+class ManagedProcess:
+    """A child process that is restarted with exponential backoff when it fails."""
+    def __init__(self, name: str, target, args: tuple, restart_delay: float, max_restart_delay: float):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.delay = restart_delay
+        self.process = None
+        self.started_at = 0.0
+        self.restart_at = None
+        self.restarts = 0
+        self.finished = False
+
+    def start(self, ctx):
+        self.process = ctx.Process(target=self.target, args=self.args, name=self.name, daemon=False)
+        self.process.start()
+        self.started_at = time.time()
+        self.restart_at = None
+
+    def schedule_restart(self, reason: str):
+        # Back off while the process keeps failing right after starting
+        if time.time() - self.started_at > 60.0:
+            self.delay = self.restart_delay
+        print(f"[{self.name}] {reason}; reiniciando en {self.delay:.0f} s")
+        self.restart_at = time.time() + self.delay
+        self.delay = min(self.delay * 2, self.max_restart_delay)
+
+    def stop(self, timeout: float = 5.0):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+
+class Supervisor:
+    """
+    Runs one pipeline process per camera plus one shared inference process.
+
+    Each camera process gets its own CPU affinity ('cpus' in the camera config)
+    and hands its ROI frames to the inference worker through shared memory
+    (see InferenceClient) over a channel of its own, so the model is loaded
+    once for the whole bay and stopping one camera can't block the others. A
+    camera that crashes, exits with an error or stops producing frames for
+    `stall_timeout` seconds is restarted on its own; the others keep
+    running. A camera closed with 'q', or whose stream doesn't match the
+    configured resolution, is not restarted.
+    """
+    def __init__(self, data: dict, cameras: List[dict], inference_cpus=None, restart_delay: float = 2.0,
+                 max_restart_delay: float = 30.0, stall_timeout: float = 30.0,
+                 startup_timeout: float = 90.0, request_timeout: float = 5.0, max_batch: int = 8):
+        self.data = data
+        self.cameras = cameras
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        # spawn on every platform: forking a process with torch/FFmpeg threads is unsafe
+        self.ctx = mp.get_context("spawn")
+        share_resource_tracker()
+        self.stop_event = self.ctx.Event()
+        self.ready = self.ctx.Event()   # Set by the inference worker once the model is loaded
+        # Kept open here across restarts: a new camera process picks up the same channel
+        self.channels = {camera['camera_name']: inference_channel(self.ctx) for camera in cameras}
+        self.heartbeats = {camera['camera_name']: self.ctx.Value('d', 0.0) for camera in cameras}
+
+        self.inference = ManagedProcess("inferencia", inference_worker,
+                                        (data['model_path'], data['inference'],
+                                         {name: worker_end for name, (worker_end, _) in self.channels.items()},
+                                         self.stop_event, self.ready, inference_cpus, max_batch,
+                                         [shape for camera in cameras for shape in roi_shapes(camera)]),
+                                        restart_delay, max_restart_delay)
+        self.camera_processes = [ManagedProcess(camera['camera_name'], camera_worker,
+                                                (camera, self.channels[camera['camera_name']][1], self.ready,
+                                                 self.heartbeats[camera['camera_name']], request_timeout),
+                                                restart_delay, max_restart_delay)
+                                 for camera in cameras]
+
+    @classmethod
+    def from_config(cls, data: dict, cameras: List[dict]):
+        config = data.get('supervisor') or {}
+        return cls(data, cameras,
+                   inference_cpus=config.get("inference_cpus"),
+                   restart_delay=config.get("restart_delay", 2.0),
+                   max_restart_delay=config.get("max_restart_delay", 30.0),
+                   stall_timeout=config.get("stall_timeout", 30.0),
+                   startup_timeout=config.get("startup_timeout", 90.0),
+                   request_timeout=config.get("request_timeout", 5.0),
+                   max_batch=config.get("max_batch", 8))
+
+    def start(self):
+        self.inference.start(self.ctx)
+        for managed in self.camera_processes:
+            self.heartbeats[managed.name].value = 0.0
+            managed.start(self.ctx)
+        print(f"Supervisor: {len(self.camera_processes)} cámara(s) en ejecución")
+
+    def _stalled(self, managed: ManagedProcess) -> bool:
+        last_frame = self.heartbeats[managed.name].value
+        if last_frame == 0.0:
+            return time.time() - managed.started_at > self.startup_timeout
+        return time.time() - last_frame > self.stall_timeout
+
+    def poll(self):
+        """Checks every child once and restarts the failed ones."""
+        for managed in [self.inference] + self.camera_processes:
+            if managed.finished:
+                continue
+            if managed.restart_at is not None:
+                if time.time() >= managed.restart_at:
+                    managed.restarts += 1
+                    if managed is not self.inference:
+                        self.heartbeats[managed.name].value = 0.0
+                    managed.start(self.ctx)
+                continue
+
+            if not managed.process.is_alive():
+                if managed is self.inference:
+                    # Cameras wait for the new worker instead of timing out every request
+                    self.ready.clear()
+                if managed.process.exitcode == 0 and managed is not self.inference:
+                    print(f"[{managed.name}] detenida")
+                    managed.finished = True
+                elif managed.process.exitcode == STREAM_SIZE_EXIT and managed is not self.inference:
+                    # A restart would fail the same way until the configuration is fixed
+                    print(f"[{managed.name}] detenida: la resolución del stream no coincide con la configuración")
+                    managed.finished = True
+                else:
+                    managed.schedule_restart(f"terminó con código {managed.process.exitcode}")
+            elif managed is not self.inference and self._stalled(managed):
+                managed.stop()
+                managed.schedule_restart("sin frames procesados")
+
+    def stop(self):
+        self.stop_event.set()
+        for managed in self.camera_processes + [self.inference]:
+            managed.stop()
+        print("Supervisor detenido")
+
+    def run(self, interval: float = 1.0):
+        """Supervises the children until every camera is closed or Ctrl+C."""
+        self.start()
+        try:
+            while not all(managed.finished for managed in self.camera_processes):
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            print("Deteniendo supervisor...")
+        finally:
+            self.stop()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep of the counting geometry and the tracker thresholds.
+
+Replays labelled detection recordings (see scripts/replay.py) with many
+configurations across a process pool and ranks them by package count error.
+The labels file lists recordings of the same counting line and their true
+package counts, and optionally the search space as [start, stop, step]
+(inclusive) or a fixed value per parameter:
+
+    recordings:
+      - path: output/test_operation_linea_1.npz
+        packages: [52, 48, 50]
+    search:
+      counter_line: [330, 410, 10]
+      displacement: -15
+
+Parameters without a range are searched around the recorded values. The
+best configuration is written as a params.yaml snippet, in the ROI pixels of
+the recordings (the same as params.yaml unless detection runs on a scaled
+substream).
+
+Run from the project root:
+    python scripts/sweep.py config/sweep.yaml --trials 500 --output sweep_best.yaml
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from scripts.replay import Recording, run_replay  # noqa: E402
+from scripts.utils import read_yaml_file  # noqa: E402
+
+PARAMETERS = ("counter_init", "counter_end", "counter_line", "displacement", "edge_threshold")
+
+def default_search(recording: Recording) -> Dict[str, list]:
+    """Ranges around the geometry and thresholds the recording was made with."""
+    cam_params = recording.cam_params()
+    search = {name: [getattr(cam_params, name) - 60, getattr(cam_params, name) + 60, 10]
+              for name in ("counter_init", "counter_end", "counter_line")}
+    search["displacement"] = [-30, -5, 5]
+    search["edge_threshold"] = [5, 30, 5]
+    return search
+
+def candidate_values(spec) -> list:
+    """Values of one parameter: a fixed value or an inclusive [start, stop, step] range."""
+    if not isinstance(spec, (list, tuple)):
+        return [spec]
+    start, stop, step = spec
+    count = int(round((stop - start) / step)) + 1
+    return [start + i * step for i in range(count)]
+
+def is_valid(config: dict) -> bool:
+    return config["counter_init"] < config["counter_line"] < config["counter_end"] and config["displacement"] <= 0
+
+def configurations(search: Dict[str, list], trials: int = None, seed: int = 0) -> List[dict]:
+    """
+    The full grid of valid configurations, or `trials` distinct ones drawn at
+    random when the grid is larger.
+    """
+    values = {name: candidate_values(search[name]) for name in PARAMETERS}
+    size = 1
+    for options in values.values():
+        size *= len(options)
+    if trials is None or trials >= size:
+        grid = (dict(zip(PARAMETERS, combination)) for combination in itertools.product(*values.values()))
+        return [config for config in grid if is_valid(config)]
+
+    rng = random.Random(seed)
+    seen, configs = set(), []
+    for _ in range(trials * 20):
+        combination = tuple(rng.choice(values[name]) for name in PARAMETERS)
+        config = dict(zip(PARAMETERS, combination))
+        if combination not in seen and is_valid(config):
+            seen.add(combination)
+            configs.append(config)
+            if len(configs) == trials:
+                break
+    return configs
+
+def package_error(counted: List[int], expected: List[int]) -> int:
+    """Rods counted wrong over the packages, a missing or extra package counting all its rods."""
+    error = sum(abs(a - b) for a, b in zip(counted, expected))
+    longer = counted if len(counted) > len(expected) else expected
+    return error + sum(longer[min(len(counted), len(expected)):])
+
+# Recordings of a worker process, loaded once by _load_recordings
+_recordings: List[Tuple[Recording, List[int]]] = []
+_tracker_config: dict = {}
+
+def _load_recordings(labelled: List[Tuple[str, List[int]]], tracker_config: dict):
+    global _recordings, _tracker_config
+    _recordings = [(Recording.load(path), packages) for path, packages in labelled]
+    _tracker_config = tracker_config
+
+def evaluate(config: dict) -> Tuple[int, List[List[int]]]:
+    """Total package error of a configuration and the packages counted in each recording."""
+    error, counts = 0, []
+    for recording, expected in _recordings:
+        cam_params = recording.cam_params()
+        cam_params.update_limits(config["counter_init"], config["counter_end"], config["counter_line"])
+        cam_params.displacement = config["displacement"]
+        cam_params.edge_threshold = config["edge_threshold"]
+        counted = run_replay(recording, _tracker_config, cam_params).list_counter
+        error += package_error(counted, expected)
+        counts.append(counted)
+    return error, counts
+
+def sweep(labelled: List[Tuple[str, List[int]]], configs: List[dict], workers: int = None,
+          tracker_config: dict = None) -> List[Tuple[int, dict, List[List[int]]]]:
+    """
+    Evaluates every configuration on the labelled recordings.
+
+    Returns:
+        (error, config, counts) per configuration, best first (ties keep the given order).
+    """
+    tracker_config = tracker_config or {}
+    if workers is not None and workers <= 1:
+        _load_recordings(labelled, tracker_config)
+        results = list(map(evaluate, configs))
+    else:
+        processes = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes, initializer=_load_recordings,
+                                 initargs=(labelled, tracker_config)) as executor:
+            results = list(executor.map(evaluate, configs, chunksize=max(1, len(configs) // (8 * processes))))
+    ranked = [(error, config, counts) for config, (error, counts) in zip(configs, results)]
+    ranked.sort(key=lambda result: result[0])
+    return ranked
+
+def yaml_snippet(config: dict, error: int) -> str:
+    import yaml
+    snippet = {
+        "camera": {name: int(config[name]) for name in ("counter_init", "counter_end", "counter_line")},
+        "tracker": {"displacement": float(config["displacement"]), "edge_threshold": float(config["edge_threshold"])},
+    }
+    header = f"# Mejor configuracion del barrido (error total: {error} varillas)\n"
+    return header + yaml.safe_dump(snippet, sort_keys=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep counter lines and tracker thresholds over labelled recordings")
+    parser.add_argument("labels", help="YAML with the recordings, their package counts and the search space")
+    parser.add_argument("--trials", type=int, default=300, help="Random configurations (default: 300)")
+    parser.add_argument("--grid", action="store_true", help="Evaluate the full grid instead")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random search (default: 0)")
+    parser.add_argument("--top", type=int, default=10, help="Configurations shown (default: 10)")
+    parser.add_argument("--predict", action="store_true", help="Associate around predicted positions (tracker.predict)")
+    parser.add_argument("--output", default=None, help="Write the best configuration as a YAML snippet")
+    args = parser.parse_args()
+
+    labels = read_yaml_file(args.labels) or {}
+    labelled = [(str(PROJECT_ROOT / entry["path"]), list(entry["packages"])) for entry in labels.get("recordings", [])]
+    if not labelled:
+        print(f"Sin grabaciones etiquetadas en {args.labels}")
+        return 1
+
+    base = Recording.load(labelled[0][0])
+    search = default_search(base)
+    search.update(labels.get("search") or {})
+    configs = configurations(search, None if args.grid else args.trials, args.seed)
+    recorded = {name: getattr(base.cam_params(), name) for name in PARAMETERS}
+    if recorded not in configs:
+        configs.append(recorded)  # Reference: the configuration the recordings were made with
+    # Among equal errors the ranking keeps this order: smallest change to the recorded configuration first
+    configs.sort(key=lambda config: sum(abs(config[name] - recorded[name]) for name in PARAMETERS))
+
+    print(f"{len(configs)} configuraciones x {len(labelled)} grabaciones")
+    ranked = sweep(labelled, configs, args.workers, {"predict": args.predict})
+
+    reference = next(error for error, config, _ in ranked if config == recorded)
+    print(f"Configuracion grabada: error {reference}")
+    print(f"{'error':>6}  " + "  ".join(f"{name:>14}" for name in PARAMETERS) + "  paquetes")
+    for error, config, counts in ranked[:args.top]:
+        print(f"{error:>6}  " + "  ".join(f"{config[name]:>14}" for name in PARAMETERS) + f"  {counts}")
+
+    error, best, _ = ranked[0]
+    snippet = yaml_snippet(best, error)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(snippet)
+        print(f"Mejor configuracion guardada en {args.output}")
+    else:
+        print(snippet)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,40 +1,127 @@
+from .association import estimate_shift, match_tracks, match_window
 from .datatypes import Rod
-from copy import deepcopy
 from typing import List, Dict, Tuple, Set
-import cv2
 import numpy as np
 
 class Tracker:
-    def __init__(self,
-                 center_points_cur_frame: List[Rod],
-                 frame: np.ndarray,
-                 cam_params,
-                 direction: int,
-                 debug: bool = False):
-        sorted_points = sorted(center_points_cur_frame, key = lambda point: point.pos_x)
-        if direction == 1:
-            sorted_points.reverse()
-        self.rods_cur_frame = sorted_points
-        self.frame = frame
+    """
+    Rod tracker of one counting line, kept alive across frames.
+
+    `update` builds the rods of a new frame from its positions, associates
+    them with the current tracks and keeps that frame's zones as the previous
+    ones for the next call. Tracks live in an insertion-ordered dict (oldest
+    first), so FIFO eviction pops from its front in place. `reset` starts a
+    new package (see handle_actuator).
+
+    Every matched track carries a smoothed x velocity (px/frame). With
+    `predict`, once the chain velocity is known the zone-count heuristics are
+    replaced by matching around the predicted positions
+    `pos_x + vel_x * frame_gap` (see _associate_predicted), which keeps
+    working when detection runs every few frames or frames are dropped. The
+    heuristics still run until the first velocity estimate (start, stop,
+    reversal) and always with `predict` off.
+    """
+    def __init__(self, cam_params, debug: bool = False, predict: bool = False, smoothing: float = 0.5,
+                 max_misses: int = 2):
         self.cp = cam_params
-        self.direction = direction
         self.debug = debug
-        self.rods_zone_init, self.rods_zone_tracking, self.rods_zone_end = self._zone_rods(self.rods_cur_frame)
+        self.predict = predict
+        self.smoothing = smoothing
+        self.max_misses = max_misses
+        self.frame = None
+        self.direction = 1
+        self.frame_gap = 1
+        self.displacement = self.cp.displacement
+        self.velocity = None    # Median track velocity of the chain in px/frame (None = unknown)
+        self.rods_cur_frame: List[Rod] = []
+        self.rods_zone_init, self.rods_zone_tracking, self.rods_zone_end = [], [], []
+        self.reset()
+
+    def reset(self):
+        """Drops the tracks, the count and the previous frame."""
+        self.track_id = 1
+        self.tracking_objects: Dict[int, Rod] = {}
         self.rod_count = 0
         self.counted_track_ids: Set[int] = set()
-
-    def _zone_rods(self, rods: List[Rod]) -> Tuple[List[Rod], List[Rod], List[Rod]]:
+        self.rods_prev_frame: List[Rod] = []
+        self.rods_zone_init_prev, self.rods_zone_tracking_prev, self.rods_zone_end_prev = [], [], []
+
+    @classmethod
+    def from_config(cls, cam_params, config: dict, debug: bool = False):
+        config = config or {}
+        return cls(cam_params, debug=debug,
+                   predict=config.get("predict", False),
+                   smoothing=config.get("velocity_smoothing", 0.5),
+                   max_misses=config.get("max_misses", 2))
+
+    def halt(self):
+        """The chain stopped or reversed: the velocity estimates no longer hold."""
+        self.velocity = None
+        for rod in self.tracking_objects.values():
+            rod.vel_x = None
+
+    def _predicted_x(self, rod: Rod) -> float:
+        """Where the rod of a track should be in this frame."""
+        velocity = rod.vel_x if rod.vel_x is not None else self.velocity
+        return rod.pos_x if velocity is None else rod.pos_x + velocity * self.frame_gap
+
+    def _update_velocities(self, pairs: List[Tuple[Rod, Rod]]):
+        """
+        Updates the velocities from the (previous, current) rods of the matched tracks.
+
+        The chain velocity follows the shift that lines up the rods of the
+        previous and current frames (estimate_shift; the median displacement of
+        the pairs without a previous frame) and never points against the
+        direction of motion. Each track smooths its own measurement, clipped to
+        `cp.displacement` per gap around the chain velocity, so one wrong match
+        can't send its prediction off.
         """
-        Sorts a list of points into three spatial zones based on their x-coordinate.
+        if not pairs or not self.predict:
+            return
+        measured = [(rod_curr.pos_x - rod_prev.pos_x) / self.frame_gap for rod_prev, rod_curr in pairs]
+        shift = estimate_shift([self.direction*rod.pos_x for rod in self.rods_prev_frame],
+                               [self.direction*rod.pos_x for rod in self.rods_cur_frame], abs(self.cp.displacement),
+                               expected=None if self.velocity is None else self.direction*self.velocity*self.frame_gap)
+        chain = self.direction*shift / self.frame_gap if shift is not None else float(np.median(measured))
+        if self.direction*chain < 0:
+            chain = 0.0
+        self.velocity = chain if self.velocity is None else self.smoothing*chain + (1 - self.smoothing)*self.velocity
+        band = abs(self.cp.displacement) / self.frame_gap
+        for (rod_prev, rod_curr), velocity in zip(pairs, measured):
+            velocity = min(max(velocity, self.velocity - band), self.velocity + band)
+            previous = rod_prev.vel_x if rod_prev.vel_x is not None else self.velocity
+            rod_curr.vel_x = self.smoothing*velocity + (1 - self.smoothing)*previous
+
+    def _zone_rods(self, positions: np.ndarray) -> Tuple[List[Rod], List[Rod], List[Rod], List[Rod]]:
+        """
+        Builds the rods of a frame sorted along the direction of motion and splits
+        them into three spatial zones based on their x-coordinate. The zone
+        boundaries come from a binary search on the x-sorted positions.
 
         Returns:
-            A tuple containing three lists of points for the init, tracking, and end zones.
+            The sorted rods and the lists of rods in the init, tracking, and end zones.
         """
-        zone_init = [rod for rod in rods if rod.pos_x < self.cp.counter_init]
-        zone_tracking = [rod for rod in rods if self.cp.counter_init <= rod.pos_x <= self.cp.counter_end]
-        zone_end = [rod for rod in rods if rod.pos_x > self.cp.counter_end]
+        order = np.argsort(positions['x'], kind='stable')
+        xs = positions['x'][order]
+        init = int(np.searchsorted(xs, self.cp.counter_init, side='left'))   # x < counter_init
+        end = int(np.searchsorted(xs, self.cp.counter_end, side='right'))    # x <= counter_end
+        rods = [Rod(pos_x=x, pos_y=y) for x, y in zip(xs.tolist(), positions['y'][order].tolist())]
+        zones = [rods[:init], rods[init:max(init, end)], rods[end:]]
+        if self.direction == 1:
+            rods.reverse()
+            for zone in zones:
+                zone.reverse()
+        return (rods, *zones)
 
-        return zone_init, zone_tracking, zone_end
+    def _drop_oldest(self, count: int):
+        """
+        Removes the `count` oldest tracks in place (as `[count:]` slicing would,
+        negative counts keep the newest -count), without rebuilding the dict.
+        """
+        if count < 0:
+            count = max(0, len(self.tracking_objects) + count)
+        for _ in range(min(count, len(self.tracking_objects))):
+            del self.tracking_objects[next(iter(self.tracking_objects))]
 
     def _initialize_new_tracks(self):
         """Assigns new track IDs to all rods initially in the tracking zone."""
@@ -54,12 +141,13 @@ class Tracker:
         """Removes the oldest tracks if new rods appear in the end zone (FIFO logic)."""
         end_diff = len(self.rods_zone_end) - len(self.rods_zone_end_prev)
         if end_diff == 1:
-            self.tracking_objects = dict(list(self.tracking_objects.items())[end_diff:])
+            self._drop_oldest(end_diff)
 
     def _prepare_association_lists(self) -> Tuple[Dict[int, Rod], List[Rod], bool]:
         """
         Applies heuristics to decide the order and direction of matching.
-        Returns copies of objects to match and a flag for the association strategy.
+        Returns the objects to match (a new dict, the rods are shared) and a flag
+        for the association strategy.
         Parameters:
             self.tracking_objects: Objects being tracked from the previous frame
         """
@@ -72,7 +160,7 @@ class Tracker:
              exiting_init_zone_count = len(self.rods_zone_init_prev) - len(self.rods_zone_init)
         # ---
 
-        tracking_objects_copy = deepcopy(self.tracking_objects)
+        tracking_objects_copy = dict(self.tracking_objects)
         rods_zone_tracking_copy = self.rods_zone_tracking.copy()
         tracking_diff = len(self.rods_zone_tracking) - len(self.rods_zone_tracking_prev)
         end_diff = len(self.rods_zone_end) - len(self.rods_zone_end_prev)
@@ -83,8 +171,8 @@ class Tracker:
 
                 for i in range(tracking_diff):
                     tmp_diff_track = self.cp.counter_end - rods_zone_tracking_copy[i].pos_x
-                    tmp_diff_end = self.rods_zone_end[len(self.rods_zone_end) - (i+1)].pos_x - self.cp.counter_end if len(self.rods_zone_end) > 0 else 20
-                    if tmp_diff_track < 15 and tmp_diff_end < 15:
+                    tmp_diff_end = self.rods_zone_end[len(self.rods_zone_end) - (i+1)].pos_x - self.cp.counter_end if len(self.rods_zone_end) > 0 else self.cp.edge_threshold
+                    if tmp_diff_track < self.cp.edge_threshold and tmp_diff_end < self.cp.edge_threshold:
                         rods_zone_tracking_copy.pop(i)
 
         # If rods are disappearing from the tracking zone, reverse the matching order.
@@ -115,11 +203,11 @@ class Tracker:
             if end_diff == 0 and self.rods_zone_end_prev:
                 diffs_end = [a.pos_x - b.pos_x for a, b in zip(self.rods_zone_end, self.rods_zone_end_prev)]
                 mean_end_move = sum(diffs_end) / len(diffs_end) if diffs_end else 0
-                end_is_stopped = abs(mean_end_move) < 15 # Heuristic threshold
+                end_is_stopped = abs(mean_end_move) < self.cp.edge_threshold # Heuristic threshold
 
             # Special case: If tracking rods are moving right and end zone rods have stopped,
             # use a simplified, one-to-one association strategy. (Solved?)
-            if mean_tracking_move >= self.cp.displacement and end_is_stopped: # Heuristic threshold
+            if mean_tracking_move >= self.displacement and end_is_stopped: # Heuristic threshold
                 self._log("TRYING TO SOLVE EDGE CASE I.", 100, 20*8)
                 tracking_objects_copy = dict(sorted(self.tracking_objects.items(), reverse=True))
                 rods_zone_tracking_copy.reverse()
@@ -127,12 +215,12 @@ class Tracker:
                 edge_case_1 = False
 
             if edge_case_1:
-                if end_diff == 0 and mean_tracking_move < 15:
+                if end_diff == 0 and mean_tracking_move < self.cp.edge_threshold:
                     self._log(f"TRYING TO SOLVE EDGE CASE I WITH DIRECTION {self.direction}.", 100, 20*12)
-                    self.tracking_objects = dict(list(self.tracking_objects.items())[1:])
+                    self._drop_oldest(1)
                 else:
                     self._log(f"TRYING TO SOLVE EDGE CASE I WITH DIRECTION {self.direction} and end_diff: {end_diff}.", 100, 20*12)
-                    self.tracking_objects = dict(list(self.tracking_objects.items())[end_diff:])
+                    self._drop_oldest(end_diff)
 
         return tracking_objects_copy, rods_zone_tracking_copy, use_standard_association, exiting_init_zone_count
 
@@ -169,22 +257,25 @@ class Tracker:
 
         if use_standard_association:
             self._log("USE STANDARD ASSOCIATION: TRUE.", 100, 20*10)
-            unmatched_detections = deepcopy(rods_to_match)
+            # Motion constraint: object should not move too far backward (heuristic threshold)
+            thresholds = [self.direction*rod_prev.pos_x + self.displacement for rod_prev in objects_to_match.values()]
+            keys = [self.direction*rod_curr.pos_x for rod_curr in rods_to_match]
+            matches = match_tracks(thresholds, keys)
+            matched = set()
             lost_track_ids = []
+            pairs = []
 
-            for object_id, rod_prev in objects_to_match.items():
-                found_match = False
-                for rod_curr in unmatched_detections:
-                    # Motion constraint: object should not move too far backward
-                    if self.direction*(rod_curr.pos_x - rod_prev.pos_x) >= self.cp.displacement: # Heuristic threshold
-                        self.tracking_objects[object_id] = rod_curr
-                        rod_curr.track_id = object_id
-                        unmatched_detections.remove(rod_curr)
-                        found_match = True
-                        break
-
-                if not found_match:
+            for (object_id, rod_prev), index in zip(objects_to_match.items(), matches):
+                if index < 0:
                     lost_track_ids.append(object_id)
+                    continue
+                rod_curr = rods_to_match[index]
+                self.tracking_objects[object_id] = rod_curr
+                rod_curr.track_id = object_id
+                pairs.append((rod_prev, rod_curr))
+                matched.add(index)
+            self._update_velocities(pairs)
+            unmatched_detections = [rod for index, rod in enumerate(rods_to_match) if index not in matched]
 
             # Clean up lost tracks
             for object_id in lost_track_ids:
@@ -204,20 +295,70 @@ class Tracker:
         else:
             self._log("USE STANDARD ASSOCIATION: FALSE.", 100, 20*10)
             # Simplified one-to-one association for the special "stopped" case
-            for object_id, _ in objects_to_match.items():
+            pairs = []
+            for object_id, rod_prev in objects_to_match.items():
                 if rods_to_match:
                     rod_curr = rods_to_match.pop(0)
                     self.tracking_objects[object_id] = rod_curr
                     rod_curr.track_id = object_id
+                    pairs.append((rod_prev, rod_curr))
+            self._update_velocities(pairs)
+
+    def _associate_predicted(self):
+        """
+        Matches the tracks with the rods of the tracking zone in chain order,
+        within `cp.displacement` of their predicted positions (match_window).
+        A track without a rod coasts on its prediction for up to `max_misses`
+        detections while the prediction stays in the tracking zone, so a
+        missed detection doesn't hand its ID to a new track; tracks whose rod
+        moved on to the end zone simply find no match. Unmatched rods start
+        new tracks.
+        """
+        self._log("USE PREDICTED ASSOCIATION.", 100, 20*10)
+        # Front of the chain first, for the tracks and for the zone (already sorted that way)
+        tracks = sorted(((self.direction*self._predicted_x(rod), object_id, rod)
+                         for object_id, rod in self.tracking_objects.items()), key=lambda track: -track[0])
+        rods = self.rods_zone_tracking
+        matches = match_window([track[0] for track in tracks], [self.direction*rod.pos_x for rod in rods],
+                               abs(self.cp.displacement))
+
+        self.tracking_objects = {}
+        matched = set()
+        pairs = []
+        for (predicted, object_id, rod_prev), index in zip(tracks, matches):
+            if index >= 0:
+                rod_curr = rods[index]
+                rod_curr.track_id = object_id
+                pairs.append((rod_prev, rod_curr))
+                self.tracking_objects[object_id] = rod_curr
+                matched.add(index)
+            elif rod_prev.misses < self.max_misses and \
+                    self.cp.counter_init <= self.direction*predicted <= self.cp.counter_end:
+                # Pixel coordinates like the detected rods (plot_count draws them)
+                self.tracking_objects[object_id] = Rod(object_id, int(round(self.direction*predicted)), rod_prev.pos_y,
+                                                       rod_prev.vel_x, rod_prev.misses + 1)
+        self._update_velocities(pairs)
+
+        for index, rod in enumerate(rods):
+            if index in matched:
+                continue
+            if self.direction == 1:
+                rod.track_id = self.track_id
+                self.track_id += 1
+            else:
+                self.track_id -= 1
+                rod.track_id = self.track_id
+            self.tracking_objects[rod.track_id] = rod
 
     def _remap_track_ids(self):
         """Ensures track IDs are consecutive, preserving their ascending order."""
-        track_ids = sorted(list(self.tracking_objects.keys()), reverse=True)
-        if len(track_ids) <= 1:
+        if len(self.tracking_objects) <= 1:
             return
 
-        is_consecutive = all(track_ids[i] == track_ids[i-1] - 1 for i in range(1, len(track_ids)))
+        # IDs are unique, so they are consecutive iff they span exactly len() values
+        is_consecutive = max(self.tracking_objects) - min(self.tracking_objects) + 1 == len(self.tracking_objects)
         if not is_consecutive:
+            track_ids = sorted(self.tracking_objects.keys(), reverse=True)
             self._log(f"ALERT: REMAPPING IDS {self.tracking_objects}", 100, 20*5)
 
             remapped_objects = {}
@@ -257,31 +398,44 @@ class Tracker:
                         self.rod_count -= 1
                         self.counted_track_ids.discard(track_id)
 
-    def update_params(self, tracker_data):
-        self.track_id = tracker_data['track_id']
-        self.tracking_objects = tracker_data['tracking_objects']
-        self.rods_zone_init_prev, self.rods_zone_tracking_prev, self.rods_zone_end_prev = self._zone_rods(tracker_data['center_points_prev_frame'])
-        self.rod_count = tracker_data['rod_count']
-        self.counted_track_ids = tracker_data['counted_track_ids']
-
-    def track(self) -> Tuple[int, Dict[int, Rod], List[Rod]]:
+    def update(self, positions: np.ndarray, direction: int, frame: np.ndarray, frame_gap: int = 1) -> int:
         """
-        Performs object tracking by associating current detections with existing tracks.
+        Performs object tracking by associating the rods of a new frame with existing tracks.
+
+        Args:
+            positions: Rod positions of this frame (POSITION_DTYPE array, see extract_positions).
+            direction: 1 left to right, -1 right to left.
+            frame: Image the debug log and plot_count draw on.
+            frame_gap: Frames elapsed since the previous detection (skipped or dropped frames);
+                predictions move with it and, without a velocity estimate, the allowed displacement grows with it.
+
+        Returns:
+            The current rod count.
         """
-        if self.direction == 1:
+        if direction != self.direction:
+            self.halt()
+        self.frame = frame
+        self.direction = direction
+        self.frame_gap = max(1, frame_gap)
+        self.displacement = self.cp.displacement * self.frame_gap
+        (self.rods_cur_frame, self.rods_zone_init,
+         self.rods_zone_tracking, self.rods_zone_end) = self._zone_rods(positions)
+
+        if self.direction == 1 and self.debug:
             self._log(f"{self.tracking_objects}", 0, 20*14)
 
-            # 1. If no objects are being tracked, initialize new tracks and exit.
-            if not self.tracking_objects:
-                self._initialize_new_tracks()
-                return {'track_id': self.track_id,
-                        'tracking_objects': self.tracking_objects,
-                        'center_points_prev_frame': deepcopy(self.rods_cur_frame),
-                        'rod_count': self.rod_count,
-                        'counted_track_ids': self.counted_track_ids}
+        # 1. If no objects are being tracked, initialize new tracks.
+        if self.direction in (1, -1) and not self.tracking_objects:
+            self._initialize_new_tracks()
 
-            # Store a copy of tracks before they are modified for counting later.
-            previous_tracks = deepcopy(self.tracking_objects)
+        elif self.direction in (1, -1) and self.predict and self.velocity is not None:
+            previous_tracks = dict(self.tracking_objects)
+            self._associate_predicted()
+            self._count_passing_rods(previous_tracks)
+
+        elif self.direction == 1:
+            # Keep the tracks before they are modified for counting later.
+            previous_tracks = dict(self.tracking_objects)
 
             # 2. Handle objects that have exited the final zone.
             self._handle_exiting_rods()
@@ -295,21 +449,13 @@ class Tracker:
 
             self._remap_track_ids()
 
-            self._log(f"{self.tracking_objects}", 0, 20*16)
+            if self.debug:
+                self._log(f"{self.tracking_objects}", 0, 20*16)
 
             self._count_passing_rods(previous_tracks)
 
-        if self.direction == -1:
-            # 1. If no objects are being tracked, initialize new tracks and exit.
-            if not self.tracking_objects:
-                self._initialize_new_tracks()
-                return {'track_id': self.track_id,
-                        'tracking_objects': self.tracking_objects,
-                        'center_points_prev_frame': deepcopy(self.rods_cur_frame),
-                        'rod_count': self.rod_count,
-                        'counted_track_ids': self.counted_track_ids}
-
-            previous_tracks = deepcopy(self.tracking_objects)
+        elif self.direction == -1:
+            previous_tracks = dict(self.tracking_objects)
 
             association_params = self._prepare_association_lists_reverse()
 
@@ -317,11 +463,12 @@ class Tracker:
 
             self._count_passing_rods(previous_tracks)
 
-        return {'track_id': self.track_id,
-                'tracking_objects': self.tracking_objects,
-                'center_points_prev_frame': deepcopy(self.rods_cur_frame),
-                'rod_count': self.rod_count,
-                'counted_track_ids': self.counted_track_ids}
+        # This frame's rods become the previous ones of the next update
+        self.rods_prev_frame = self.rods_cur_frame
+        self.rods_zone_init_prev = self.rods_zone_init
+        self.rods_zone_tracking_prev = self.rods_zone_tracking
+        self.rods_zone_end_prev = self.rods_zone_end
+        return self.rod_count
 
     def _prepare_association_lists_reverse(self):
         """
@@ -329,7 +476,7 @@ class Tracker:
         This determines the strategy for associating old tracks with new detections when direction is -1.
         """
         use_standard_association = True
-        tracking_objects_copy = deepcopy(self.tracking_objects)
+        tracking_objects_copy = dict(self.tracking_objects)
         rods_zone_tracking_copy = self.rods_zone_tracking.copy()
 
         exiting_init_zone_count = 0
@@ -348,6 +495,7 @@ class Tracker:
 
 
     def plot_count(self):
+        import cv2
         cv2.line(self.frame, (self.cp.counter_init, 0),
                  (self.cp.counter_init, self.cp.h), self.cp.green, self.cp.font_thickness)
         cv2.line(self.frame, (self.cp.counter_end, 0),
@@ -396,6 +544,7 @@ class Tracker:
 
     def _log(self, text: str, pos_x: int = 100, pos_y: int = 20*2):
         if self.debug:
+            import cv2
             # Split text into words
             words = text.split() if "," not in text else text.split(",")
             current_line = ""
@@ -1,14 +1,11 @@
 # from tarfile import data_filter
-import cv2
 import numpy as np
 import time
-import yaml
 import os
-from .datatypes import Rod
-from .CamParameters import CameraParameters
-import csv
+from .datatypes import Rod, Detections, POSITION_DTYPE
 
 def read_yaml_file(path: str):
+    import yaml
     try:
         # Open the file and load the YAML data
         with open(path, 'r') as file:
@@ -21,42 +18,61 @@ def read_yaml_file(path: str):
     except yaml.YAMLError as e:
         print(f"Error parsing YAML file: {e}")
 
-def get_positions(detections, confidence, actuator_data):
-    center_points_cur_frame = []
-    actuator_poses = []
-    x_offset =  actuator_data.get("x_offset")
-    y_limit = actuator_data.get("y_limit")
-    actuator_pos = (0,0)
-
+def detections_array(detections) -> np.ndarray:
+    """Stacks one or several results into a single (N, 6) array: x1, y1, x2, y2, conf, cls."""
+    if isinstance(detections, (Detections, np.ndarray)) or hasattr(detections, 'boxes'):
+        detections = [detections]
+    arrays = []
     for detection in detections:
-        boxes = detection.boxes.xyxy.cpu().numpy()  # Convert tensors to NumPy
-        confidences = detection.boxes.conf.cpu().numpy()
-        cls_arr = detection.boxes.cls.cpu().numpy()
-
-        # Filter boxes based on confidence > 0.8
-        valid_mask = confidences > confidence
-        valid_boxes = boxes[valid_mask]
-        valid_cls = cls_arr[valid_mask]
-
-        # Identify the index where class == 1
-        id_sep = np.where(valid_cls == 1)[0]
-
-        # Compute centers efficiently
-        centers = valid_boxes[:, :2] + valid_boxes[:, 2:]  # x1 + x2, y1 + y2
-        centers = (centers / 2).astype(int)  # Compute (center_x, center_y)
-        # Separate actuator vs. other points
-        for i, (center_x, center_y) in enumerate(centers):
-            if i in id_sep:
-                actuator_poses.append((center_x + x_offset, center_y)) # ORIGINAL +100
-            else:
-                rod = Rod(track_id = -1, pos_x = center_x, pos_y = center_y)
-                center_points_cur_frame.append(rod)
+        if isinstance(detection, Detections):
+            arrays.append(detection.to_array())
+        elif isinstance(detection, np.ndarray):
+            arrays.append(detection.reshape(-1, 6))
+        else:
+            arrays.append(detection.boxes.data.cpu().numpy())  # One transfer per ultralytics Results
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays) if arrays else np.zeros((0, 6), dtype=np.float32)
+
+def extract_positions(detections, confidence, actuator_data):
+    """
+    Vectorized split of the detections into rods and actuator.
+
+    Returns:
+        A POSITION_DTYPE structured array with the rod centers (x, y, conf, cls)
+        and the actuator position: the highest actuator box (class 1) shifted
+        by x_offset, or (0, 0) if none.
+    """
+    boxes = detections_array(detections)
+    boxes = boxes[boxes[:, 4] > confidence]
+    # Same rounding as the original per-box loop: float32 midpoint truncated to int
+    centers = ((boxes[:, :2] + boxes[:, 2:4]) / 2).astype(int)
+    is_actuator = boxes[:, 5] == 1
+
+    rods = ~is_actuator
+    positions = np.empty(int(rods.sum()), dtype=POSITION_DTYPE)
+    positions['x'] = centers[rods, 0]
+    positions['y'] = centers[rods, 1]
+    positions['conf'] = boxes[rods, 4]
+    positions['cls'] = boxes[rods, 5]
+
+    actuator_pos = (0, 0)
+    if is_actuator.any():
+        actuator_centers = centers[is_actuator]
+        x, y = actuator_centers[np.argmin(actuator_centers[:, 1])]
+        actuator_pos = (int(x) + actuator_data.get("x_offset"), int(y)) # ORIGINAL +100
+    return positions, actuator_pos
+
+def positions_to_rods(positions):
+    """Compatibility shim: Rod list (track_id -1) for code that still works on Rod objects."""
+    return [Rod(track_id = -1, pos_x = x, pos_y = y) for x, y in zip(positions['x'].tolist(), positions['y'].tolist())]
 
-    if len(actuator_poses)!=0:
-        actuator_pos = min(actuator_poses, key=lambda item: item[1])
-    return center_points_cur_frame, actuator_pos
+def get_positions(detections, confidence, actuator_data):
+    positions, actuator_pos = extract_positions(detections, confidence, actuator_data)
+    return positions_to_rods(positions), actuator_pos
 
 def get_data(dir_path):
+    import cv2
     data = {}
 
     current_struct_time = time.localtime()
@@ -76,10 +92,11 @@ def get_data(dir_path):
     output_path = os.path.join(dir_path, folders_data.get("output"), config_data.get("version") + timestamp_string + ".mp4")
     storage_path = os.path.join(dir_path, folders_data.get("storage"), config_data.get("version"))
     model_path = os.path.join(dir_path, folders_data.get("models"), config_data.get("model"))
-    if input_video and input_video.startswith("rtsp://"):
-        video_path = input_video
-    else:
-        video_path = os.path.join(dir_path, folders_data.get("media"), input_video)
+    media_dir = os.path.join(dir_path, folders_data.get("media"))
+    cache_path = os.path.join(dir_path, folders_data.get("cache", "cache"))
+    video_path = resolve_video_path(input_video, media_dir)
+    # Optional low-resolution source used only for detection (e.g. Hikvision substream 102)
+    detection_video_path = resolve_video_path(config_data.get("detection_video"), media_dir)
 
     debug = config_data.get("debug_mode")
     generate_video = config_data.get("generate_video")
@@ -115,13 +132,94 @@ def get_data(dir_path):
     data["act_y_init"] = act_y_init
     data["act_y_finish"] = act_y_finish
     data["storage_data"] = storage_data
+    data["roi_decode"] = bool(cam_data.get("roi_decode", False))
+    data["source_resolution"] = tuple(cam_data.get("source_resolution", (1920, 1080)))
+    data["detection_video_path"] = detection_video_path
+    data["detection_resolution"] = tuple(cam_data.get("detection_resolution", data["source_resolution"]))
+    # Counting ROIs: 'camera.rois' lists several chain lines; otherwise the single ROI above
+    roi_keys = ("x_init", "y_init", "roi_width", "roi_height", "counter_init", "counter_end", "counter_line")
+    data["rois"] = name_rois(cam_data.get("rois") or [{key: cam_data.get(key) for key in roi_keys}])
     data["serial_port"] = serial_data.get("port")
     data["serial_baud_rate"] = serial_data.get("baud_rate")
     data["serial_timeout"] = serial_data.get("timeout")
+    data["scheduler"] = config_data.get("scheduler", {})
+    data["decoder"] = config_data.get("decoder", {})
+    data["motion_gate"] = config_data.get("motion_gate", {})
+    data["tracker"] = tracker_data
+    data["inference"] = config_data.get("inference", {})
+    data["media_dir"] = media_dir
+    data["cache_path"] = cache_path
+    data["detection_cache"] = config_data.get("detection_cache", {})
+    data["cameras"] = config_data.get("cameras") or []
+    data["supervisor"] = config_data.get("supervisor", {})
 
     return data
 
-def handle_actuator(cam_params, actuator_pos, list_counter, tracker_data, store_package, actuactor_count):
+def resolve_video_path(video, media_dir):
+    """RTSP URLs are used as is; file names are looked up in the media folder."""
+    if not video:
+        return None
+    if video.startswith("rtsp://"):
+        return video
+    return os.path.join(media_dir, video)
+
+def name_rois(rois):
+    """Copies of the ROI dicts with a default name ('linea_<n>') when missing."""
+    return [dict(roi, name=roi.get("name", f"linea_{i + 1}")) for i, roi in enumerate(rois)]
+
+def get_camera_data(data):
+    """
+    Splits the configuration in one data dict per camera listed in 'cameras'
+    (a single camera with the base configuration when the list is empty).
+
+    Each camera inherits `data` and may override input_video, detection_video,
+    serial_port, rois, roi_decode, source_resolution and detection_resolution.
+    With several cameras the logger, storage, output video and CSV history get
+    the camera name so the processes don't write over each other.
+    """
+    cameras = data["cameras"] or [{}]
+    camera_data = []
+    for i, camera in enumerate(cameras):
+        name = camera.get("name", f"camara_{i + 1}")
+        cam = dict(data)
+        cam["camera_name"] = name
+        cam["cpus"] = camera.get("cpus")
+        cam["show"] = camera.get("show", True)
+        if camera.get("input_video"):
+            cam["video_path"] = resolve_video_path(camera["input_video"], data["media_dir"])
+        if "detection_video" in camera:
+            cam["detection_video_path"] = resolve_video_path(camera["detection_video"], data["media_dir"])
+        if camera.get("serial_port"):
+            cam["serial_port"] = camera["serial_port"]
+        if camera.get("rois"):
+            cam["rois"] = name_rois(camera["rois"])
+        if "roi_decode" in camera:
+            cam["roi_decode"] = bool(camera["roi_decode"])
+        if camera.get("source_resolution"):
+            cam["source_resolution"] = tuple(camera["source_resolution"])
+        if camera.get("detection_resolution"):
+            cam["detection_resolution"] = tuple(camera["detection_resolution"])
+        if len(cameras) > 1:
+            cam["logger_path"] = os.path.join(data["logger_path"], name)
+            cam["storage_path"] = os.path.join(data["storage_path"], name)
+            output_root, output_ext = os.path.splitext(data["output_path"])
+            cam["output_path"] = f"{output_root}_{name}{output_ext}"
+            cam["csv_name"] = f"contador_varillas_{name}"
+        camera_data.append(cam)
+    return camera_data
+
+def scale_actuator_data(actuator_data, sx, sy):
+    """Returns a copy of the actuator settings scaled to another resolution."""
+    scaled = dict(actuator_data)
+    scaled["x_offset"] = int(round(actuator_data.get("x_offset", 0) * sx))
+    scaled["y_limit"] = int(round(actuator_data.get("y_limit", 0) * sy))
+    return scaled
+
+def handle_actuator(cam_params, actuator_pos, list_counter, tracker, store_package, actuactor_count):
+    """
+    Closes the current package when the actuator shows up: stores its count
+    in `list_counter` and resets the tracker for the next one.
+    """
     actuator_detected = actuator_pos[1] != 0 and actuator_pos[1] != 0
 
     if actuator_detected:
@@ -129,49 +227,55 @@ def handle_actuator(cam_params, actuator_pos, list_counter, tracker_data, store_
         # We need to detect the actuator at least 2 times to start handle it
         if actuactor_count < 2:
             store_package = True
-            return list_counter, tracker_data, store_package, actuactor_count
+            return list_counter, store_package, actuactor_count
 
-    if tracker_data['rod_count'] > 0 and store_package:
-        diff_rods = len([rod for rod in tracker_data['center_points_prev_frame'] if actuator_pos[0] >= rod.pos_x and rod.pos_x >= cam_params.counter_line])
-        list_counter.append(tracker_data['rod_count'] - diff_rods)
+    if tracker.rod_count > 0 and store_package:
+        diff_rods = len([rod for rod in tracker.rods_prev_frame if actuator_pos[0] >= rod.pos_x and rod.pos_x >= cam_params.counter_line])
+        list_counter.append(tracker.rod_count - diff_rods)
         actuactor_count = 0
         store_package = False
-        tracker_data['rod_count'] = 0
-        tracker_data['center_points_prev_frame'] = []
-        tracker_data['counted_track_ids'] = set()
-        tracker_data['track_id'] = 1
-        tracker_data['tracking_objects'] = {}
-
-    return list_counter, tracker_data, store_package, actuactor_count
-
-def plot_historic(main_image, list_counter, logo):
+        tracker.reset()
+
+    return list_counter, store_package, actuactor_count
+
+def append_packages_csv(csv_filename, packages, first_number=1, when=None):
+    """
+    Appends one row per package (date, time, "Paquete N", rod count) to the
+    CSV of a counting line, creating it with its header if needed. `when` is
+    the time of each package (struct_time or seconds since the epoch, one per
+    package or one for all); now by default.
+    """
+    import csv
+    if not os.path.exists(csv_filename):
+        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            csv.writer(csvfile).writerow(['Fecha', 'Hora', 'Paquete', 'Cantidad_Varillas'])
+    times = when if isinstance(when, (list, tuple)) else [when] * len(packages)
+    with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        for i, (varillas_count, moment) in enumerate(zip(packages, times)):
+            moment = time.localtime(moment) if moment is None or isinstance(moment, (int, float)) else moment
+            writer.writerow([time.strftime("%Y-%m-%d", moment), time.strftime("%H:%M:%S", moment),
+                             f"Paquete {first_number + i}", varillas_count])
+
+def plot_historic(main_image, list_counter, logo, csv_filename = "contador_varillas.csv"):
+    import cv2
+    import csv
     paquetes = list_counter.copy()
 
-    # CSV file handling
-    csv_filename = "contador_varillas.csv"
-
+    # CSV file handling (one file per counting line)
     # Check if there are new packages to add to CSV
-    # We'll track the last processed count to avoid duplicates
-    static_variable_name = '_last_processed_count'
+    # We'll track the last processed count per file to avoid duplicates
+    static_variable_name = '_last_processed_counts'
     if not hasattr(plot_historic, static_variable_name):
-        plot_historic._last_processed_count = 0
+        plot_historic._last_processed_counts = {}
+    last_processed_count = plot_historic._last_processed_counts.get(csv_filename, 0)
 
     # If there are new packages, add them to CSV
-    if len(paquetes) > plot_historic._last_processed_count:
-        current_time = time.localtime()
-        date_str = time.strftime("%Y-%m-%d", current_time)
-        time_str = time.strftime("%H:%M:%S", current_time)
-
-        # Add new packages to CSV
-        with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            for i in range(plot_historic._last_processed_count, len(paquetes)):
-                package_number = i + 1
-                varillas_count = paquetes[i]
-                writer.writerow([date_str, time_str, f"Paquete {package_number}", varillas_count])
+    if len(paquetes) > last_processed_count:
+        append_packages_csv(csv_filename, paquetes[last_processed_count:], last_processed_count + 1)
 
         # Update the last processed count
-        plot_historic._last_processed_count = len(paquetes)
+        plot_historic._last_processed_counts[csv_filename] = len(paquetes)
 
     # Check if CSV file exists, if not create it with headers
     if not os.path.exists(csv_filename):
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.association import estimate_shift, match_tracks, match_window
+
+def first_fit(thresholds, keys):
+    """Nested greedy loop the tracker used before (reference)."""
+    free, matches = list(range(len(keys))), []
+    for threshold in thresholds:
+        for j in free:
+            if keys[j] >= threshold:
+                matches.append(j)
+                free.remove(j)
+                break
+        else:
+            matches.append(-1)
+    return matches
+
+class TestMatchTracks(unittest.TestCase):
+
+    def test_gate_and_lost_tracks(self):
+        # Descending keys (direction 1): the third track would need a detection ahead of 5
+        self.assertEqual(match_tracks([40, 20, 5], [45, 21, 3]), [0, 1, -1])
+        self.assertEqual(match_tracks([], [1, 2]), [])
+        self.assertEqual(match_tracks([1, 2], []), [-1, -1])
+
+    def test_matches_first_fit_for_any_order(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            thresholds = [rng.randint(0, 30) for _ in range(rng.randint(0, 10))]
+            keys = sorted(rng.randint(0, 30) for _ in range(rng.randint(0, 10)))
+            mode = rng.random()
+            if mode < 0.4:
+                keys.reverse()
+            elif mode < 0.6:
+                thresholds.sort()
+            elif mode < 0.7:
+                rng.shuffle(keys)
+            self.assertEqual(match_tracks(thresholds, keys), first_fit(thresholds, keys), (thresholds, keys))
+
+class TestMatchWindow(unittest.TestCase):
+
+    def test_order_preserving_window(self):
+        # 95 is ahead of every window (new rod), the track predicted at 40 finds nothing
+        self.assertEqual(match_window([80, 60, 40, 20], [95, 78, 63, 19], 5), [1, 2, -1, 3])
+        self.assertEqual(match_window([10], [], 5), [-1])
+
+    def test_shift_prefers_the_expected_alias(self):
+        previous = [400, 350, 300, 250, 200]
+        keys = [x + 18 for x in previous] + [168]
+        self.assertAlmostEqual(estimate_shift(previous, keys, 10), 18)
+        # With a new rod at the back, evenly spaced rods line up as well at 40 as at 40 - 50
+        keys = [x + 40 for x in previous] + [190]
+        self.assertAlmostEqual(estimate_shift(previous, keys, 10, expected=36), 40)
+        self.assertAlmostEqual(estimate_shift(previous, keys, 10), -10)
+        self.assertIsNone(estimate_shift([100], [], 10))
+
+    def test_shift_outside_the_expected_band(self):
+        # The chain sped up: nothing lines up around the expected shift, the front rods still find it
+        previous = [400, 330, 290, 200, 170]
+        keys = [x + 45 for x in previous]
+        self.assertAlmostEqual(estimate_shift(previous, keys, 10, expected=12), 45)
+        self.assertAlmostEqual(estimate_shift(previous, [x + 14 for x in previous], 10, expected=12), 14)
+
+if __name__ == '__main__':
+    unittest.main()
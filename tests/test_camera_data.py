@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.utils import get_camera_data
+
+class TestCameraData(unittest.TestCase):
+
+    def base_data(self, cameras):
+        return {'cameras': cameras,
+                'media_dir': os.path.join('root', 'media'),
+                'video_path': 'rtsp://base',
+                'detection_video_path': None,
+                'serial_port': 'COM3',
+                'rois': [{'name': 'linea_1', 'x_init': 0}],
+                'logger_path': os.path.join('root', 'logger', 'v1'),
+                'storage_path': os.path.join('root', 'storage', 'v1'),
+                'output_path': os.path.join('root', 'output', 'v1.mp4')}
+
+    def test_single_camera_keeps_base_config(self):
+        data = self.base_data([])
+        cameras = get_camera_data(data)
+        self.assertEqual(len(cameras), 1)
+        self.assertEqual(cameras[0]['camera_name'], 'camara_1')
+        self.assertEqual(cameras[0]['output_path'], data['output_path'])
+        self.assertNotIn('csv_name', cameras[0])
+
+    def test_overrides_and_separate_outputs(self):
+        data = self.base_data([{'name': 'bahia_1', 'cpus': [0, 1]},
+                               {'name': 'bahia_2', 'input_video': 'video.mp4', 'serial_port': 'COM4',
+                                'rois': [{'x_init': 10}, {'x_init': 20}]}])
+        first, second = get_camera_data(data)
+        self.assertEqual(first['video_path'], 'rtsp://base')
+        self.assertEqual(first['cpus'], [0, 1])
+        self.assertEqual(second['video_path'], os.path.join('root', 'media', 'video.mp4'))
+        self.assertEqual(second['serial_port'], 'COM4')
+        self.assertEqual([roi['name'] for roi in second['rois']], ['linea_1', 'linea_2'])
+        self.assertEqual(second['output_path'], os.path.join('root', 'output', 'v1_bahia_2.mp4'))
+        self.assertEqual(second['logger_path'], os.path.join('root', 'logger', 'v1', 'bahia_2'))
+        self.assertNotEqual(first['csv_name'], second['csv_name'])
+        self.assertEqual(data['serial_port'], 'COM3')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import sys
+import types
+import unittest
+
+import av
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.capture import DecoderTuner, RoiFilter, StreamSizeError, check_stream_size
+
+class TestStreamSize(unittest.TestCase):
+
+    def test_full_frames_must_match_the_configured_resolution(self):
+        check_stream_size(640, 360, (0, 0, 640, 360), cropped=False)
+        with self.assertRaises(StreamSizeError):
+            check_stream_size(1920, 1080, (0, 0, 640, 360), cropped=False)
+
+    def test_crop_box_must_fit_in_the_stream(self):
+        check_stream_size(1920, 1080, (600, 280, 1250, 800), cropped=True)
+        with self.assertRaises(StreamSizeError):
+            check_stream_size(640, 360, (600, 280, 1250, 800), cropped=True)
+
+class TestRoiFilter(unittest.TestCase):
+
+    def setUp(self):
+        # Horizontal ramp in blue, vertical ramp in green: every pixel tells where it came from
+        self.image = np.zeros((48, 64, 3), dtype=np.uint8)
+        self.image[:, :, 0] = (np.arange(64) * 4)[None, :]
+        self.image[:, :, 1] = (np.arange(48) * 5)[:, None]
+        # Decoders hand out yuv420p frames
+        self.frame = av.VideoFrame.from_ndarray(self.image, format='bgr24').reformat(format='yuv420p')
+
+    def test_crops_the_box_in_bgr(self):
+        roi = RoiFilter(16, 8, 32, 24).process(self.frame)
+        self.assertEqual((roi.width, roi.height, roi.format.name), (32, 24, 'bgr24'))
+        crop = roi.to_ndarray().astype(int)
+        # Chroma subsampling blurs the ramps a little; a crop one pixel off would miss them by 4-5 on average
+        error = np.abs(crop - self.image[8:32, 16:48]).mean(axis=(0, 1))
+        self.assertLess(error[:2].max(), 3.5)
+
+    def test_box_is_clamped_to_the_frame(self):
+        roi = RoiFilter(48, 40, 32, 24).process(self.frame)
+        self.assertEqual((roi.width, roi.height), (16, 8))
+
+    def test_rebuilds_when_the_frame_size_changes(self):
+        roi_filter = RoiFilter(0, 0, 32, 24)
+        roi_filter.process(self.frame)
+        small = av.VideoFrame.from_ndarray(self.image[:16, :16].copy(), format='bgr24').reformat(format='yuv420p')
+        roi = roi_filter.process(small)
+        self.assertEqual((roi.width, roi.height), (16, 16))
+
+class TestDecoderTuner(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = types.SimpleNamespace(thread_type=None, codec_context=av.CodecContext.create('h264', 'r'))
+        self.tuner = DecoderTuner(thread_count=2, thread_type='FRAME', high_lag=3, low_lag=1, patience=4)
+
+    def test_configure_sets_threading(self):
+        self.tuner.configure(self.stream)
+        self.assertEqual(self.stream.thread_type, 'FRAME')
+        self.assertEqual(self.stream.codec_context.thread_count, 2)
+
+    def test_skips_frames_while_behind_and_recovers(self):
+        self.tuner.configure(self.stream)
+        for _ in range(3):
+            self.tuner.update(5)
+        self.tuner.update(0)   # A single good frame restarts the streak
+        for _ in range(3):
+            self.tuner.update(5)
+        self.assertEqual(self.tuner.mode, 'DEFAULT')
+        self.tuner.update(5)
+        self.assertEqual(self.tuner.mode, 'NONREF')
+        self.assertEqual(self.stream.codec_context.skip_frame, 'NONREF')
+
+        for _ in range(3):
+            self.tuner.update(1)
+        self.assertEqual(self.tuner.mode, 'NONREF')
+        self.tuner.update(0)
+        self.assertEqual(self.tuner.mode, 'DEFAULT')
+        self.assertEqual(self.stream.codec_context.skip_frame, 'DEFAULT')
+
+    def test_not_adaptive_never_skips(self):
+        self.tuner.configure(self.stream, adaptive=False)
+        for _ in range(20):
+            self.tuner.update(10)
+        self.assertEqual(self.tuner.mode, 'DEFAULT')
+        self.assertEqual(self.stream.codec_context.skip_frame, 'DEFAULT')
+
+if __name__ == '__main__':
+    unittest.main()
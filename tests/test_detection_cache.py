@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.counting_line import build_counting_lines
+from scripts.detection_cache import DetectionCache, file_digest
+
+def boxes(*xs):
+    return np.array([[x, 10, x + 20, 30, 0.9, 0] for x in xs], dtype=np.float32).reshape(-1, 6)
+
+class TestDetectionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertEntry(self, entry, expected):
+        self.assertEqual(len(entry), len(expected))
+        for array, reference in zip(entry, expected):
+            if reference is None:
+                self.assertIsNone(array)
+            else:
+                np.testing.assert_array_equal(array, reference)
+
+    def test_entries_survive_a_reload_and_merge(self):
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        cache.put(0, [boxes(1, 50), boxes()])
+        cache.put(3, [None, boxes(7)])
+        cache.save()
+        self.assertFalse(cache.complete)
+
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        self.assertEqual(cache.frames(), [0, 3])
+        self.assertEntry(cache.get(0), [boxes(1, 50), boxes()])
+        self.assertEntry(cache.get(3), [None, boxes(7)])
+        self.assertIsNone(cache.get(1))
+
+        # A later run fills the frames it needed and finishes the video
+        cache.put(1, [boxes(2), None])
+        cache.save(complete=True)
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        self.assertTrue(cache.complete)
+        self.assertEqual(cache.frames(), [0, 1, 3])
+        self.assertEntry(cache.get(1), [boxes(2), None])
+        self.assertEntry(cache.get(3), [None, boxes(7)])
+
+    def test_interrupted_save_is_ignored(self):
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        cache.put(0, [boxes(1), None])
+        cache.save()
+        cache = None
+        path = os.path.join(self.tmp.name, "key")
+
+        # Arrays of a newer save in place, meta.json still from the previous one
+        np.save(os.path.join(path, "frames.npy"), np.array([0, 1], dtype=np.int64))
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        self.assertEqual(cache.frames(), [])
+        self.assertIsNone(cache.get(0))
+
+        # A truncated meta.json
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            file.write('{"frames": ')
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        self.assertEqual(cache.frames(), [])
+        self.assertFalse(cache.complete)
+
+        # The next save starts over
+        cache.put(5, [None, boxes(2)])
+        cache.save(complete=True)
+        cache = DetectionCache(self.tmp.name, "key", lines=2)
+        self.assertEqual(cache.frames(), [5])
+        self.assertTrue(cache.complete)
+
+    def test_digest_follows_the_content(self):
+        path = os.path.join(self.tmp.name, "video.mp4")
+        with open(path, "wb") as file:
+            file.write(b"\0" * 1000)
+        digest = file_digest(path)
+        with open(path, "r+b") as file:
+            file.seek(999)
+            file.write(b"\1")
+        self.assertNotEqual(file_digest(path), digest)
+
+    def test_key_follows_the_motion_gate_decisions(self):
+        for name in ("video.mp4", "model.pt"):
+            with open(os.path.join(self.tmp.name, name), "wb") as file:
+                file.write(name.encode())
+        roi = {'name': "linea_1", 'x_init': 0, 'y_init': 0, 'roi_width': 300, 'roi_height': 100,
+               'counter_init': 50, 'counter_end': 250, 'counter_line': 150}
+
+        def key(motion_gate=None, **limits):
+            data = {'debug': False, 'logo': None, 'min_confidence': 0.5, 'actuator_data': {'x_offset': 0},
+                    'rois': [dict(roi, **limits)], 'motion_gate': motion_gate, 'detection_cache': {'enabled': True},
+                    'video_path': os.path.join(self.tmp.name, "video.mp4"),
+                    'model_path': os.path.join(self.tmp.name, "model.pt"), 'cache_path': self.tmp.name}
+            return os.path.basename(DetectionCache.from_config(data, build_counting_lines(data, 600, 100)).path)
+
+        gate = {'enabled': True}
+        base = key(gate)
+        self.assertEqual(key(gate, counter_line=180), base)   # Only tracking: the cache still holds
+        self.assertNotEqual(key(gate, counter_init=60), base)
+        self.assertNotEqual(key(dict(gate, threshold=5.0)), base)
+        # Without the gate every frame runs the model: the counting zone doesn't matter
+        self.assertEqual(key({'enabled': False}, counter_end=200), key({'enabled': False}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.inference import export_model, exported_model_path
+
+class TestExportModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp.name, "best.pt")
+        open(self.model_path, "wb").close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, path, age=0.0):
+        """Creates `path` with a modification time `age` seconds before the .pt file."""
+        open(path, "wb").close()
+        mtime = os.path.getmtime(self.model_path) - age
+        os.utime(path, (mtime, mtime))
+
+    def test_export_paths_sit_next_to_the_model(self):
+        stem = os.path.join(self.tmp.name, "best")
+        self.assertEqual(exported_model_path(self.model_path, 'torch'), self.model_path)
+        self.assertEqual(exported_model_path(self.model_path, 'onnxruntime'), stem + ".onnx")
+        self.assertEqual(exported_model_path(self.model_path, 'openvino'), stem + "_openvino_model")
+        self.assertEqual(exported_model_path(self.model_path, 'openvino', int8=True), stem + "_int8_openvino_model")
+
+    def test_torch_uses_the_pt_file(self):
+        with mock.patch("ultralytics.YOLO") as yolo:
+            self.assertEqual(export_model(self.model_path, 'torch'), self.model_path)
+        yolo.assert_not_called()
+
+    def test_up_to_date_export_is_reused(self):
+        onnx_path = exported_model_path(self.model_path, 'onnxruntime')
+        self.touch(onnx_path)
+        with mock.patch("ultralytics.YOLO") as yolo:
+            self.assertEqual(export_model(self.model_path, 'onnxruntime'), onnx_path)
+        yolo.assert_not_called()
+
+    def test_stale_export_is_redone(self):
+        onnx_path = exported_model_path(self.model_path, 'onnxruntime')
+        self.touch(onnx_path, age=60)
+        with mock.patch("ultralytics.YOLO") as yolo:
+            yolo.return_value.export.return_value = onnx_path
+            self.assertEqual(export_model(self.model_path, 'onnxruntime', imgsz=320), onnx_path)
+        yolo.assert_called_once_with(self.model_path)
+        yolo.return_value.export.assert_called_once_with(format='onnx', imgsz=320, dynamic=True)
+
+    def test_invalid_backend_options(self):
+        with self.assertRaises(ValueError):
+            export_model(self.model_path, 'tensorrt')
+        with self.assertRaises(ValueError):
+            export_model(self.model_path, 'onnxruntime', int8=True)
+
+    def test_int8_needs_a_quantized_model_or_calibration_data(self):
+        with self.assertRaises(FileNotFoundError):
+            export_model(self.model_path, 'openvino', int8=True)
+        int8_path = exported_model_path(self.model_path, 'openvino', int8=True)
+        os.mkdir(int8_path)
+        os.utime(int8_path, (os.path.getmtime(self.model_path),) * 2)
+        self.assertEqual(export_model(self.model_path, 'openvino', int8=True), int8_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.frame_bus import FrameBus
+
+class TestFrameBus(unittest.TestCase):
+
+    def test_borrow_returns_newest_frame(self):
+        bus = FrameBus(width=4, height=2, slots=3)
+        for value in (1, 2, 3):
+            index, buffer = bus.acquire()
+            buffer[:] = value
+            bus.publish(index, direction=-1)
+
+        slot = bus.borrow(0, timeout=0.1)
+        self.assertEqual(slot.seq, 3)
+        self.assertEqual(slot.direction, -1)
+        self.assertTrue((slot.frame == 3).all())
+        self.assertEqual(bus.dropped, 2)
+        bus.release(slot)
+
+        # Nothing newer than the last borrowed frame
+        self.assertIsNone(bus.borrow(slot.seq, timeout=0.01))
+
+    def test_published_array_is_handed_over_without_copy(self):
+        bus = FrameBus(width=4, height=2, slots=3)
+        frame = np.full((2, 4, 3), 7, dtype=np.uint8)
+        index, _ = bus.acquire()
+        bus.publish(index, frame=frame)
+        slot = bus.borrow(0, timeout=0.1)
+        self.assertIs(slot.frame, frame)
+        bus.release(slot)
+
+    def test_writer_skips_borrowed_slot(self):
+        bus = FrameBus(width=4, height=2, slots=3)
+        index, _ = bus.acquire()
+        bus.publish(index)
+        slot = bus.borrow(0, timeout=0.1)
+        for _ in range(10):
+            index, _ = bus.acquire()
+            self.assertNotEqual(index, slot.index)
+            bus.publish(index)
+        bus.release(slot)
+
+    def test_concurrent_reader_never_sees_torn_frame(self):
+        bus = FrameBus(width=64, height=32, slots=3)
+        stop = threading.Event()
+        errors = []
+
+        def writer():
+            value = 0
+            while not stop.is_set():
+                index, buffer = bus.acquire()
+                buffer[:] = value % 256
+                bus.publish(index)
+                value += 1
+
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        last_seq = 0
+        for _ in range(300):
+            slot = bus.borrow(last_seq, timeout=1.0)
+            self.assertIsNotNone(slot)
+            first = int(slot.frame[0, 0, 0])
+            if not (slot.frame == first).all():
+                errors.append(slot.seq)
+            last_seq = slot.seq
+            bus.release(slot)
+        stop.set()
+        thread.join()
+        self.assertEqual(errors, [])
+
+if __name__ == '__main__':
+    unittest.main()
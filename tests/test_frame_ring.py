@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.decoder_process import DecoderProcess, SharedFrameRing
+
+class TestSharedFrameRing(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SharedFrameRing(8, 4, slots=3)
+        self.reader = SharedFrameRing(8, 4, slots=3, name=self.ring.name)  # As attached by the parent
+
+    def tearDown(self):
+        self.reader.close()
+        self.ring.close(unlink=True)
+
+    def publish(self, index, seq, value):
+        self.ring.frames[index][:] = value
+        self.ring.seqs[index] = seq
+        self.ring.header[SharedFrameRing.SEQ] = seq
+        self.ring.header[SharedFrameRing.LATEST] = index
+
+    def test_reads_latest_frame_once(self):
+        dst = np.zeros((4, 8, 3), dtype=np.uint8)
+        self.assertEqual(self.reader.read_into(dst), 0)
+        self.publish(0, 1, 7)
+        self.assertEqual(self.reader.read_into(dst), 1)
+        self.assertTrue((dst == 7).all())
+        self.assertEqual(self.reader.read_into(dst, last_seq=1), 0)
+
+    def test_rejects_slot_being_written(self):
+        dst = np.zeros((4, 8, 3), dtype=np.uint8)
+        self.publish(1, 5, 3)
+        self.ring.locks[1] += 1  # Writer wrapped around and is copying into the latest slot
+        self.assertEqual(self.reader.read_into(dst), 0)
+        self.assertTrue((dst == 0).all())
+        self.ring.locks[1] += 1
+        self.assertEqual(self.reader.read_into(dst), 5)
+
+class TestDecoderProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = DecoderProcess(os.path.join(os.path.dirname(__file__), "missing.mp4"), {}, 8, 4,
+                                      stall_frames=3, fps=30.0, respawn_delay=0.1)
+
+    def tearDown(self):
+        self.decoder.close()
+
+    def test_dead_child_is_respawned_with_backoff(self):
+        self.decoder.ring.locks[1] = 3   # Previous child killed in the middle of a write
+        self.decoder.start()
+        self.assertEqual(self.decoder.ring.locks.tolist(), [0, 4, 0])
+        self.decoder.process.join(30)    # No such file: the child exits
+        self.assertTrue(self.decoder.check())
+        self.assertEqual(self.decoder.restarts, 1)
+        self.assertFalse(self.decoder.check())   # Still waiting for the respawn delay
+        dead = self.decoder.process
+        time.sleep(0.15)
+        self.decoder.check()
+        self.assertIsNot(self.decoder.process, dead)
+        self.decoder.process.join(30)
+        self.assertTrue(self.decoder.check())
+        # Failed again before any frame: the delay doubled
+        self.assertAlmostEqual(self.decoder._respawn_at - time.perf_counter(), 0.2, delta=0.05)
+
+    def test_stalled_child_is_restarted(self):
+        self.decoder.process = self.decoder.ctx.Process(target=time.sleep, args=(30,), daemon=True)
+        self.decoder.process.start()
+        self.decoder._last_frame_at = time.perf_counter()
+        self.assertFalse(self.decoder.check())
+        self.decoder._last_frame_at -= 3 / 30 + 0.05   # No frame for more than stall_frames intervals
+        self.assertTrue(self.decoder.check())
+        self.assertFalse(self.decoder.process.is_alive())
+        self.assertEqual(self.decoder.restarts, 1)
+        # The child had delivered frames: no backoff for this restart
+        self.assertAlmostEqual(self.decoder._respawn_at - time.perf_counter(), 0.1, delta=0.05)
+
+if __name__ == '__main__':
+    unittest.main()
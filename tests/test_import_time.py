@@ -0,0 +1,24 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.import_benchmark import measure
+
+class TestImportTime(unittest.TestCase):
+
+    def test_package_import_is_lazy(self):
+        seconds, heavy = measure("import scripts", repeat=1)
+        self.assertEqual(heavy, [])
+        self.assertLess(seconds, 0.5)
+
+    def test_light_modules_skip_heavy_dependencies(self):
+        for statement in ("from scripts import FrameBus, DetectionScheduler, Detections",
+                          "from scripts import get_data, get_camera_data",
+                          "from scripts import CameraParameters, Tracker",
+                          "from scripts import Detector, InferenceClient, DecoderProcess"):
+            _, heavy = measure(statement, repeat=1)
+            self.assertEqual(heavy, [], statement)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.inference import LeanPredictor
+
+class TestLeanPredictor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from ultralytics.nn.tasks import DetectionModel
+        cls.predictor = LeanPredictor(DetectionModel('yolov8n.yaml', verbose=False), imgsz=320)
+
+    def reference(self, frames):
+        """Input tensor the ultralytics predictor would build for the same frames."""
+        from ultralytics.data.augment import LetterBox
+        letterbox = LetterBox(320, auto=len({frame.shape for frame in frames}) == 1, stride=32)
+        batch = np.stack([letterbox(image=frame) for frame in frames])
+        return batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32) / 255
+
+    def test_preprocess_matches_ultralytics_letterbox(self):
+        rng = np.random.default_rng(0)
+        same = [rng.integers(0, 256, (90, 200, 3), dtype=np.uint8) for _ in range(2)]
+        mixed = [same[0], rng.integers(0, 256, (150, 60, 3), dtype=np.uint8)]
+        for frames in (same[:1], same, mixed, same[1:]):
+            tensor = self.predictor.preprocess(frames).cpu().numpy()
+            np.testing.assert_allclose(tensor, self.reference(frames), atol=1e-6)
+
+    def test_returns_one_detections_per_frame(self):
+        frames = [np.zeros((90, 200, 3), dtype=np.uint8), np.zeros((150, 60, 3), dtype=np.uint8)]
+        detections = self.predictor(frames)
+        self.assertEqual(len(detections), 2)
+        self.assertEqual(detections[0].to_array().shape[1], 6)
+        self.assertEqual(len(self.predictor(frames[0])), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import csv
+import os
+import sys
+import tempfile
+import time
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.counting_line import build_counting_lines, recount_cached
+from scripts.detection_cache import DetectionCache
+from scripts.offline import detect_segment, segment_bounds
+from scripts.utils import append_packages_csv
+
+class BarModel:
+    """Stand-in model: one rod per bright column run of the ROI."""
+    def __call__(self, frames):
+        detections = []
+        for frame in frames:
+            bright = np.concatenate(([False], frame[:, :, 0].mean(axis=0) > 128, [False]))
+            edges = np.flatnonzero(bright[1:] != bright[:-1]).reshape(-1, 2)
+            detections.append(np.array([[x0, 10, x1, 30, 0.9, 0] for x0, x1 in edges], dtype=np.float32).reshape(-1, 6))
+        return detections
+
+def write_chain_video(path, frames=150, stop=(50, 80)):
+    """Bright bars 50 px apart moving 6 px per frame, with the chain stopped during `stop`."""
+    import cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (600, 100))
+    offset = 0
+    for frame_index in range(frames):
+        if not stop[0] <= frame_index < stop[1]:
+            offset += 6
+        frame = np.zeros((100, 600, 3), dtype=np.uint8)
+        for x in range(-900 + offset, 600, 50):
+            if x >= 0:
+                frame[:, x:x + 10] = 255
+        writer.write(frame)
+    writer.release()
+
+class TestOffline(unittest.TestCase):
+
+    def test_segments_cover_the_video_once(self):
+        for frame_count, segments in ((300, 3), (301, 4), (5, 8), (1, 1)):
+            bounds = segment_bounds(frame_count, segments)
+            self.assertEqual(bounds[0][0], 0)
+            self.assertEqual(bounds[-1][1], frame_count)
+            self.assertTrue(all(a[1] == b[0] for a, b in zip(bounds, bounds[1:])))
+            self.assertLessEqual(max(end - start for start, end in bounds) - min(end - start for start, end in bounds), 1)
+
+    def test_packages_csv_uses_the_given_times(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "contador.csv")
+            moment = time.mktime((2026, 3, 2, 14, 5, 9, 0, 0, -1))
+            append_packages_csv(path, [52, 48], when=[moment, moment + 60])
+            append_packages_csv(path, [50], first_number=3)
+            with open(path, newline='', encoding='utf-8') as file:
+                rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['Fecha', 'Hora', 'Paquete', 'Cantidad_Varillas'])
+        self.assertEqual(rows[1], ['2026-03-02', '14:05:09', 'Paquete 1', '52'])
+        self.assertEqual(rows[2], ['2026-03-02', '14:06:09', 'Paquete 2', '48'])
+        self.assertEqual(rows[3][2:], ['Paquete 3', '50'])
+
+    def test_sharded_counts_match_a_sequential_run(self):
+        with tempfile.TemporaryDirectory() as folder:
+            data = {'debug': False, 'logo': None, 'min_confidence': 0.5, 'actuator_data': {'x_offset': 0},
+                    'motion_gate': {'enabled': True, 'max_skip': 15}, 'video_path': os.path.join(folder, "chain.avi"),
+                    'rois': [{'name': "linea_1", 'x_init': 0, 'y_init': 0, 'roi_width': 600, 'roi_height': 100,
+                              'counter_init': 150, 'counter_end': 450, 'counter_line': 300}]}
+            write_chain_video(data['video_path'])
+
+            counts = []
+            for segments in (1, 3):
+                lines = build_counting_lines(data, 600, 100)
+                cache = DetectionCache(folder, f"segments_{segments}", len(lines))
+                for start, end in segment_bounds(150, segments):
+                    entries, _ = detect_segment(data, start, end, batch_size=4, model=BarModel())
+                    for frame_index, entry in entries:
+                        cache.put(frame_index, entry)
+                self.assertEqual(cache.frames(), list(range(150)))
+                recount_cached(lines, cache)
+                counts.append(lines[0].tracker.rod_count)
+        self.assertGreater(counts[0], 0)
+        self.assertEqual(counts[1], counts[0])
+
+if __name__ == '__main__':
+    unittest.main()
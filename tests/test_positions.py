@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.datatypes import Detections, POSITION_DTYPE
+from scripts.utils import extract_positions, get_positions
+
+ACTUATOR = {'x_offset': 50, 'y_limit': 700}
+
+def detections(rows):
+    rows = np.array(rows, dtype=np.float32).reshape(-1, 6)
+    return Detections(xyxy=rows[:, :4], conf=rows[:, 4], cls=rows[:, 5])
+
+class TestExtractPositions(unittest.TestCase):
+
+    def test_splits_rods_and_actuator(self):
+        result = detections([[10, 10, 21, 31, 0.9, 0],    # rod
+                             [100, 40, 120, 60, 0.95, 1],  # actuator (lower)
+                             [200, 0, 220, 20, 0.8, 1],    # actuator (highest: min y)
+                             [50, 50, 60, 60, 0.3, 0]])    # below confidence
+        positions, actuator_pos = extract_positions([result], 0.75, ACTUATOR)
+        self.assertEqual(positions.dtype, POSITION_DTYPE)
+        self.assertEqual(positions[['x', 'y']].tolist(), [(15, 20)])
+        self.assertEqual(actuator_pos, (210 + 50, 10))
+
+    def test_empty_and_several_results(self):
+        positions, actuator_pos = extract_positions([Detections()], 0.5, ACTUATOR)
+        self.assertEqual(len(positions), 0)
+        self.assertEqual(actuator_pos, (0, 0))
+
+        first = detections([[0, 0, 10, 10, 0.9, 0]])
+        second = detections([[20, 0, 30, 10, 0.9, 0]])
+        positions, _ = extract_positions([first, second], 0.5, ACTUATOR)
+        self.assertEqual(positions['x'].tolist(), [5, 25])
+
+    def test_rod_shim(self):
+        rods, actuator_pos = get_positions([detections([[0, 0, 10, 10, 0.9, 0]])], 0.5, ACTUATOR)
+        self.assertEqual([(rod.track_id, rod.pos_x, rod.pos_y) for rod in rods], [(-1, 5, 5)])
+        self.assertEqual(actuator_pos, (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
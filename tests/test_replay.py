@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.CamParameters import CameraParameters
+from scripts.datatypes import POSITION_DTYPE
+from scripts.replay import DetectionRecorder, Recording, run_replay
+
+# Golden package counts of record_packages(): rods crossing x=300 between the recorded
+# frames of each closed package (the last stretch stays open with 5 rods)
+GOLDEN = [8, 7]
+
+def record_packages(recorder, moving=(70, 60, 40), speed=6, spacing=50, stop=10):
+    """
+    A chain moving right in stretches separated by stops; during each stop
+    (no tracking, as with direction 0) the actuator shows up and closes the package.
+    """
+    xs = -30 * spacing + spacing * np.arange(40.0)
+    for stretch, frames in enumerate(moving):
+        if stretch:
+            for frame in range(stop):
+                actuator = (200, 150) if 2 <= frame < 6 else (0, 0)
+                recorder.record(positions_of(xs), 0, actuator, track=False)
+        for _ in range(frames):
+            xs = xs + speed
+            recorder.record(positions_of(xs), 1, (0, 0))
+
+def positions_of(xs):
+    xs = xs[(xs >= 0) & (xs < 600)]
+    positions = np.zeros(len(xs), dtype=POSITION_DTYPE)
+    positions['x'], positions['y'], positions['conf'] = xs, 150, 0.9
+    return positions
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.cp = CameraParameters(1280, 720, x=0, y=0, w=600, h=300)
+        self.cp.update_limits(150, 450, 300)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "linea.npz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_keeps_every_frame(self):
+        recorder = DetectionRecorder(self.path, self.cp)
+        record_packages(recorder)
+        recorder.save()
+        recording = Recording.load(self.path)
+        self.assertEqual(len(recording), len(recorder))
+        for (positions, direction, actuator, gap, track), recorded, frame in zip(recording.frames(), recorder.positions,
+                                                                                 recorder.frames):
+            np.testing.assert_array_equal(positions, recorded)
+            self.assertEqual((direction, *actuator, gap, track), frame)
+        self.assertEqual(recording.cam_params().counter_line, 300)
+
+    def test_golden_package_counts(self):
+        recorder = DetectionRecorder(self.path, self.cp)
+        record_packages(recorder)
+        recorder.save()
+        recording = Recording.load(self.path)
+        for config in ({"predict": True}, {"predict": False}):
+            result = run_replay(recording, config)
+            self.assertEqual(result.list_counter, GOLDEN, config)
+            self.assertEqual(result.rod_count, 5, config)
+            self.assertEqual(len(result.latencies), len(recording))
+            self.assertGreater(result.fps, 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.scheduler import DetectionScheduler
+
+class TestDetectionScheduler(unittest.TestCase):
+
+    def test_stride_follows_latency(self):
+        scheduler = DetectionScheduler(target_fps=30, window=5, max_stride=4)
+        scheduler.latencies.extend([0.07] * 5)  # ~2.1 frame periods
+        scheduler.begin(0)
+        scheduler._start -= 0.07
+        scheduler.end()
+        self.assertEqual(scheduler.stride, 3)
+
+        self.assertFalse(scheduler.should_detect(2))
+        self.assertTrue(scheduler.should_detect(3))
+        self.assertEqual(scheduler.begin(3), 3)
+        self.assertEqual(scheduler.skipped, 2)
+
+    def test_stride_is_clamped_and_can_be_disabled(self):
+        scheduler = DetectionScheduler(target_fps=30, max_stride=4)
+        scheduler.latencies.append(1.0)
+        scheduler.begin(0)
+        scheduler.end()
+        self.assertEqual(scheduler.stride, 4)
+
+        disabled = DetectionScheduler(target_fps=30, enabled=False)
+        disabled.latencies.append(1.0)
+        disabled.begin(0)
+        disabled.end()
+        self.assertEqual(disabled.stride, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import unittest
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.datatypes import Detections
+from scripts.inference_server import InferenceClient, SharedFrames, inference_channel
+
+class TestSharedFrames(unittest.TestCase):
+
+    def test_frames_round_trip_through_shared_memory(self):
+        frames = SharedFrames(slots=2)
+        try:
+            big = np.arange(20 * 30 * 3, dtype=np.uint8).reshape(20, 30, 3)
+            rois = [big[2:12, 5:25], big[:, :10]]  # Non-contiguous views, as cropped by the pipeline
+            name, layout = frames.write(rois)
+
+            reader = shared_memory.SharedMemory(name=name)
+            try:
+                for roi, (offset, shape) in zip(rois, layout):
+                    view = np.ndarray(shape, np.uint8, buffer=reader.buf, offset=offset)
+                    np.testing.assert_array_equal(view, roi)
+                    del view
+            finally:
+                reader.close()
+
+            # Second request goes to the other slot; a larger batch grows the block
+            _, second = frames.write(rois)
+            self.assertEqual(second[0][0], frames.slot_size)
+            new_name, _ = frames.write([big, big, big])
+            self.assertNotEqual(new_name, name)
+        finally:
+            frames.close()
+
+    def test_detections_pack(self):
+        detections = Detections(xyxy=np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.float32),
+                                conf=np.array([0.9, 0.5], dtype=np.float32),
+                                cls=np.array([0, 1], dtype=np.float32))
+        packed = detections.to_array()
+        self.assertEqual(packed.shape, (2, 6))
+        unpacked = Detections.from_array(packed)
+        np.testing.assert_array_equal(unpacked.xyxy, detections.xyxy)
+        np.testing.assert_array_equal(unpacked.cls, detections.cls)
+        self.assertEqual(Detections.from_array(Detections().to_array()).xyxy.shape, (0, 4))
+
+def flood(channel):
+    """Camera stand-in that sends requests until it is killed."""
+    count = 0
+    while True:
+        count += 1
+        channel.send(("cam1", (os.getpid(), count), "block", [(0, (300, 400, 3))] * 4))
+
+class TestInferenceChannel(unittest.TestCase):
+
+    def test_client_round_trip_skips_stale_answers(self):
+        worker_end, camera_end = inference_channel(mp.get_context("spawn"))
+        client = InferenceClient(camera_end, "cam0", timeout=2.0)
+        answer = Detections(xyxy=np.array([[1, 2, 3, 4]], dtype=np.float32),
+                            conf=np.array([0.9], dtype=np.float32), cls=np.array([0], dtype=np.float32))
+
+        def worker():
+            camera, request_id, name, layout = worker_end.recv()
+            self.assertEqual((camera, len(layout)), ("cam0", 2))
+            worker_end.send(((0, 0), None))   # Late answer of an earlier request
+            worker_end.send((request_id, [answer.to_array(), Detections().to_array()]))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        try:
+            detections = client([np.zeros((8, 8, 3), np.uint8)] * 2)
+        finally:
+            thread.join()
+            client.close()
+        self.assertEqual(len(detections), 2)
+        np.testing.assert_array_equal(detections[0].xyxy, answer.xyxy)
+
+        client = InferenceClient(camera_end, "cam0", timeout=0.05)
+        try:
+            with self.assertRaises(TimeoutError):
+                client([np.zeros((8, 8, 3), np.uint8)])
+        finally:
+            client.close()
+
+    def test_killed_camera_leaves_whole_requests_and_other_channels_working(self):
+        ctx = mp.get_context("spawn")
+        channels = [inference_channel(ctx) for _ in range(2)]
+        camera = ctx.Process(target=flood, args=(channels[1][1],), daemon=True)
+        camera.start()
+        time.sleep(1.0)
+        camera.terminate()
+        camera.join()
+
+        # Every request the killed camera wrote can be read in full
+        worker_end = channels[1][0]
+        while worker_end.poll():
+            self.assertEqual(worker_end.recv()[0], "cam1")
+        channels[0][1].send(("cam0", (0, 1), "block", []))
+        self.assertEqual(wait([end for end, _ in channels], timeout=1.0), [channels[0][0]])
+        self.assertEqual(channels[0][0].recv()[0], "cam0")
+
+if __name__ == '__main__':
+    unittest.main()
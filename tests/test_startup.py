@@ -0,0 +1,80 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.counting_line import build_counting_lines
+from scripts.startup import Startup, roi_shapes
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.startup = Startup()
+
+    def tearDown(self):
+        self.startup._executor.shutdown(wait=True)
+
+    def test_submitted_steps_run_in_parallel(self):
+        start = time.perf_counter()
+        futures = [self.startup.submit(name, time.sleep, 0.2) for name in ("Stream", "Modelo")]
+        for future in futures:
+            future.result()
+        self.assertLess(time.perf_counter() - start, 0.35)
+        for name in ("Stream", "Modelo"):
+            offset, duration = self.startup.timings[name]
+            self.assertGreaterEqual(duration, 0.19)
+            self.assertLess(offset, 0.1)
+
+    def test_step_errors_reach_the_caller_and_are_timed(self):
+        def fail():
+            raise OSError("no port")
+        future = self.startup.submit("Puerto serie", fail)
+        with self.assertRaises(OSError):
+            future.result()
+        self.assertIn("Puerto serie", self.startup.timings)
+        with self.assertRaises(OSError):
+            self.startup.run("Puerto serie", fail)
+
+    def test_run_returns_the_step_result(self):
+        self.assertEqual(self.startup.run("Config", lambda: 42), 42)
+        self.assertIn("Config", self.startup.timings)
+
+    def test_report_lists_steps_in_start_order(self):
+        self.startup.run("Config", time.sleep, 0.01)
+        self.startup.submit("Modelo", time.sleep, 0.01).result()
+        self.startup.mark("Primer frame")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.startup.report()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Tiempos de arranque:")
+        self.assertEqual([line.split()[0] for line in lines[1:]], ["Config", "Modelo", "Primer", "total"])
+        self.assertEqual(self.startup.timings["Primer frame"][1], 0.0)
+
+class TestRoiShapes(unittest.TestCase):
+
+    def data(self, detection_video_path=None):
+        rois = [{'name': "linea_1", 'x_init': 600, 'y_init': 280, 'roi_width': 1250, 'roi_height': 800,
+                 'counter_init': 800, 'counter_end': 100, 'counter_line': 500},
+                {'name': "linea_2", 'x_init': 10, 'y_init': 20, 'roi_width': 333, 'roi_height': 201,
+                 'counter_init': 300, 'counter_end': 30, 'counter_line': 150}]
+        return {'debug': False, 'logo': None, 'min_confidence': 0.5, 'actuator_data': {'x_offset': 0},
+                'rois': rois, 'source_resolution': (1920, 1080), 'detection_resolution': (640, 360),
+                'detection_video_path': detection_video_path}
+
+    def test_shapes_match_the_counting_lines(self):
+        data = self.data()
+        lines = build_counting_lines(data, 1920, 1080)
+        self.assertEqual(roi_shapes(data), [(line.cp.h, line.cp.w) for line in lines])
+
+        # With a detection substream the ROIs are cropped from the scaled frame
+        data = self.data("rtsp://camara/sub")
+        lines = build_counting_lines(data, 1920, 1080, detection_size=(640, 360))
+        self.assertEqual(roi_shapes(data), [(line.cp.h, line.cp.w) for line in lines])
+        self.assertEqual(roi_shapes(data)[0], (267, 417))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.decoder_process import STREAM_SIZE_EXIT
+from scripts.supervisor import Supervisor
+
+def exit_with(code):
+    sys.exit(code)
+
+class TestSupervisor(unittest.TestCase):
+
+    def poll_camera(self, exitcode):
+        """Supervisor state after its only camera exits with `exitcode`."""
+        camera = {'camera_name': 'bahia_1', 'source_resolution': (640, 360), 'rois': []}
+        supervisor = Supervisor({'model_path': 'best.pt', 'inference': {}}, [camera])
+        supervisor.inference.finished = True   # Only the camera is under test
+        camera = supervisor.camera_processes[0]
+        camera.target, camera.args = exit_with, (exitcode,)
+        camera.start(supervisor.ctx)
+        camera.process.join()
+        supervisor.poll()
+        return camera
+
+    def test_stream_size_mismatch_is_not_restarted(self):
+        camera = self.poll_camera(STREAM_SIZE_EXIT)
+        self.assertTrue(camera.finished)
+        self.assertIsNone(camera.restart_at)
+
+    def test_failed_camera_is_restarted(self):
+        camera = self.poll_camera(1)
+        self.assertFalse(camera.finished)
+        self.assertIsNotNone(camera.restart_at)
+
+if __name__ == '__main__':
+    unittest.main()
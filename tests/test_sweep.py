@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.CamParameters import CameraParameters
+from scripts.replay import DetectionRecorder
+from scripts.sweep import configurations, package_error, sweep
+from test_replay import GOLDEN, record_packages
+
+class TestSweep(unittest.TestCase):
+
+    def test_configurations_keep_the_line_between_the_limits(self):
+        search = {"counter_init": [100, 200, 50], "counter_end": [300, 400, 100], "counter_line": [150, 350, 100],
+                  "displacement": -15, "edge_threshold": [10, 20, 10]}
+        grid = configurations(search)
+        self.assertTrue(all(c["counter_init"] < c["counter_line"] < c["counter_end"] for c in grid))
+        self.assertEqual(len(grid), 11 * 2)
+        sample = configurations(search, trials=5, seed=1)
+        self.assertEqual(len(sample), 5)
+        self.assertEqual(len({tuple(c.values()) for c in sample}), 5)
+
+    def test_package_error(self):
+        self.assertEqual(package_error([10, 12], [10, 12]), 0)
+        self.assertEqual(package_error([9, 14], [10, 12]), 3)
+        self.assertEqual(package_error([10], [10, 12]), 12)
+        self.assertEqual(package_error([10, 12, 3], [10, 12]), 3)
+
+    def test_sweep_ranks_the_recorded_geometry_first(self):
+        cp = CameraParameters(1280, 720, x=0, y=0, w=600, h=300)
+        cp.update_limits(150, 450, 300)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "linea.npz")
+            recorder = DetectionRecorder(path, cp)
+            record_packages(recorder)
+            recorder.save()
+            # A line past most of the chain misses rods of every package
+            configs = [dict(counter_init=150, counter_end=590, counter_line=580, displacement=-15, edge_threshold=15),
+                       dict(counter_init=150, counter_end=450, counter_line=300, displacement=-15, edge_threshold=15)]
+            for workers in (1, 2):
+                ranked = sweep([(path, GOLDEN)], configs, workers=workers)
+                self.assertEqual(ranked[0][:2], (0, configs[1]))
+                self.assertGreater(ranked[1][0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
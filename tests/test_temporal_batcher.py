@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.counting_line import TemporalBatcher, apply_cached_detections, build_counting_lines, detect_lines
+
+# Chain brightness per frame: idle stretches are served by the motion gate
+LEVELS = [0, 0, 0, 40, 40, 80, 80, 80, 80, 120, 160, 160, 200, 200, 200, 240, 240]
+
+class LevelModel:
+    """Stand-in model: one rod per ROI, at the x given by the brightness of the ROI."""
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, frames):
+        self.batches.append(len(frames))
+        return [np.array([[x, 10, x + 20, 30, 0.9, 0]], dtype=np.float32)
+                for x in (float(frame[0, 0, 0]) for frame in frames)]
+
+def make_lines():
+    data = {
+        'debug': False, 'logo': None, 'min_confidence': 0.5, 'actuator_data': {'x_offset': 0},
+        'motion_gate': {'enabled': True, 'max_skip': 100},
+        'rois': [{'name': name, 'x_init': x, 'y_init': 0, 'roi_width': 300, 'roi_height': 100,
+                  'counter_init': 50, 'counter_end': 250, 'counter_line': 150} for name, x in (("a", 0), ("b", 300))],
+    }
+    return build_counting_lines(data, 600, 100)
+
+def frame(level):
+    frame = np.zeros((100, 600, 3), dtype=np.uint8)
+    frame[:, :300] = level
+    frame[:, 300:] = 255 - level
+    return frame
+
+class TestTemporalBatcher(unittest.TestCase):
+
+    def test_frames_come_back_in_order_with_the_frame_by_frame_detections(self):
+        lines, model = make_lines(), LevelModel()
+        expected = []
+        for level in LEVELS:
+            detect_lines(model, lines, [line.crop(frame(level)) for line in lines])
+            expected.append([line.positions['x'].tolist() for line in lines])
+        sequential_calls = len(model.batches)
+
+        lines, model = make_lines(), LevelModel()
+        batcher = TemporalBatcher(model, lines, batch_size=4)
+        indices, positions = [], []
+        for index, level in enumerate(LEVELS):
+            ready = batcher.push(index, [line.crop(frame(level)) for line in lines])
+            for ready_index, _, entry in ready + (batcher.flush() if index == len(LEVELS) - 1 else []):
+                apply_cached_detections(lines, entry)
+                indices.append(ready_index)
+                positions.append([line.positions['x'].tolist() for line in lines])
+
+        self.assertEqual(indices, list(range(len(LEVELS))))
+        self.assertEqual(positions, expected)
+        self.assertLess(len(model.batches), sequential_calls)
+        self.assertTrue(all(size <= 4 for size in model.batches))
+        self.assertEqual(batcher.pending, 0)
+
+    def test_batch_of_one_is_frame_by_frame(self):
+        self.assertIsNone(TemporalBatcher.from_config(LevelModel(), make_lines(), {"temporal_batch": 1}))
+        self.assertIsNone(TemporalBatcher.from_config(LevelModel(), make_lines(), {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.CamParameters import CameraParameters
+from scripts.datatypes import POSITION_DTYPE
+from scripts.tracker import Tracker
+from scripts.utils import handle_actuator
+
+def chain_frames(start, spacing=50, count=12, speed=6, frames=120):
+    """Rod x positions of a chain moving right at constant speed, clipped to a 600 px ROI."""
+    xs = start + spacing * np.arange(count)
+    for _ in range(frames):
+        xs = xs + speed
+        yield [int(x) for x in xs if 0 <= x < 600]
+
+class TestTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.cp = CameraParameters(1280, 720, x=0, y=0, w=600, h=300)
+        self.cp.update_limits(150, 450, 300)
+        self.frame = np.zeros((300, 600, 3), dtype=np.uint8)
+
+    def run_chain(self, tracker, gap=1, drop=(), **kwargs):
+        """Detects every `gap` frames; the rod at index `drop[frame]` is missed in that frame."""
+        drop = dict(drop)
+        for frame, xs in enumerate(chain_frames(**kwargs)):
+            if frame % gap:
+                continue
+            if frame in drop:
+                xs = xs[:drop[frame]] + xs[drop[frame] + 1:]
+            positions = np.zeros(len(xs), dtype=POSITION_DTYPE)
+            positions['x'], positions['y'] = xs, 150
+            tracker.update(positions, 1, self.frame, frame_gap=gap)
+
+    def test_counts_rods_crossing_the_line(self):
+        tracker = Tracker(self.cp)
+        start = -12 * 50
+        self.run_chain(tracker, start=start)
+        # Rods that crossed x=300 during the 120 frames (6 px each)
+        crossed = sum(1 for x0 in start + 50 * np.arange(12) if x0 + 6 < 300 < x0 + 6 * 120)
+        self.assertEqual(tracker.rod_count, crossed)
+        self.assertEqual(len(tracker.counted_track_ids), crossed)
+
+    def test_prediction_counts_every_third_frame_with_missed_detections(self):
+        start = -12 * 50
+        crossed = sum(1 for x0 in start + 50 * np.arange(12) if x0 + 6 < 300 < x0 + 6 * 120)
+        # Rods in the tracking zone missed for one detection, one of them right at the line
+        drop = {30: 3, 60: 2, 63: 2, 90: 4}
+        tracker = Tracker(self.cp, predict=True)
+        self.run_chain(tracker, start=start, gap=3, drop=drop)
+        self.assertEqual(tracker.rod_count, crossed)
+        self.assertAlmostEqual(tracker.velocity, 6, delta=0.5)
+
+    def test_coasted_tracks_can_be_drawn(self):
+        tracker = Tracker(self.cp, predict=True)
+        self.run_chain(tracker, start=-12 * 50, frames=36, drop={35: 3})
+        self.assertTrue(any(rod.misses for rod in tracker.tracking_objects.values()))
+        self.assertTrue(all(isinstance(rod.pos_x, int) for rod in tracker.tracking_objects.values()))
+        tracker.plot_count()
+
+    def test_halt_forgets_the_velocity(self):
+        tracker = Tracker(self.cp, predict=True)
+        self.run_chain(tracker, start=-6 * 50, frames=20)
+        self.assertIsNotNone(tracker.velocity)
+        tracker.halt()
+        self.assertIsNone(tracker.velocity)
+        self.assertTrue(all(rod.vel_x is None for rod in tracker.tracking_objects.values()))
+
+    def test_actuator_stores_the_package_and_resets(self):
+        tracker = Tracker(self.cp)
+        self.run_chain(tracker, start=-12 * 50)
+        counted = tracker.rod_count
+        list_counter, store, count = handle_actuator(self.cp, (200, 150), [], tracker, False, 0)
+        self.assertTrue(store)
+        list_counter, store, count = handle_actuator(self.cp, (200, 150), list_counter, tracker, store, count)
+        self.assertEqual(list_counter, [counted])
+        self.assertEqual((tracker.rod_count, tracker.tracking_objects, tracker.track_id), (0, {}, 1))
+        self.assertEqual(tracker.rods_prev_frame, [])
+
+    def test_zones_split_on_the_counter_limits(self):
+        tracker = Tracker(self.cp)
+        positions = np.zeros(6, dtype=POSITION_DTYPE)
+        positions['x'] = [460, 100, 150, 450, 300, 149]
+        rods, zone_init, zone_tracking, zone_end = tracker._zone_rods(positions)
+        # Direction 1: sorted right to left, limits inclusive in the tracking zone
+        self.assertEqual([rod.pos_x for rod in rods], [460, 450, 300, 150, 149, 100])
+        self.assertEqual([rod.pos_x for rod in zone_init], [149, 100])
+        self.assertEqual([rod.pos_x for rod in zone_tracking], [450, 300, 150])
+        self.assertEqual([rod.pos_x for rod in zone_end], [460])
+
+    def test_drop_oldest_keeps_insertion_order(self):
+        tracker = Tracker(self.cp)
+        tracker.tracking_objects = {3: 'a', 1: 'b', 2: 'c', 4: 'd'}
+        tracker._drop_oldest(1)
+        self.assertEqual(list(tracker.tracking_objects), [1, 2, 4])
+        tracker._drop_oldest(-1)
+        self.assertEqual(list(tracker.tracking_objects), [4])
+
+if __name__ == '__main__':
+    unittest.main()